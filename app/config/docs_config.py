@@ -11,8 +11,20 @@ def custom_openapi(app):
         It wraps the `llama-cli` binary (from ik_llama.cpp) and exposes FastAPI routes for clean interaction.
 
         **Endpoints**
-        - `/ping` health check
+        - `/ping` liveness check
+        - `/livez` process liveness, answered while the model loads
+        - `/readyz` startup readiness (503 until warm-up has finished and the backend is available)
+        - `/health` inference backend readiness (503 while unavailable)
+        - `/metrics` Prometheus metrics (latency, queue, workers, throughput, caches)
         - `/summarize` run a summarization job via CLI
+        - `/infer` run a prompt with per-request llama.cpp options
+        - `/summarize/stream` stream the summary as NDJSON or Server-Sent Events
+        - `/jobs` queue documents for background summarization and fetch results in bulk
+        - `/sessions` ingest a document once and ask follow-up questions about it
+
+        Inference endpoints accept an `X-Request-Deadline` header (epoch seconds): the
+        request is cancelled, and its generation stopped, once it passes. Overloaded
+        endpoints answer 429 with `Retry-After`.
         """,
         routes=app.routes,
     )
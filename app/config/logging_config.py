@@ -1,65 +1,204 @@
+"""
+Logging pipeline.
+
+Loggers hand records to a `QueueHandler`; a `QueueListener` thread formats them
+and does the console and file I/O, so a slow disk never stalls the event loop.
+On the calling thread a record only has its message merged, with payloads
+shortened:
+
+- a string argument longer than `payload_max_chars` (a prompt, a generated
+  summary, raw llama-cli output, ...) is replaced by its size, or
+  cut to its first `payload_max_chars` characters when `show_payloads` is set;
+- the whole message is cut at `MAX_MESSAGE_CHARS`.
+
+Arguments are merged lazily, so pass payloads as `%s` arguments rather than
+formatting them into the message: nothing is built for records below the level.
+
+The log file rotates at `max_bytes`, keeping `backup_count` gzip-compressed
+backups (`medparswell.log.1.gz`, ...); compression runs on the listener thread.
+With `json_format`, every line is a JSON object.
+
+Importing this module has no side effects. Logging is configured once, at
+startup, by `app.config.settings.init_logging`; configuring again with the same
+options is a no-op.
+"""
+import atexit
+import copy
+import gzip
+import json
 import logging
-import logging.config
-from pathlib import Path
-from typing import Literal
+import logging.handlers
 import os
+import queue
+import shutil
+from pathlib import Path
+from typing import Literal, Optional
 
 LOG_LEVEL: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = os.getenv("LLAMA_LOG_LEVEL", "INFO")
 LOG_FILE = Path(os.getenv("LLAMA_LOG_FILE", Path(__file__).resolve().parent.parent.parent / "logs" / "medparswell.log"))
-LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
 
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
-def setup_logging(level: str = LOG_LEVEL, log_file: Path = LOG_FILE) -> None:
+# Longest message written, whatever the payload settings
+MAX_MESSAGE_CHARS = 8192
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configured_with: Optional[tuple] = None
+
+
+def _shorten(value, max_chars: int, show: bool):
+    if not isinstance(value, str) or len(value) <= max_chars:
+        return value
+    if show:
+        return f"{value[:max_chars]}… <+{len(value) - max_chars} chars>"
+    return f"<{len(value)} chars redacted>"
+
+
+class RedactingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records after shortening payload-sized arguments and messages.
+
+    Args:
+        log_queue (queue.SimpleQueue): Queue drained by the listener thread.
+        payload_max_chars (int): Longest string argument logged as-is.
+        show_payloads (bool): Log the start of longer arguments instead of only their size.
+    """
+
+    def __init__(self, log_queue, payload_max_chars: int = 256, show_payloads: bool = False):
+        super().__init__(log_queue)
+        self.payload_max_chars = payload_max_chars
+        self.show_payloads = show_payloads
+
+    def _is_payload(self, value) -> bool:
+        return isinstance(value, str) and len(value) > self.payload_max_chars
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if isinstance(args, tuple) and any(self._is_payload(a) for a in args):
+            args = tuple(_shorten(a, self.payload_max_chars, self.show_payloads) for a in args)
+        elif isinstance(args, dict) and any(self._is_payload(v) for v in args.values()):
+            args = {k: _shorten(v, self.payload_max_chars, self.show_payloads) for k, v in args.items()}
+        if args is not record.args:
+            # Other handlers (e.g. test capture) still see the original record
+            record = copy.copy(record)
+            record.args = args
+        record = super().prepare(record)
+        if len(record.msg) > MAX_MESSAGE_CHARS:
+            record.msg = record.message = (
+                f"{record.msg[:MAX_MESSAGE_CHARS]}… <+{len(record.msg) - MAX_MESSAGE_CHARS} chars>"
+            )
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def setup_logging(
+    level: str = LOG_LEVEL,
+    log_file: Path = LOG_FILE,
+    json_format: bool = False,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    payload_max_chars: int = 256,
+    show_payloads: bool = False,
+) -> None:
     """
     Configures the Python logging system for the application.
 
     Args:
         level (str): Logging level (e.g., 'DEBUG', 'INFO', 'WARNING', etc.)
         log_file (Path): Path to the log file.
+        json_format (bool): Write JSON lines instead of plain text.
+        max_bytes (int): Size at which the log file is rotated (0 disables rotation).
+        backup_count (int): Compressed rotated files to keep.
+        payload_max_chars (int): Longest string argument logged as-is.
+        show_payloads (bool): Log the start of longer arguments instead of redacting them.
     """
-    logging_config = {
-        "version": 1,
-        "disable_existing_loggers": False,
-        "formatters": {
-            "default": {
-                "format": LOG_FORMAT,
-            },
-        },
-        "handlers": {
-            "console": {
-                "class": "logging.StreamHandler",
-                "formatter": "default",
-                "level": level,
-            },
-            "file": {
-                "class": "logging.FileHandler",
-                "formatter": "default",
-                "filename": str(log_file),
-                "level": level,
-            },
-        },
-        "root": {
-            "handlers": ["console", "file"],
-            "level": level,
-        },
-    }
-
-    logging.config.dictConfig(logging_config)
-
-def configure_logging(level: str = LOG_LEVEL, log_file: Path = LOG_FILE) -> None:
+    global _listener, _configured_with
+    options = (str(level).upper(), str(log_file), json_format, max_bytes, backup_count, payload_max_chars, show_payloads)
+    if options == _configured_with:
+        return
+    shutdown_logging()
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT)
+    console = logging.StreamHandler()
+    Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+    file_handler.namer = _gzip_namer
+    file_handler.rotator = _gzip_rotator
+    for handler in (console, file_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(RedactingQueueHandler(log_queue, payload_max_chars, show_payloads))
+    root.setLevel(options[0])
+
+    _listener = logging.handlers.QueueListener(log_queue, console, file_handler)
+    _listener.start()
+    _configured_with = options
+    atexit.unregister(shutdown_logging)
+    atexit.register(shutdown_logging)
+
+
+def configure_logging(level: str = LOG_LEVEL, log_file: Path = LOG_FILE, **options) -> None:
     """
     Sets up the logging system (alias to setup_logging for semantic clarity).
     This function is intended to be imported by other modules.
     """
-    setup_logging(level, log_file)
+    setup_logging(level, log_file, **options)
+
+
+def shutdown_logging() -> None:
+    """Flushes queued records and stops the listener thread."""
+    global _listener, _configured_with
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    _listener = None
+    _configured_with = None
+
 
 def get_logger(name: str) -> logging.Logger:
     """
-    Returns a configured logger with the specified name.
-    Automatically sets up logging if not already initialized.
+    Returns the logger with the specified name; records reach the handlers once
+    `configure_logging` has run.
     """
-    setup_logging()
     return logging.getLogger(name)
 
-logger = get_logger("medparswell")
\ No newline at end of file
+logger = get_logger("medparswell")
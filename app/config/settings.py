@@ -1,11 +1,17 @@
+"""
+Application settings, read from `LLAMA_*` environment variables and `.env`.
+
+Nothing is read at import: `settings` loads `LlamaSettings` the first time one of
+its attributes is used, and logging is configured by `init_logging`, which the
+FastAPI lifespan calls once at startup.
+"""
 import logging
-from dotenv import load_dotenv
+from functools import lru_cache
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field, ConfigDict
 from app.config.logging_config import configure_logging
 
-load_dotenv()
-
 class LlamaSettings(BaseSettings):
     """Configuration settings for the llama-cli application."""
     llama_cli_path: str = Field(
@@ -72,6 +78,495 @@ class LlamaSettings(BaseSettings):
             "env_override": "Set LLAMA_CLI_TIMEOUT in your .env file to override"
         }
     )
+    prompt_transport: Literal["auto", "argv", "file", "stdin"] = Field(
+        default="auto",
+        description="How prompts reach llama-cli: on the command line, via a tmpfs file, via stdin, or chosen by size",
+        json_schema_extra={
+            "example": "auto",
+            "env_override": "Set LLAMA_PROMPT_TRANSPORT in your .env file to override"
+        }
+    )
+    prompt_argv_max_bytes: int = Field(
+        default=16384,
+        ge=0,
+        description="In auto mode, prompts larger than this many bytes are passed via file/stdin instead of argv",
+        json_schema_extra={
+            "example": 16384,
+            "env_override": "Set LLAMA_PROMPT_ARGV_MAX_BYTES in your .env file to override"
+        }
+    )
+    prompt_tmp_dir: Optional[str] = Field(
+        default=None,
+        description="Directory for temporary prompt files (defaults to /dev/shm); falls back to stdin if not writable",
+        json_schema_extra={
+            "example": "/dev/shm",
+            "env_override": "Set LLAMA_PROMPT_TMP_DIR in your .env file to override"
+        }
+    )
+    llama_server_path: Optional[str] = Field(
+        default=None,
+        description="Path to llama-server binary used for persistent inference workers",
+        json_schema_extra={
+            "example": "/usr/local/bin/llama-server",
+            "env_override": "Set LLAMA_LLAMA_SERVER_PATH in your .env file to override"
+        }
+    )
+    worker_count: int = Field(
+        default=0,
+        ge=0,
+        description="Number of model-resident llama-server workers to keep running (0 = spawn llama-cli per request)",
+        json_schema_extra={
+            "example": 2,
+            "env_override": "Set LLAMA_WORKER_COUNT in your .env file to override"
+        }
+    )
+    worker_host: str = Field(
+        default="127.0.0.1",
+        description="Interface the llama-server workers bind to",
+        json_schema_extra={
+            "example": "127.0.0.1",
+            "env_override": "Set LLAMA_WORKER_HOST in your .env file to override"
+        }
+    )
+    worker_base_port: int = Field(
+        default=8090,
+        ge=0,
+        description="Port of the first llama-server worker; worker N listens on base + N (0 = pick free ports)",
+        json_schema_extra={
+            "example": 8090,
+            "env_override": "Set LLAMA_WORKER_BASE_PORT in your .env file to override"
+        }
+    )
+    worker_startup_timeout: int = Field(
+        default=300,
+        description="Seconds to wait for a llama-server worker to finish loading the model",
+        json_schema_extra={
+            "example": 600,
+            "env_override": "Set LLAMA_WORKER_STARTUP_TIMEOUT in your .env file to override"
+        }
+    )
+    warmup_enabled: bool = Field(
+        default=True,
+        description="Run warm-up prompts and prime the prompt-template caches before reporting ready",
+        json_schema_extra={
+            "example": True,
+            "env_override": "Set LLAMA_WARMUP_ENABLED in your .env file to override"
+        }
+    )
+    warmup_prompts: list[str] = Field(
+        default=["Hello"],
+        description="Prompts run once on every worker (or through llama-cli) at startup",
+        json_schema_extra={
+            "example": ["Summarize: patient stable, discharged home."],
+            "env_override": "Set LLAMA_WARMUP_PROMPTS (a JSON list) in your .env file to override"
+        }
+    )
+    warmup_predict_tokens: int = Field(
+        default=4,
+        ge=1,
+        description="Tokens generated per warm-up prompt",
+        json_schema_extra={
+            "example": 4,
+            "env_override": "Set LLAMA_WARMUP_PREDICT_TOKENS in your .env file to override"
+        }
+    )
+    preload_mode: Literal["off", "willneed", "read"] = Field(
+        default="willneed",
+        description="Prefetch the model files into the page cache at startup: madvise(WILLNEED) on a mapping, sequential reads, or off",
+        json_schema_extra={
+            "example": "willneed",
+            "env_override": "Set LLAMA_PRELOAD_MODE in your .env file to override"
+        }
+    )
+    preload_chunk_mb: int = Field(
+        default=64,
+        ge=1,
+        description="Size of each madvise/read step of the model preload, in MiB",
+        json_schema_extra={
+            "example": 64,
+            "env_override": "Set LLAMA_PRELOAD_CHUNK_MB in your .env file to override"
+        }
+    )
+    worker_slots: int = Field(
+        default=1,
+        ge=1,
+        description="Parallel sequences per llama-server worker (--parallel, with --cont-batching when > 1)",
+        json_schema_extra={
+            "example": 4,
+            "env_override": "Set LLAMA_WORKER_SLOTS in your .env file to override"
+        }
+    )
+    batch_window_ms: float = Field(
+        default=10.0,
+        ge=0,
+        description="How long to collect concurrent requests into one batch for a multi-slot worker",
+        json_schema_extra={
+            "example": 10.0,
+            "env_override": "Set LLAMA_BATCH_WINDOW_MS in your .env file to override"
+        }
+    )
+    max_inflight_requests: int = Field(
+        default=2,
+        ge=1,
+        description="Maximum number of inference executions allowed to run concurrently",
+        json_schema_extra={
+            "example": 2,
+            "env_override": "Set LLAMA_MAX_INFLIGHT_REQUESTS in your .env file to override"
+        }
+    )
+    scheduler_batch_penalty_tokens: int = Field(
+        default=4096,
+        ge=0,
+        description="Extra cost given to batch-lane requests so interactive requests are admitted first",
+        json_schema_extra={
+            "example": 4096,
+            "env_override": "Set LLAMA_SCHEDULER_BATCH_PENALTY_TOKENS in your .env file to override"
+        }
+    )
+    max_queue_depth: int = Field(
+        default=64,
+        ge=0,
+        description="Requests allowed to wait for an inference slot before new ones get 429 (0 disables the limit)",
+        json_schema_extra={
+            "example": 64,
+            "env_override": "Set LLAMA_MAX_QUEUE_DEPTH in your .env file to override"
+        }
+    )
+    max_queue_wait_seconds: float = Field(
+        default=120.0,
+        ge=0,
+        description="Estimated queue time above which new requests get 429 with Retry-After (0 disables the limit)",
+        json_schema_extra={
+            "example": 120.0,
+            "env_override": "Set LLAMA_MAX_QUEUE_WAIT_SECONDS in your .env file to override"
+        }
+    )
+    scheduler_aging_tokens_per_second: float = Field(
+        default=50.0,
+        ge=0,
+        description="How much a waiting request's cost drops per second, so long and batch jobs are not starved",
+        json_schema_extra={
+            "example": 50.0,
+            "env_override": "Set LLAMA_SCHEDULER_AGING_TOKENS_PER_SECOND in your .env file to override"
+        }
+    )
+    hedge_enabled: bool = Field(
+        default=False,
+        description="Duplicate requests whose first token is late onto another idle worker",
+        json_schema_extra={
+            "example": False,
+            "env_override": "Set LLAMA_HEDGE_ENABLED in your .env file to override"
+        }
+    )
+    hedge_percentile: float = Field(
+        default=95.0,
+        gt=0,
+        le=100,
+        description="Percentile of recent time-to-first-token after which a request is hedged",
+        json_schema_extra={
+            "example": 95.0,
+            "env_override": "Set LLAMA_HEDGE_PERCENTILE in your .env file to override"
+        }
+    )
+    hedge_budget_ratio: float = Field(
+        default=0.05,
+        ge=0,
+        le=1,
+        description="Hedges allowed per request on average, so hedging cannot amplify overload",
+        json_schema_extra={
+            "example": 0.05,
+            "env_override": "Set LLAMA_HEDGE_BUDGET_RATIO in your .env file to override"
+        }
+    )
+    hedge_min_samples: int = Field(
+        default=20,
+        ge=1,
+        description="Time-to-first-token samples needed before hedging starts",
+        json_schema_extra={
+            "example": 20,
+            "env_override": "Set LLAMA_HEDGE_MIN_SAMPLES in your .env file to override"
+        }
+    )
+    supervisor_probe_interval: float = Field(
+        default=5.0,
+        gt=0,
+        description="Seconds between health probes of each llama-server worker",
+        json_schema_extra={
+            "example": 5.0,
+            "env_override": "Set LLAMA_SUPERVISOR_PROBE_INTERVAL in your .env file to override"
+        }
+    )
+    supervisor_probe_timeout: float = Field(
+        default=2.0,
+        gt=0,
+        description="Seconds a worker has to answer a health probe",
+        json_schema_extra={
+            "example": 2.0,
+            "env_override": "Set LLAMA_SUPERVISOR_PROBE_TIMEOUT in your .env file to override"
+        }
+    )
+    supervisor_probe_failures: int = Field(
+        default=3,
+        ge=1,
+        description="Consecutive failed probes after which a running worker is restarted",
+        json_schema_extra={
+            "example": 3,
+            "env_override": "Set LLAMA_SUPERVISOR_PROBE_FAILURES in your .env file to override"
+        }
+    )
+    supervisor_restart_backoff_max: float = Field(
+        default=60.0,
+        ge=0,
+        description="Upper bound in seconds of the exponential backoff between restarts of a worker",
+        json_schema_extra={
+            "example": 60.0,
+            "env_override": "Set LLAMA_SUPERVISOR_RESTART_BACKOFF_MAX in your .env file to override"
+        }
+    )
+    supervisor_max_restarts: int = Field(
+        default=5,
+        ge=1,
+        description="Restarts within the quarantine window after which a worker is quarantined",
+        json_schema_extra={
+            "example": 5,
+            "env_override": "Set LLAMA_SUPERVISOR_MAX_RESTARTS in your .env file to override"
+        }
+    )
+    supervisor_quarantine_seconds: float = Field(
+        default=300.0,
+        ge=0,
+        description="How long a repeatedly failing worker is kept out of rotation",
+        json_schema_extra={
+            "example": 300.0,
+            "env_override": "Set LLAMA_SUPERVISOR_QUARANTINE_SECONDS in your .env file to override"
+        }
+    )
+    breaker_failure_threshold: int = Field(
+        default=5,
+        ge=1,
+        description="Consecutive inference failures that open the circuit breaker",
+        json_schema_extra={
+            "example": 5,
+            "env_override": "Set LLAMA_BREAKER_FAILURE_THRESHOLD in your .env file to override"
+        }
+    )
+    breaker_reset_seconds: float = Field(
+        default=30.0,
+        ge=0,
+        description="How long the open circuit breaker fails requests fast before letting a trial through",
+        json_schema_extra={
+            "example": 30.0,
+            "env_override": "Set LLAMA_BREAKER_RESET_SECONDS in your .env file to override"
+        }
+    )
+    response_cache_enabled: bool = Field(
+        default=True,
+        description="Serve repeated identical inference requests from the response cache",
+        json_schema_extra={
+            "example": True,
+            "env_override": "Set LLAMA_RESPONSE_CACHE_ENABLED in your .env file to override"
+        }
+    )
+    response_cache_max_entries: int = Field(
+        default=256,
+        ge=1,
+        description="Maximum number of outputs kept in the in-memory LRU tier",
+        json_schema_extra={
+            "example": 256,
+            "env_override": "Set LLAMA_RESPONSE_CACHE_MAX_ENTRIES in your .env file to override"
+        }
+    )
+    response_cache_dir: Optional[str] = Field(
+        default=None,
+        description="Directory for the on-disk cache tier (unset = memory only)",
+        json_schema_extra={
+            "example": "cache/responses",
+            "env_override": "Set LLAMA_RESPONSE_CACHE_DIR in your .env file to override"
+        }
+    )
+    response_cache_ttl: int = Field(
+        default=86400,
+        ge=1,
+        description="Seconds an on-disk cache entry stays valid",
+        json_schema_extra={
+            "example": 86400,
+            "env_override": "Set LLAMA_RESPONSE_CACHE_TTL in your .env file to override"
+        }
+    )
+    response_cache_max_bytes: int = Field(
+        default=256 * 1024 * 1024,
+        ge=0,
+        description="Size budget of the on-disk cache tier in bytes; oldest entries are evicted first",
+        json_schema_extra={
+            "example": 268435456,
+            "env_override": "Set LLAMA_RESPONSE_CACHE_MAX_BYTES in your .env file to override"
+        }
+    )
+    default_predict_tokens: int = Field(
+        default=512,
+        ge=1,
+        description="Generation budget in tokens for requests that do not set predict_tokens (e.g. /summarize)",
+        json_schema_extra={
+            "example": 512,
+            "env_override": "Set LLAMA_DEFAULT_PREDICT_TOKENS in your .env file to override"
+        }
+    )
+    summary_chunk_tokens: Optional[int] = Field(
+        default=None,
+        ge=64,
+        description="Document tokens per map-reduce chunk (defaults to context_size minus the summary budget and template)",
+        json_schema_extra={
+            "example": 1536,
+            "env_override": "Set LLAMA_SUMMARY_CHUNK_TOKENS in your .env file to override"
+        }
+    )
+    summary_chunk_overlap_tokens: int = Field(
+        default=128,
+        ge=0,
+        description="Tokens of the previous chunk repeated at the start of the next one",
+        json_schema_extra={
+            "example": 128,
+            "env_override": "Set LLAMA_SUMMARY_CHUNK_OVERLAP_TOKENS in your .env file to override"
+        }
+    )
+    summary_predict_tokens: int = Field(
+        default=256,
+        ge=1,
+        description="Token budget of each chunk or partial-summary merge",
+        json_schema_extra={
+            "example": 256,
+            "env_override": "Set LLAMA_SUMMARY_PREDICT_TOKENS in your .env file to override"
+        }
+    )
+    summary_reduce_fan_in: int = Field(
+        default=8,
+        ge=2,
+        description="Maximum number of partial summaries merged by one reduce call",
+        json_schema_extra={
+            "example": 8,
+            "env_override": "Set LLAMA_SUMMARY_REDUCE_FAN_IN in your .env file to override"
+        }
+    )
+    job_db_path: str = Field(
+        default="data/jobs.sqlite3",
+        description="SQLite database backing the /jobs queue",
+        json_schema_extra={
+            "example": "/var/lib/medparswell/jobs.sqlite3",
+            "env_override": "Set LLAMA_JOB_DB_PATH in your .env file to override"
+        }
+    )
+    job_worker_count: int = Field(
+        default=1,
+        ge=0,
+        description="Number of /jobs running concurrently (0 = accept jobs but do not process them)",
+        json_schema_extra={
+            "example": 2,
+            "env_override": "Set LLAMA_JOB_WORKER_COUNT in your .env file to override"
+        }
+    )
+    job_max_attempts: int = Field(
+        default=5,
+        ge=1,
+        description="Runs of a job before a transient backend error (open breaker, no healthy worker) marks it failed",
+        json_schema_extra={
+            "example": 5,
+            "env_override": "Set LLAMA_JOB_MAX_ATTEMPTS in your .env file to override"
+        }
+    )
+    job_retry_backoff_seconds: float = Field(
+        default=5.0,
+        ge=0,
+        description="Delay before retrying a job after a transient backend error; doubles with every attempt",
+        json_schema_extra={
+            "example": 5.0,
+            "env_override": "Set LLAMA_JOB_RETRY_BACKOFF_SECONDS in your .env file to override"
+        }
+    )
+    prompt_cache_enabled: bool = Field(
+        default=True,
+        description="Reuse the evaluated KV state of registered prompt-template prefixes",
+        json_schema_extra={
+            "example": True,
+            "env_override": "Set LLAMA_PROMPT_CACHE_ENABLED in your .env file to override"
+        }
+    )
+    prompt_cache_dir: str = Field(
+        default="data/prompt-cache",
+        description="Directory for llama-cli --prompt-cache files of template prefixes",
+        json_schema_extra={
+            "example": "/var/cache/medparswell/prompt-cache",
+            "env_override": "Set LLAMA_PROMPT_CACHE_DIR in your .env file to override"
+        }
+    )
+    session_dir: str = Field(
+        default="data/sessions",
+        description="Directory for saved session KV state (also the workers' --slot-save-path)",
+        json_schema_extra={
+            "example": "/var/lib/medparswell/sessions",
+            "env_override": "Set LLAMA_SESSION_DIR in your .env file to override"
+        }
+    )
+    session_max_bytes: int = Field(
+        default=4 * 1024 * 1024 * 1024,
+        ge=0,
+        description="Disk budget for saved session state; least recently used sessions are evicted beyond it",
+        json_schema_extra={
+            "example": 4294967296,
+            "env_override": "Set LLAMA_SESSION_MAX_BYTES in your .env file to override"
+        }
+    )
+    session_max_memory_bytes: int = Field(
+        default=2 * 1024 * 1024 * 1024,
+        ge=0,
+        description="Memory budget for open sessions (document text plus KV state, sized by the saved state file); least recently used sessions are evicted beyond it",
+        json_schema_extra={
+            "example": 2147483648,
+            "env_override": "Set LLAMA_SESSION_MAX_MEMORY_BYTES in your .env file to override"
+        }
+    )
+    singleflight_enabled: bool = Field(
+        default=True,
+        description="Let concurrent identical inference requests share one execution",
+        json_schema_extra={
+            "example": True,
+            "env_override": "Set LLAMA_SINGLEFLIGHT_ENABLED in your .env file to override"
+        }
+    )
+    tracing_enabled: bool = Field(
+        default=True,
+        description="Trace request phases into a Server-Timing header and a per-request trace log record",
+        json_schema_extra={
+            "example": True,
+            "env_override": "Set LLAMA_TRACING_ENABLED in your .env file to override"
+        }
+    )
+    profile_sample_rate: float = Field(
+        default=0.0,
+        ge=0.0,
+        le=1.0,
+        description="Share of inference requests run under cProfile (0 disables profiling)",
+        json_schema_extra={
+            "example": 0.01,
+            "env_override": "Set LLAMA_PROFILE_SAMPLE_RATE in your .env file to override"
+        }
+    )
+    profile_dir: str = Field(
+        default="logs/profiles",
+        description="Directory the sampled request profiles (.prof) are written to",
+        json_schema_extra={
+            "example": "logs/profiles",
+            "env_override": "Set LLAMA_PROFILE_DIR in your .env file to override"
+        }
+    )
+    profile_max_files: int = Field(
+        default=100,
+        ge=1,
+        description="Most recent request profiles kept in profile_dir",
+        json_schema_extra={
+            "example": 100,
+            "env_override": "Set LLAMA_PROFILE_MAX_FILES in your .env file to override"
+        }
+    )
     log_level: str = Field(
         default="INFO",
         json_schema_extra={
@@ -88,14 +583,98 @@ class LlamaSettings(BaseSettings):
             "env_override": "Set LLAMA_LOG_FILE in your .env file to override"
         }
     )
+    log_json: bool = Field(
+        default=False,
+        description="Write log records as JSON lines instead of plain text",
+        json_schema_extra={
+            "example": True,
+            "env_override": "Set LLAMA_LOG_JSON in your .env file to override"
+        }
+    )
+    log_max_bytes: int = Field(
+        default=10 * 1024 * 1024,
+        ge=0,
+        description="Size at which the log file is rotated (0 disables rotation)",
+        json_schema_extra={
+            "example": 10485760,
+            "env_override": "Set LLAMA_LOG_MAX_BYTES in your .env file to override"
+        }
+    )
+    log_backup_count: int = Field(
+        default=5,
+        ge=0,
+        description="Gzip-compressed rotated log files to keep",
+        json_schema_extra={
+            "example": 5,
+            "env_override": "Set LLAMA_LOG_BACKUP_COUNT in your .env file to override"
+        }
+    )
+    log_payload_max_chars: int = Field(
+        default=256,
+        ge=0,
+        description="Longest string argument (prompt, output, ...) logged as-is; longer ones are redacted",
+        json_schema_extra={
+            "example": 256,
+            "env_override": "Set LLAMA_LOG_PAYLOAD_MAX_CHARS in your .env file to override"
+        }
+    )
+    log_show_payloads: bool = Field(
+        default=False,
+        description="Log the first log_payload_max_chars characters of long payloads instead of only their size (may expose PHI)",
+        json_schema_extra={
+            "example": False,
+            "env_override": "Set LLAMA_LOG_SHOW_PAYLOADS in your .env file to override"
+        }
+    )
 
     model_config = ConfigDict(env_prefix="LLAMA_", env_file=".env", env_file_encoding="utf-8")
 
     def get_logging_level(self):
         return getattr(logging, self.log_level.upper(), logging.INFO)
 
+@lru_cache(maxsize=1)
+def get_settings() -> LlamaSettings:
+    """
+    Loads the settings from the environment and `.env`, once.
+
+    Raises:
+        pydantic.ValidationError: If a required setting is missing or a value is invalid.
+    """
+    return LlamaSettings()
+
+
+class _LazySettings:
+    """Stands in for the `LlamaSettings` instance, loading it on first attribute access."""
+
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_settings(), name, value)
+
+    def __delattr__(self, name):
+        delattr(get_settings(), name)
+
+    def __repr__(self) -> str:
+        return repr(get_settings())
+
+
 # Singleton-like instance used globally for configuration
-settings = LlamaSettings()
-configure_logging(settings.log_level, settings.log_file)
-logging.info(f"🔧 Settings initialized: llama_cli_path={settings.llama_cli_path}, model_path={settings.model_path}")
-logging.debug(f"🛠 Logging configured — level: {settings.log_level}, output: {settings.log_file}")
\ No newline at end of file
+settings = _LazySettings()
+
+
+def init_logging() -> None:
+    """Configures logging from the settings; repeated calls with unchanged settings are no-ops."""
+    configure_logging(
+        settings.log_level,
+        settings.log_file,
+        json_format=settings.log_json,
+        max_bytes=settings.log_max_bytes,
+        backup_count=settings.log_backup_count,
+        payload_max_chars=settings.log_payload_max_chars,
+        show_payloads=settings.log_show_payloads,
+    )
+    logging.info("🔧 Settings initialized: llama_cli_path=%s, model_path=%s", settings.llama_cli_path, settings.model_path)
+    logging.debug("🛠 Logging configured — level: %s, output: %s", settings.log_level, settings.log_file)
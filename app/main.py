@@ -1,7 +1,5 @@
+import asyncio
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
 
 from fastapi import FastAPI
 from fastapi.requests import Request
@@ -9,18 +7,46 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from app.main_router import router  # or wherever we end up placing the APIRouter
-from app.routes import health_routes
+from app.routes import admin_routes, health_routes, job_routes, metrics_routes, session_routes
 from contextlib import asynccontextmanager
 from app.config.logging_config import logger
 from app.config.docs_config import custom_openapi
+from app.config.settings import get_settings, init_logging
+from app.middleware import CancellationMiddleware, MetricsMiddleware, TracingMiddleware
+from app.services.worker_pool import worker_pool
+from app.services.job_queue import job_queue
+from app.services.supervisor import worker_supervisor
+from app.services.readiness import startup
+from app.services.model_preloader import model_preloader
+from app.services.sessions import session_manager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Configuration and logging are loaded here, once per process, not at import
+    get_settings()
+    init_logging()
     logger.info("🚀 medparswell FastAPI backend has started.", extra={"component": "main"})
+    # Sessions do not survive a restart; neither should their saved state
+    await asyncio.to_thread(session_manager.purge_stale_state)
+    # Path checks, worker start-up and warm-up run in the background: /livez answers
+    # while the model loads, /readyz once it is done
+    startup_task = asyncio.ensure_future(startup.run())
+    await job_queue.start()
     yield
+    startup_task.cancel()
+    model_preloader.stop()
+    await asyncio.gather(startup_task, return_exceptions=True)
+    await job_queue.stop()
+    await worker_supervisor.stop()
+    await worker_pool.stop()
     logger.info("🟢 FastAPI lifespan completed startup steps.", extra={"component": "main"})
 
 app = FastAPI(lifespan=lifespan)
+# Stop inference for clients that disconnected or whose X-Request-Deadline passed
+app.add_middleware(CancellationMiddleware, paths=("/summarize", "/infer", "/sessions"))
+app.add_middleware(MetricsMiddleware)
+# Outermost, so the request's trace is current for everything below
+app.add_middleware(TracingMiddleware, profile_paths=("/summarize", "/infer", "/sessions"))
 def custom_openapi_wrapper():
     return custom_openapi(app)
 
@@ -35,4 +61,8 @@ async def root():
     return {"status": "ok", "message": "medparswell API is running."}
 
 app.include_router(router)
-app.include_router(health_routes.router)
\ No newline at end of file
+app.include_router(health_routes.router)
+app.include_router(admin_routes.router)
+app.include_router(job_routes.router)
+app.include_router(session_routes.router)
+app.include_router(metrics_routes.router)
\ No newline at end of file
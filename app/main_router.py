@@ -1,36 +1,138 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.requests import Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Literal, Optional
+from app.middleware import TracedRoute
+from app.schemas.llama_inference_schema import LlamaCLIResponse, LlamaInferenceParameters
+from app.services.llama_argv import UnsupportedOptionError
+from app.services.scheduler import DeadlineExceededError, QueueFullError, inference_gate, request_deadline
+from app.services.supervisor import BackendUnavailableError
+import json
+import time
 import logging
 logger = logging.getLogger("medparswell")
 
-router = APIRouter()
+
+
+async def admission_control(x_request_deadline: Optional[float] = Header(default=None)):
+    """
+    Sheds inference requests before any work is done when the queue is over its
+    limits (429 + Retry-After), and records the client's `X-Request-Deadline`
+    (epoch seconds) so the request is dropped if it expires while queued.
+    """
+    inference_gate.check_capacity(x_request_deadline)
+    request_deadline.set(x_request_deadline)
+
+
+router = APIRouter(route_class=TracedRoute)
 
 # Health check endpoint
 @router.get("/health")
 async def health_check():
+    """Reports real backend readiness; 503 while no backend can serve inference."""
+    from app.services.supervisor import backend_health
+
     logger.debug("✅ Health check endpoint hit")
-    return {"status": "ok"}
+    report = backend_health()
+    return JSONResponse(status_code=503 if report["status"] == "unavailable" else 200, content=report)
 
 # Placeholder for future summarization logic
 class DocumentRequest(BaseModel):
     content: str
 
-@router.post("/summarize")
+@router.post("/summarize", dependencies=[Depends(admission_control)])
 async def summarize_document(request: DocumentRequest):
     logger.info("📝 Received summarization request")
-    logger.debug(f"📥 Raw content: {request.content}")
-    # Placeholder for orchestrator logic:
-    # e.g., extracted = extract_text(request.content)
-    # summary = generate_summary(extracted)
-    from app.services.llama_runner import LlamaRunner
+    logger.debug("📥 Content length: %d chars", len(request.content))
+    # Documents longer than one context window are summarised map-reduce style
+    from app.services.summarizer import summarize
     from app.config.settings import settings
 
-    runner = LlamaRunner(binary_path=settings.llama_cli_path)
-    summary = runner.run_prompt(prompt=request.content, verbose=settings.verbose)
-    logger.debug(f"📤 Generated summary: {summary}")
+    summary = await summarize(request.content, verbose=settings.verbose)
+    logger.debug("📤 Generated summary: %s", summary)
     return {"summary": summary}
 
 
+@router.post("/infer", response_model=LlamaCLIResponse, dependencies=[Depends(admission_control)])
+async def infer(params: LlamaInferenceParameters):
+    """
+    Runs a prompt with per-request llama.cpp options.
+
+    Only options that differ from the schema defaults are forwarded, so unset
+    fields keep the server's configuration. Requests that only change sampling
+    options are served by the persistent workers when they are running; load-time
+    options (threads, KV cache types, mlock, ...) are applied to a llama-cli spawn.
+
+    Generation ends at the first of: end of text, `predict_tokens`, any
+    `reverse_prompt` string, or `deadline_ms`; `stop_reason` says which.
+    """
+    logger.info("🧪 Received inference request")
+    from app.services.inference import generate
+
+    return await generate(prompt=params.prompt, params=params)
+
+
+def _encode_frame(payload: dict, stream_format: str) -> str:
+    data = json.dumps(payload)
+    if stream_format == "sse":
+        return f"data: {data}\n\n"
+    return data + "\n"
+
+
+@router.post("/summarize/stream", dependencies=[Depends(admission_control)])
+async def summarize_document_stream(
+    request: DocumentRequest,
+    http_request: Request,
+    format: Literal["ndjson", "sse"] = "ndjson",
+):
+    """
+    Streams the summary as it is generated, as NDJSON (default) or Server-Sent Events.
+
+    Each frame is `{"token": "..."}`; the final frame is `{"done": true, ...}` and
+    carries `ttft_ms` (time to first token), `duration_ms`, `stop_reason`,
+    `tokens_generated` and llama.cpp's `timings` when it reported them. If the client disconnects, the generation is stopped.
+    """
+    logger.info("📝 Received streaming summarization request")
+    from app.services.inference import stream_inference
+    from app.config.settings import settings
+
+    async def frames():
+        started = time.perf_counter()
+        ttft_ms = None
+        chunks = 0
+        result = None
+        generator = stream_inference(prompt=request.content, verbose=settings.verbose)
+        try:
+            async for chunk in generator:
+                if isinstance(chunk, LlamaCLIResponse):
+                    result = chunk
+                    continue
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                if await http_request.is_disconnected():
+                    logger.info("🔌 Client disconnected; stopping generation")
+                    return
+                chunks += 1
+                yield _encode_frame({"token": chunk}, format)
+        except RuntimeError as e:
+            logger.error("Streaming summarization failed: %s", e)
+            yield _encode_frame({"done": True, "error": str(e)}, format)
+            return
+        finally:
+            await generator.aclose()
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        final = {"done": True, "ttft_ms": ttft_ms, "duration_ms": duration_ms, "chunks": chunks}
+        if result is not None:
+            final.update(stop_reason=result.stop_reason, tokens_generated=result.tokens_generated)
+            if result.timings is not None:
+                final["timings"] = result.timings.model_dump(exclude_none=True)
+        yield _encode_frame(final, format)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(frames(), media_type=media_type)
+
+
 # 404 Exception handler
 
 # Custom exception handler registration
@@ -43,8 +145,40 @@ def add_custom_handlers(app: FastAPI):
     @app.exception_handler(StarletteHTTPException)
     async def http_exception_handler(request: Request, exc: StarletteHTTPException):
         if exc.status_code == 404:
-            logger.warning(f"🚫 404 Not Found: {request.method} {request.url}")
+            logger.warning("🚫 404 Not Found: %s %s", request.method, request.url)
         return JSONResponse(
             status_code=exc.status_code,
             content={"detail": exc.detail}
+        )
+
+    @app.exception_handler(QueueFullError)
+    async def queue_full_handler(request: Request, exc: QueueFullError):
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(exc)},
+            headers={"Retry-After": str(exc.retry_after)}
+        )
+
+    @app.exception_handler(BackendUnavailableError)
+    async def backend_unavailable_handler(request: Request, exc: BackendUnavailableError):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(exc)},
+            headers={"Retry-After": str(exc.retry_after)}
+        )
+
+    @app.exception_handler(UnsupportedOptionError)
+    async def unsupported_option_handler(request: Request, exc: UnsupportedOptionError):
+        logger.warning("Rejected %s %s: %s", request.method, request.url.path, exc)
+        return JSONResponse(
+            status_code=400,
+            content={"detail": str(exc)}
+        )
+
+    @app.exception_handler(DeadlineExceededError)
+    async def deadline_exceeded_handler(request: Request, exc: DeadlineExceededError):
+        logger.info("⌛ Dropped %s %s: %s", request.method, request.url.path, exc)
+        return JSONResponse(
+            status_code=504,
+            content={"detail": str(exc)}
         )
\ No newline at end of file
@@ -0,0 +1,232 @@
+import asyncio
+import functools
+import inspect
+import json
+import time
+from typing import Callable, Optional, Sequence
+
+from fastapi.routing import APIRoute
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.services.cancellation import cancellation_stats
+from app.services.metrics import REQUEST_LATENCY
+from app.services.tracing import Trace, current_trace, request_profiler, trace_recorder
+
+
+def _header_deadline(scope) -> Optional[float]:
+    for name, value in scope.get("headers", []):
+        if name == b"x-request-deadline":
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+
+class CancellationMiddleware:
+    """Cancels inference requests nobody is waiting for any more.
+
+    For requests under `paths`, the handler runs in its own task that is cancelled
+    as soon as the client disconnects or the `X-Request-Deadline` (epoch seconds)
+    passes. Cancellation kills the llama-cli process or drops the llama-server
+    request behind it (see `app.services.cancellation`). A deadline that expires
+    before the response has started is answered with 504.
+
+    Args:
+        app: The wrapped ASGI application.
+        paths (Sequence[str]): Path prefixes of the endpoints to watch.
+    """
+
+    def __init__(self, app, paths: Sequence[str] = ()):
+        self.app = app
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        deadline = _header_deadline(scope)
+        body_read = asyncio.Event()
+        disconnected = asyncio.Event()
+        response_started = False
+
+        async def receive_wrapper():
+            # Once the body is in, only the watcher reads from the client
+            if body_read.is_set():
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            elif not message.get("more_body", False):
+                body_read.set()
+            return message
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        async def watch_client():
+            await body_read.wait()
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        handler = asyncio.ensure_future(self.app(scope, receive_wrapper, send_wrapper))
+        watcher = asyncio.ensure_future(watch_client())
+        gone = asyncio.ensure_future(disconnected.wait())
+        timeout = max(deadline - time.time(), 0) if deadline is not None else None
+        try:
+            done, _ = await asyncio.wait({handler, gone}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if handler in done:
+                handler.result()
+                return
+            reason = "disconnect" if disconnected.is_set() else "deadline"
+            logger.info("⛔ Cancelling %s %s: %s", scope["method"], scope["path"],
+                        "client disconnected" if reason == "disconnect" else "request deadline passed")
+            cancellation_stats.record_request(reason)
+            handler.cancel()
+            await asyncio.gather(handler, return_exceptions=True)
+            if reason == "deadline" and not response_started:
+                body = json.dumps({"detail": "Request deadline passed before the response was ready"}).encode()
+                await send({"type": "http.response.start", "status": 504,
+                            "headers": [(b"content-type", b"application/json"),
+                                        (b"content-length", str(len(body)).encode())]})
+                await send({"type": "http.response.body", "body": body})
+        finally:
+            for task in (handler, watcher, gone):
+                if not task.done():
+                    task.cancel()
+
+
+class MetricsMiddleware:
+    """Records every HTTP request's latency by route template, method and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route on the scope; label by template, not raw path
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                route=getattr(route, "path", "unmatched"),
+                method=scope["method"],
+                status=str(status),
+            )
+
+
+class TracingMiddleware:
+    """Traces every HTTP request's phases (see `app.services.tracing`).
+
+    Adds `Server-Timing` and `X-Trace-Id` headers to the response, records the
+    finished trace, and runs a sampled share of the requests under `paths` under
+    the profiler.
+
+    Args:
+        app: The wrapped ASGI application.
+        profile_paths (Sequence[str]): Path prefixes of the endpoints that may be profiled.
+    """
+
+    def __init__(self, app, profile_paths: Sequence[str] = ()):
+        self.app = app
+        self.profile_paths = tuple(profile_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.tracing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["method"], scope["path"])
+        token = current_trace.set(trace)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [
+                    *message.get("headers", []),
+                    (b"server-timing", trace.server_timing().encode()),
+                    (b"x-trace-id", trace.id.encode()),
+                ]}
+            await send(message)
+
+        profiler = None
+        if self.profile_paths and scope["path"].startswith(self.profile_paths):
+            profiler = request_profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_trace.reset(token)
+            if profiler is not None:
+                request_profiler.stop(profiler)
+                trace.attributes["profiled"] = True
+                try:
+                    await asyncio.to_thread(request_profiler.write, profiler, trace)
+                except OSError as e:
+                    logger.warning("Could not write request profile: %s", e)
+            trace_recorder.finish(trace, status)
+
+
+def _traced_endpoint(endpoint: Callable) -> Callable:
+    @functools.wraps(endpoint)
+    async def traced(*args, **kwargs):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.end_mark("validate")
+        result = await endpoint(*args, **kwargs)
+        if trace is not None:
+            trace.mark("serialize")
+        return result
+
+    traced.__traced__ = True
+    return traced
+
+
+class TracedRoute(APIRoute):
+    """APIRoute that splits a request's trace into `validate` (body parsing,
+    dependencies and pydantic validation, up to the endpoint call) and
+    `serialize` (response model validation and rendering, after it returns)."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if inspect.iscoroutinefunction(endpoint) and not getattr(endpoint, "__traced__", False):
+            endpoint = _traced_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def traced_handler(request):
+            trace = current_trace.get()
+            if trace is None:
+                return await handler(request)
+            trace.mark("validate")
+            try:
+                return await handler(request)
+            finally:
+                # Still open when validation failed before the endpoint ran
+                trace.end_mark("validate")
+                trace.end_mark("serialize")
+
+        return traced_handler
@@ -0,0 +1,97 @@
+import asyncio
+from typing import Literal
+
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+from app.config.logging_config import logger
+from app.services.batching import micro_batcher
+from app.services.cancellation import cancellation_stats
+from app.services.model_preloader import model_preloader
+from app.services.hedging import hedger
+from app.services.prefix_cache import prefix_cache
+from app.services.scheduler import inference_gate
+from app.services.response_cache import response_cache
+from app.services.singleflight import inflight
+from app.services.supervisor import circuit_breaker, worker_supervisor
+from app.services.timings import timing_stats
+from app.services.tracing import trace_recorder
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/cache")
+async def cache_stats():
+    logger.debug("Response cache stats requested.")
+    return response_cache.stats()
+
+@router.delete("/cache")
+async def clear_cache():
+    logger.info("Clearing response cache.")
+    response_cache.clear()
+    return {"status": "ok", "message": "response cache cleared"}
+
+@router.get("/inflight")
+async def inflight_stats():
+    logger.debug("In-flight coalescing stats requested.")
+    return inflight.stats()
+
+
+class PromptTemplateRequest(BaseModel):
+    prefix: str = Field(..., min_length=1, description="Shared instruction text every prompt of this template starts with")
+
+@router.get("/prefix-cache")
+async def prefix_cache_stats():
+    logger.debug("Prompt prefix cache stats requested.")
+    return prefix_cache.stats()
+
+@router.put("/prefix-cache/templates/{name}")
+async def register_prompt_template(name: str, request: PromptTemplateRequest):
+    logger.info("Registering prompt template %r (%d chars)", name, len(request.prefix))
+    prefix_cache.register(name, request.prefix)
+    return {"status": "ok", "template": name}
+
+@router.get("/batching")
+async def batching_stats():
+    logger.debug("Micro-batching stats requested.")
+    return micro_batcher.stats()
+
+@router.get("/scheduler")
+async def scheduler_stats():
+    logger.debug("Admission scheduler stats requested.")
+    return inference_gate.stats()
+
+@router.get("/cancellation")
+async def cancellation_stats_endpoint():
+    logger.debug("Cancellation stats requested.")
+    return cancellation_stats.stats()
+
+@router.get("/supervisor")
+async def supervisor_stats():
+    logger.debug("Worker supervisor stats requested.")
+    return {"circuit_breaker": circuit_breaker.stats(), **worker_supervisor.stats()}
+
+@router.get("/hedging")
+async def hedging_stats():
+    logger.debug("Hedging stats requested.")
+    return hedger.stats()
+
+@router.get("/timings")
+async def timings_stats():
+    logger.debug("llama.cpp timing stats requested.")
+    return timing_stats.stats()
+
+@router.get("/traces")
+async def traces(limit: int = 20):
+    logger.debug("Request traces requested.")
+    return trace_recorder.stats(limit)
+
+@router.get("/model/residency")
+async def model_residency():
+    logger.debug("Model page-cache residency requested.")
+    # mincore over a large model takes a while; keep it off the event loop
+    return await asyncio.to_thread(model_preloader.residency)
+
+@router.post("/model/preload")
+async def preload_model(mode: Literal["willneed", "read"] = "willneed"):
+    logger.info("Model preload (%s) requested.", mode)
+    started = model_preloader.start(mode)
+    return {"status": "started" if started else "already running", "mode": mode}
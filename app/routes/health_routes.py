@@ -1,9 +1,22 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from app.config.logging_config import logger
+from app.services.readiness import startup
 
 router = APIRouter()
 
 @router.get("/ping")
 async def ping():
     logger.info("Health check ping received.")
-    return {"status": "ok", "message": "medparswell is alive"}
\ No newline at end of file
+    return {"status": "ok", "message": "medparswell is alive"}
+
+@router.get("/livez")
+async def livez():
+    """Liveness: the process is up and its event loop answers, even while the model loads."""
+    return {"status": "ok"}
+
+@router.get("/readyz")
+async def readyz():
+    """Readiness: 200 once start-up and warm-up finished and the backend can serve, 503 before."""
+    report = startup.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
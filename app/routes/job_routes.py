@@ -0,0 +1,48 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.config.logging_config import logger
+from app.schemas.job_schema import JobStatus, JobSubmitRequest, JobSubmitResponse
+from app.services.job_queue import job_queue
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+@router.post("", response_model=JobSubmitResponse, status_code=202)
+async def submit_jobs(request: JobSubmitRequest):
+    """Queues one summarization job per document and returns immediately."""
+    logger.info("📬 Received %d document(s) for background summarization", len(request.documents))
+    job_ids = await job_queue.submit(request.documents)
+    return JobSubmitResponse(job_ids=job_ids)
+
+@router.get("/results", response_model=list[JobStatus])
+async def job_results(
+    ids: Optional[str] = Query(None, description="Comma-separated job ids"),
+    finished_after: Optional[float] = Query(None, description="Only jobs finished after this epoch time"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Returns jobs with their results in bulk: the given `ids`, or else every finished
+    job in completion order. Page through a backfill by passing the last
+    `finished_at` as `finished_after`.
+    """
+    id_list = [job_id for job_id in (ids or "").split(",") if job_id]
+    return await job_queue.results(ids=id_list, finished_after=finished_after, limit=limit)
+
+@router.get("/stats")
+async def job_stats():
+    logger.debug("Job queue stats requested.")
+    return await job_queue.stats()
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str, include_result: bool = True):
+    job = await job_queue.get(job_id, include_result=include_result)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@router.delete("/{job_id}", response_model=JobStatus)
+async def cancel_job(job_id: str):
+    """Cancels a queued or running job; finished jobs are left unchanged."""
+    status = await job_queue.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return await job_queue.get(job_id, include_result=False)
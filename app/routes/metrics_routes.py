@@ -0,0 +1,73 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.services.batching import micro_batcher
+from app.services.cancellation import cancellation_stats
+from app.services.hedging import hedger
+from app.services.metrics import CONTENT_TYPE, MetricsRegistry, metrics
+from app.services.prefix_cache import prefix_cache
+from app.services.response_cache import response_cache
+from app.services.scheduler import inference_gate
+from app.services.singleflight import inflight
+from app.services.supervisor import circuit_breaker
+from app.services.worker_pool import worker_pool
+
+router = APIRouter(tags=["metrics"])
+
+
+def collect_service_metrics(registry: MetricsRegistry):
+    """Reads the services' own counters at scrape time, so none of this costs anything per request."""
+    gate = inference_gate.stats()
+    yield registry.gauge("medparswell_inflight_requests", "Inference executions running.", [({}, gate["in_flight"])])
+    yield registry.gauge("medparswell_queue_depth", "Requests waiting for an inference slot.", [
+        ({"lane": lane}, stats["waiting"]) for lane, stats in gate["lanes"].items()
+    ])
+    yield registry.gauge("medparswell_queue_estimated_wait_seconds", "Estimated wait for a new request.", [
+        ({}, gate["estimated_wait_s"])
+    ])
+
+    workers = len(worker_pool.workers)
+    yield registry.gauge("medparswell_workers", "llama-server workers by state.", [
+        ({"state": "ready"}, worker_pool.ready_count),
+        ({"state": "busy"}, worker_pool.busy_count),
+        ({"state": "unavailable"}, workers - worker_pool.ready_count),
+    ])
+    yield registry.gauge("medparswell_worker_utilization", "Share of ready workers leased to a request.", [
+        ({}, worker_pool.busy_count / worker_pool.ready_count if worker_pool.ready_count else None)
+    ])
+
+    yield registry.gauge("medparswell_cache_hit_ratio", "Hit ratio of the response and prompt-prefix caches.", [
+        ({"cache": "response"}, response_cache.stats()["hit_ratio"]),
+        ({"cache": "prefix"}, prefix_cache.stats()["hit_ratio"]),
+    ])
+    yield registry.collected_counter("medparswell_coalesced_requests", "Requests served by another request's execution.", [
+        ({}, inflight.stats()["followers"])
+    ])
+    yield registry.collected_counter("medparswell_batched_requests", "Requests dispatched through micro-batches.", [
+        ({}, micro_batcher.stats()["requests"])
+    ])
+    yield registry.collected_counter("medparswell_hedged_requests", "Requests duplicated onto a second worker.", [
+        ({}, hedger.counters["hedged"])
+    ])
+
+    yield registry.collected_counter("medparswell_rejected_requests", "Requests rejected before reaching a worker.", [
+        ({"reason": "queue_depth"}, gate["shed_queue_depth"]),
+        ({"reason": "queue_time"}, gate["shed_queue_time"]),
+        ({"reason": "deadline"}, gate["dropped_expired"]),
+        ({"reason": "circuit_open"}, circuit_breaker.counters["rejected"]),
+    ])
+    cancelled = cancellation_stats.stats()
+    yield registry.collected_counter("medparswell_cancelled_requests", "Requests cancelled while in flight.", [
+        ({"reason": "disconnect"}, cancelled["client_disconnects"]),
+        ({"reason": "deadline"}, cancelled["deadlines_expired"]),
+    ])
+    yield registry.collected_counter("medparswell_reclaimed_cpu_seconds", "Estimated CPU time saved by cancellation.", [
+        ({}, cancelled["reclaimed_cpu_seconds"])
+    ])
+
+
+metrics.register_collector(collect_service_metrics)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
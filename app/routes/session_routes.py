@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.config.logging_config import logger
+from app.main_router import admission_control
+from app.middleware import TracedRoute
+from app.schemas.llama_inference_schema import LlamaCLIResponse
+from app.schemas.session_schema import SessionCreateRequest, SessionInfo, SessionQuestionRequest
+from app.services.sessions import session_manager
+
+router = APIRouter(prefix="/sessions", tags=["sessions"], route_class=TracedRoute)
+
+@router.post("", response_model=SessionInfo, status_code=201, dependencies=[Depends(admission_control)])
+async def create_session(request: SessionCreateRequest):
+    """Ingests a document once; its evaluated state is saved for follow-up questions."""
+    logger.info("🗂 Creating Q&A session")
+    session = await session_manager.create(request.content)
+    return session.describe()
+
+@router.get("/stats")
+async def session_stats():
+    logger.debug("Session stats requested.")
+    return session_manager.stats()
+
+@router.get("/{session_id}", response_model=SessionInfo)
+async def get_session(session_id: str):
+    session = session_manager.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return session.describe()
+
+@router.post("/{session_id}/ask", response_model=LlamaCLIResponse, dependencies=[Depends(admission_control)])
+async def ask_session(session_id: str, request: SessionQuestionRequest):
+    """Answers a question about the session's document without re-evaluating the document."""
+    if session_manager.get(session_id) is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return await session_manager.ask(session_id, request.question, request.predict_tokens)
+
+@router.delete("/{session_id}")
+async def close_session(session_id: str):
+    if not session_manager.close(session_id):
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return {"status": "ok", "message": f"session {session_id} closed"}
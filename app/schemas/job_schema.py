@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field, constr
+from typing import Optional, Annotated
+
+NonEmptyStr = constr(min_length=1)
+
+class JobSubmitRequest(BaseModel):
+    documents: Annotated[
+        list[NonEmptyStr],
+        Field(
+            min_length=1,
+            description="Documents to summarize; one job is queued per document",
+            json_schema_extra={"example": ["Discharge summary: patient admitted with ..."]}
+        )
+    ]
+
+class JobSubmitResponse(BaseModel):
+    job_ids: Annotated[
+        list[str],
+        Field(
+            description="Ids of the queued jobs, in the order of `documents`",
+            json_schema_extra={"example": ["3f2c9a0e5b6d4c1e8f7a9b0c1d2e3f4a"]}
+        )
+    ]
+
+class JobStatus(BaseModel):
+    id: Annotated[str, Field(description="Job id")]
+    status: Annotated[
+        str,
+        Field(
+            description="queued, running, succeeded, failed or cancelled",
+            json_schema_extra={"example": "running"}
+        )
+    ]
+    result: Annotated[Optional[str], Field(default=None, description="Summary, once the job has succeeded")]
+    error: Annotated[Optional[str], Field(default=None, description="Failure reason, if the job failed")]
+    attempts: Annotated[int, Field(default=0, description="Times the job has been started (restarts included)")]
+    created_at: Annotated[float, Field(description="Submission time (epoch seconds)")]
+    started_at: Annotated[Optional[float], Field(default=None, description="Start of the latest attempt (epoch seconds)")]
+    finished_at: Annotated[Optional[float], Field(default=None, description="Completion time (epoch seconds)")]
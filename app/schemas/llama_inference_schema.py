@@ -1,4 +1,4 @@
-__all__ = ["LlamaInferenceParameters", "LlamaCLIResponse"]
+__all__ = ["LlamaInferenceParameters", "LlamaTimings", "LlamaCLIResponse"]
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
 from typing import ClassVar
@@ -50,6 +50,17 @@ class LlamaInferenceParameters(BaseModel):
         ge=1,
         json_schema_extra={"example": 128},
     )
+    reverse_prompt: Optional[list[str]] = Field(
+        None,
+        description="Stop strings; generation halts as soon as one is produced (--reverse-prompt). Can be repeated.",
+        json_schema_extra={"example": ["</summary>", "\n\nUser:"]},
+    )
+    deadline_ms: Optional[int] = Field(
+        None,
+        description="Wall-clock limit for the generation in milliseconds; output produced so far is returned once exceeded.",
+        ge=1,
+        json_schema_extra={"example": 30000},
+    )
     seed: Optional[int] = Field(
         None,
         description="RNG seed for reproducibility. Set to -1 to use random seed.",
@@ -390,11 +401,7 @@ class LlamaInferenceParameters(BaseModel):
         json_schema_extra={"example": "auto"},
     )
 
-
-class LlamaCLIResponse(BaseModel):
-    output: str = Field(..., description="The raw response generated by the model.")
-    tokens_generated: Optional[int] = Field(None, description="Estimated number of tokens returned.")
-    execution_time_ms: Optional[int] = Field(None, description="Time taken to generate the response (ms).")
+    # ───── Embeddings / Logits ─────
     pooling: Optional[str] = Field(
         None,
         description="Specifies the embedding pooling strategy. Options: 'none', 'mean', 'cls', 'last'.",
@@ -426,63 +433,6 @@ class LlamaCLIResponse(BaseModel):
         description="Enable use of penalty prompt tokens (--use-penalty-prompt).",
         json_schema_extra={"example": True},
     )
-    # ───── Perplexity & Evaluation ─────
-    all_logits: Optional[bool] = Field(
-        False,
-        description="Return logits for all tokens in the batch (--all-logits).",
-        json_schema_extra={"example": False},
-    )
-    hellaswag: Optional[bool] = Field(
-        False,
-        description="Compute HellaSwag score over tasks from provided datafile (--hellaswag).",
-        json_schema_extra={"example": False},
-    )
-    hellaswag_tasks: Optional[int] = Field(
-        400,
-        description="Number of tasks to use in HellaSwag score (--hellaswag-tasks).",
-        ge=0,
-        json_schema_extra={"example": 400},
-    )
-    winogrande: Optional[bool] = Field(
-        False,
-        description="Compute Winogrande score from provided datafile (--winogrande).",
-        json_schema_extra={"example": False},
-    )
-    winogrande_tasks: Optional[int] = Field(
-        0,
-        description="Number of Winogrande tasks to run (--winogrande-tasks).",
-        ge=0,
-        json_schema_extra={"example": 100},
-    )
-    multiple_choice: Optional[bool] = Field(
-        False,
-        description="Enable multiple choice scoring (--multiple-choice).",
-        json_schema_extra={"example": False},
-    )
-    multiple_choice_tasks: Optional[int] = Field(
-        0,
-        description="Number of tasks to use in multiple choice eval (--multiple-choice-tasks).",
-        ge=0,
-        json_schema_extra={"example": 20},
-    )
-    kl_divergence: Optional[bool] = Field(
-        False,
-        description="Compute KL divergence against base logits (--kl-divergence).",
-        json_schema_extra={"example": False},
-    )
-    ppl_stride: Optional[int] = Field(
-        0,
-        description="Stride size for perplexity calculations (--ppl-stride).",
-        ge=0,
-        json_schema_extra={"example": 512},
-    )
-    ppl_output_type: Optional[int] = Field(
-        0,
-        description="Output format for perplexity results: 0 (summary), 1 (per-token) (--ppl-output-type).",
-        ge=0,
-        le=1,
-        json_schema_extra={"example": 0},
-    )
 
     # ───── Parallel / Batch Execution ─────
     defrag_thold: Optional[float] = Field(
@@ -697,4 +647,43 @@ class LlamaCLIResponse(BaseModel):
         description="Output file for merged LoRA model (--output).",
         json_schema_extra={"example": "ggml-lora-merged-f16.gguf"},
     )
-    model_config = ConfigDict(extra="forbid")
\ No newline at end of file
+
+
+class LlamaTimings(BaseModel):
+    load_ms: Optional[float] = Field(None, description="Model load time reported by llama.cpp (ms).")
+    prompt_eval_ms: Optional[float] = Field(None, description="Time spent evaluating the prompt (ms).")
+    prompt_tokens: Optional[int] = Field(None, description="Prompt tokens evaluated.")
+    prompt_tokens_per_second: Optional[float] = Field(
+        None, description="Prompt evaluation throughput.", json_schema_extra={"example": 412.7}
+    )
+    eval_ms: Optional[float] = Field(None, description="Time spent generating tokens (ms).")
+    eval_tokens: Optional[int] = Field(None, description="Tokens generated.")
+    eval_tokens_per_second: Optional[float] = Field(
+        None, description="Generation throughput.", json_schema_extra={"example": 18.4}
+    )
+    sample_ms: Optional[float] = Field(None, description="Time spent sampling (ms).")
+    total_ms: Optional[float] = Field(None, description="Total time reported by llama.cpp (ms).")
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class LlamaCLIResponse(BaseModel):
+    output: str = Field(..., description="The raw response generated by the model.")
+    tokens_generated: Optional[int] = Field(None, description="Estimated number of tokens returned.")
+    execution_time_ms: Optional[int] = Field(None, description="Time taken to generate the response (ms).")
+    stop_reason: Optional[str] = Field(
+        None,
+        description="Why generation ended: 'eos', 'budget', 'stop_sequence', 'deadline' or 'cached'.",
+        json_schema_extra={"example": "stop_sequence"},
+    )
+    tokens_saved: Optional[int] = Field(
+        None,
+        description="Tokens of the generation budget left unspent because generation was stopped early.",
+        json_schema_extra={"example": 96},
+    )
+    timings: Optional[LlamaTimings] = Field(
+        None,
+        description="Per-phase timings and tokens per second reported by llama.cpp, when it printed them.",
+    )
+
+    model_config = ConfigDict(extra="forbid")
@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field, constr
+from typing import Optional, Annotated
+
+NonEmptyStr = constr(min_length=1)
+
+class SessionCreateRequest(BaseModel):
+    content: Annotated[
+        NonEmptyStr,
+        Field(
+            description="Document to ingest once; follow-up questions reuse its evaluated state",
+            json_schema_extra={"example": "Discharge summary: patient admitted with community-acquired pneumonia ..."}
+        )
+    ]
+
+class SessionQuestionRequest(BaseModel):
+    question: Annotated[
+        NonEmptyStr,
+        Field(
+            description="Follow-up question about the session's document",
+            json_schema_extra={"example": "Which antibiotics were given?"}
+        )
+    ]
+    predict_tokens: Annotated[
+        Optional[int],
+        Field(
+            default=None,
+            ge=1,
+            description="Answer token budget (defaults to LLAMA_DEFAULT_PREDICT_TOKENS)",
+            json_schema_extra={"example": 256}
+        )
+    ]
+
+class SessionInfo(BaseModel):
+    session_id: Annotated[str, Field(description="Session id")]
+    created_at: Annotated[float, Field(description="Creation time (epoch seconds)")]
+    last_used: Annotated[float, Field(description="Last question time (epoch seconds)")]
+    turns: Annotated[int, Field(description="Questions answered so far")]
+    document_tokens: Annotated[int, Field(description="Approximate size of the ingested document")]
+    state_bytes: Annotated[int, Field(description="Size of the saved KV state on disk")]
@@ -0,0 +1,164 @@
+"""
+Micro-batching of concurrent requests onto multi-slot llama-server workers.
+
+With `settings.worker_slots > 1` every worker runs `--parallel <slots>
+--cont-batching`, so it decodes several sequences per forward pass. The
+`MicroBatcher` collects requests for up to `settings.batch_window_ms` (or until
+a batch fills a worker's slots), then hands the whole batch to one idle worker,
+where the requests run concurrently and are continuously batched by the server.
+Each caller still receives only its own output stream.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.services.worker_pool import WorkerPool, worker_pool
+
+
+class _Pending:
+    def __init__(self):
+        self.assigned: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class _Batch:
+    def __init__(self, size: int):
+        self.remaining = size
+        self.finished = asyncio.Event()
+
+    def done_one(self) -> None:
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.finished.set()
+
+
+class MicroBatcher:
+    """Groups requests arriving within a short window and runs each group on one worker.
+
+    Args:
+        pool (WorkerPool): Pool whose workers run the batches.
+        window_ms (Optional[float]): Collection window (defaults to `settings.batch_window_ms`).
+        max_batch (Optional[int]): Requests per batch (defaults to `settings.worker_slots`).
+    """
+
+    def __init__(self, pool: WorkerPool, window_ms: Optional[float] = None, max_batch: Optional[int] = None):
+        self.pool = pool
+        self._window_ms = window_ms
+        self._max_batch = max_batch
+        self._queue: list[_Pending] = []
+        self._arrived: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._batches: set[asyncio.Task] = set()
+        self.counters = {"batches": 0, "requests": 0, "largest_batch": 0}
+
+    @property
+    def window_ms(self) -> float:
+        return self._window_ms if self._window_ms is not None else settings.batch_window_ms
+
+    @property
+    def max_batch(self) -> int:
+        return self._max_batch or settings.worker_slots
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool.started and self.max_batch > 1
+
+    async def stream(self, prompt: str, options: Optional[dict] = None, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        """
+        Streams a prompt's output once its batch has been placed on a worker.
+        Same contract as `WorkerPool.stream_prompt`.
+        """
+        pending = _Pending()
+        self._queue.append(pending)
+        self._ensure_dispatcher()
+        self._arrived.set()
+        try:
+            worker, batch = await pending.assigned
+        except asyncio.CancelledError:
+            if pending in self._queue:
+                self._queue.remove(pending)
+            elif pending.assigned.done() and not pending.assigned.cancelled():
+                pending.assigned.result()[1].done_one()
+            raise
+
+        try:
+            async for chunk in worker.stream(prompt, options, usage):
+                yield chunk
+        finally:
+            batch.done_one()
+
+    def _ensure_dispatcher(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._arrived = asyncio.Event()
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._queue:
+                self._arrived.clear()
+                await self._arrived.wait()
+                continue
+            # Let the batch fill up for at most one window
+            deadline = loop.time() + self.window_ms / 1000
+            while len(self._queue) < self.max_batch and loop.time() < deadline:
+                self._arrived.clear()
+                try:
+                    await asyncio.wait_for(self._arrived.wait(), timeout=deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+
+            # Requests keep accumulating while every worker is busy
+            lease = self.pool.acquire()
+            try:
+                worker = await lease.__aenter__()
+            except Exception as e:
+                # No worker can take a batch (e.g. all of them restarting): fail the waiting
+                # requests rather than leaving them unresolved, and keep dispatching
+                logger.warning("Cannot dispatch %d batched request(s): %s", len(self._queue), e)
+                failed, self._queue = self._queue, []
+                for pending in failed:
+                    if not pending.assigned.done():
+                        pending.assigned.set_exception(e)
+                continue
+            members, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            if not members:
+                await lease.__aexit__(None, None, None)
+                continue
+            batch = _Batch(len(members))
+            for pending in members:
+                if pending.assigned.cancelled():
+                    batch.done_one()
+                else:
+                    pending.assigned.set_result((worker, batch))
+            worker.resident_session = None
+            self.counters["batches"] += 1
+            self.counters["requests"] += len(members)
+            self.counters["largest_batch"] = max(self.counters["largest_batch"], len(members))
+            logger.debug("Dispatching batch of %d request(s) to worker %d", len(members), worker.index)
+
+            task = asyncio.ensure_future(self._release_when_done(lease, batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    @staticmethod
+    async def _release_when_done(lease, batch: _Batch) -> None:
+        try:
+            await batch.finished.wait()
+        finally:
+            await lease.__aexit__(None, None, None)
+
+    def stats(self) -> dict[str, Any]:
+        batches = self.counters["batches"]
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "window_ms": self.window_ms,
+            "max_batch": self.max_batch,
+            "mean_batch_size": round(self.counters["requests"] / batches, 2) if batches else 0.0,
+            "queued": len(self._queue),
+        }
+
+
+# Singleton-like batcher in front of the shared worker pool
+micro_batcher = MicroBatcher(worker_pool)
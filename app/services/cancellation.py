@@ -0,0 +1,82 @@
+"""
+Accounting for inference that was stopped because nobody wants the answer any more.
+
+`app.middleware.CancellationMiddleware` cancels the request handler when the
+client disconnects or its `X-Request-Deadline` passes. The cancellation unwinds
+through `_execute_stream`, which closes the output source: a llama-cli process
+group is killed, a llama-server request is dropped (the server then abandons the
+slot's generation). `_execute_stream` reports each cancelled generation here with
+an estimate of the CPU time it would still have spent on its token budget.
+"""
+import os
+from typing import Any, Optional
+
+from app.config.logging_config import logger
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def process_cpu_seconds(pid: Optional[int]) -> Optional[float]:
+    """User + system CPU time of a running process, from `/proc`; None where unavailable."""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read().decode("ascii", errors="replace")
+    except OSError:
+        return None
+    # Fields after the parenthesised command name; utime and stime are the 12th and 13th
+    fields = stat.rsplit(")", 1)[-1].split()
+    try:
+        return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    except (IndexError, ValueError):
+        return None
+
+
+def reclaimed_cpu_seconds(
+    cores: Optional[float],
+    decode_seconds: float,
+    tokens_generated: int,
+    tokens_remaining: int,
+) -> float:
+    """
+    Estimates the CPU time a cancelled generation would still have used.
+
+    Args:
+        cores (Optional[float]): CPU seconds per second the backend process used while
+            decoding, if measurable (one core is assumed otherwise).
+        decode_seconds (float): Seconds from the first output chunk to the cancellation.
+        tokens_generated (int): Tokens produced before the cancellation.
+        tokens_remaining (int): Unused part of the token budget.
+
+    Returns:
+        float: Remaining budget x observed seconds per token x cores; 0 when no token
+        was produced yet, since the decode rate is then unknown.
+    """
+    if tokens_remaining <= 0 or tokens_generated <= 0 or decode_seconds <= 0:
+        return 0.0
+    return (cores or 1.0) * decode_seconds / tokens_generated * tokens_remaining
+
+
+class CancellationStats:
+    """Counts cancelled requests by reason and the CPU time their cancellation saved."""
+
+    def __init__(self):
+        self.counters = {"client_disconnects": 0, "deadlines_expired": 0, "generations_cancelled": 0}
+        self.reclaimed_cpu_seconds = 0.0
+
+    def record_request(self, reason: str) -> None:
+        key = "client_disconnects" if reason == "disconnect" else "deadlines_expired"
+        self.counters[key] += 1
+
+    def record_generation(self, reclaimed: float) -> None:
+        self.counters["generations_cancelled"] += 1
+        self.reclaimed_cpu_seconds += reclaimed
+        logger.info("Cancelled in-flight generation; ~%.1f CPU-seconds reclaimed", reclaimed)
+
+    def stats(self) -> dict[str, Any]:
+        return {**self.counters, "reclaimed_cpu_seconds": round(self.reclaimed_cpu_seconds, 3)}
+
+
+# Singleton-like counters shared by the middleware and the inference path
+cancellation_stats = CancellationStats()
@@ -0,0 +1,114 @@
+import asyncio
+from typing import AsyncIterator, Optional, Sequence
+
+from app.config.logging_config import logger
+from app.utils.text_utils import estimate_tokens
+
+STOP_EOS = "eos"
+STOP_BUDGET = "budget"
+STOP_SEQUENCE = "stop_sequence"
+STOP_DEADLINE = "deadline"
+STOP_CACHED = "cached"
+
+
+class GenerationGuard:
+    """Watches a generation stream and ends it as soon as a stop condition is met.
+
+    The backend is asked to honour the same limits (`--predict`, `--reverse-prompt`,
+    `n_predict`/`stop`), but llama-cli keeps going after a reverse prompt outside
+    interactive mode, so the output is also checked here:
+
+    - stop sequences: output is cut right before the first match; text that could
+      be the start of a stop sequence is held back until it is disambiguated.
+    - deadline: the stream is abandoned once the wall-clock limit passes.
+
+    When `watch()` returns early the caller closes the source, which terminates the
+    process (or drops the worker connection) and stops spending decode time.
+
+    Args:
+        stop_sequences (Sequence[str]): Strings that end generation.
+        budget_tokens (int): The `--predict` budget, used to report `tokens_saved`.
+        deadline_s (Optional[float]): Wall-clock limit in seconds from the first read.
+        echo_prefix (str): Text the backend echoes before generating (llama-cli prints
+            the prompt); it is passed through but never scanned or counted.
+    """
+
+    def __init__(
+        self,
+        stop_sequences: Sequence[str] = (),
+        budget_tokens: int = 0,
+        deadline_s: Optional[float] = None,
+        echo_prefix: str = "",
+    ):
+        self.stop_sequences = [s for s in stop_sequences if s]
+        self.budget_tokens = budget_tokens
+        self.deadline_s = deadline_s
+        self.echo_length = len(echo_prefix)
+        self.stop_reason: Optional[str] = None
+        self._text = ""
+
+    @property
+    def text(self) -> str:
+        """Everything passed through so far, including the echoed prompt."""
+        return self._text
+
+    @property
+    def generated_text(self) -> str:
+        return self._text[self.echo_length:]
+
+    @property
+    def tokens_generated(self) -> int:
+        return estimate_tokens(self.generated_text)
+
+    @property
+    def tokens_saved(self) -> int:
+        if self.stop_reason in (STOP_SEQUENCE, STOP_DEADLINE):
+            return max(self.budget_tokens - self.tokens_generated, 0)
+        return 0
+
+    def _find_stop(self, start: int) -> int:
+        positions = [self._text.find(s, start) for s in self.stop_sequences]
+        hits = [p for p in positions if p >= 0]
+        return min(hits) if hits else -1
+
+    async def watch(self, source: AsyncIterator[str]) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline_s if self.deadline_s is not None else None
+        hold_back = max((len(s) for s in self.stop_sequences), default=1) - 1
+        sent = 0
+        iterator = source.__aiter__()
+
+        while True:
+            try:
+                if deadline is None:
+                    chunk = await iterator.__anext__()
+                else:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=max(deadline - loop.time(), 0))
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                logger.info("Generation deadline of %.1fs reached; stopping early", self.deadline_s)
+                self.stop_reason = STOP_DEADLINE
+                break
+
+            self._text += chunk
+            if self.stop_sequences:
+                match = self._find_stop(max(sent - hold_back, self.echo_length))
+                if match >= 0:
+                    if match > sent:
+                        yield self._text[sent:match]
+                    self._text = self._text[:match]
+                    self.stop_reason = STOP_SEQUENCE
+                    logger.debug("Stop sequence reached after ~%d tokens", self.tokens_generated)
+                    return
+                safe_end = max(sent, min(len(self._text), max(self.echo_length, len(self._text) - hold_back)))
+            else:
+                safe_end = len(self._text)
+            if safe_end > sent:
+                yield self._text[sent:safe_end]
+                sent = safe_end
+
+        if sent < len(self._text):
+            yield self._text[sent:]
+        if self.stop_reason is None:
+            self.stop_reason = STOP_BUDGET if self.tokens_generated >= self.budget_tokens else STOP_EOS
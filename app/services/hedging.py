@@ -0,0 +1,175 @@
+"""
+Hedged requests against slow llama-server workers.
+
+A request that has not produced its first token within the
+`settings.hedge_percentile` of recent time-to-first-token is duplicated onto
+another idle worker. Whichever copy produces a token first is streamed to the
+caller; the other is closed, which makes its llama-server abandon the
+generation.
+
+Hedges are budgeted so they cannot amplify load during overload: each request
+earns `settings.hedge_budget_ratio` of a hedge (at most `HEDGE_BURST` can be
+saved up), a hedge is only sent to a worker that is idle right now, and none
+are sent while requests are queued for an inference slot.
+"""
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.services.scheduler import inference_gate
+from app.services.worker_pool import LlamaServerWorker, WorkerPool, worker_pool
+
+# Most hedges the budget can accumulate while traffic is healthy
+HEDGE_BURST = 5.0
+
+_END = object()
+
+
+class _Attempt:
+    """One copy of a request streaming from one worker into a queue."""
+
+    def __init__(self, worker: LlamaServerWorker, prompt: str, options: Optional[dict]):
+        self.worker = worker
+        self.usage: dict = {}
+        self.chunks = 0
+        self.error: Optional[Exception] = None
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.first = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(prompt, options))
+
+    async def _pump(self, prompt: str, options: Optional[dict]) -> None:
+        try:
+            async for chunk in self.worker.stream(prompt, options, self.usage):
+                self.chunks += 1
+                self.queue.put_nowait(chunk)
+                self.first.set()
+            self.queue.put_nowait(_END)
+        except Exception as e:
+            self.error = e
+            self.queue.put_nowait(e)
+        finally:
+            self.first.set()
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None and self.chunks == 0
+
+    async def cancel(self) -> None:
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+
+class Hedger:
+    """Streams prompts from the pool, hedging the ones whose first token is late.
+
+    Args:
+        pool (WorkerPool): Pool whose workers serve the request and its hedge.
+    """
+
+    def __init__(self, pool: WorkerPool):
+        self.pool = pool
+        self.ttft: deque[float] = deque(maxlen=1024)
+        self._budget = HEDGE_BURST
+        self.counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "skipped_budget": 0, "skipped_busy": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.hedge_enabled and self.pool.started and len(self.pool.workers) > 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for a first token before hedging; None until enough TTFTs were observed."""
+        if len(self.ttft) < settings.hedge_min_samples:
+            return None
+        ordered = sorted(self.ttft)
+        return ordered[min(int(settings.hedge_percentile / 100 * len(ordered)), len(ordered) - 1)]
+
+    def _start_hedge(self, prompt: str, options: Optional[dict]) -> Optional[_Attempt]:
+        if inference_gate.waiting:
+            self.counters["skipped_busy"] += 1
+            return None
+        if self._budget < 1:
+            self.counters["skipped_budget"] += 1
+            return None
+        worker = self.pool.try_acquire()
+        if worker is None:
+            self.counters["skipped_busy"] += 1
+            return None
+        self._budget -= 1
+        self.counters["hedged"] += 1
+        worker.resident_session = None
+        logger.debug("First token late; hedging request onto worker %d", worker.index)
+        return _Attempt(worker, prompt, options)
+
+    async def stream(self, prompt: str, options: Optional[dict] = None, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        """
+        Streams a prompt's output, hedged onto a second worker if its first token is late.
+        Same contract as `WorkerPool.stream_prompt`.
+        """
+        loop = asyncio.get_running_loop()
+        self.counters["requests"] += 1
+        self._budget = min(self._budget + settings.hedge_budget_ratio, HEDGE_BURST)
+        delay = self.hedge_delay()
+
+        async with self.pool.acquire() as primary:
+            primary.resident_session = None
+            started = loop.time()
+            attempts = [_Attempt(primary, prompt, options)]
+            hedge_due = delay is not None
+            try:
+                while True:
+                    ready = [a for a in attempts if a.first.is_set()]
+                    winner = next((a for a in ready if not a.failed), None)
+                    if winner is None and len(ready) == len(attempts):
+                        winner = attempts[0]
+                    if winner is not None:
+                        break
+                    waits = [asyncio.ensure_future(a.first.wait()) for a in attempts if not a.first.is_set()]
+                    timeout = max(started + delay - loop.time(), 0) if hedge_due else None
+                    done, _ = await asyncio.wait(waits, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    for wait in waits:
+                        wait.cancel()
+                    if not done and hedge_due:
+                        hedge_due = False
+                        hedge = self._start_hedge(prompt, options)
+                        if hedge is not None:
+                            attempts.append(hedge)
+
+                if not winner.failed:
+                    self.ttft.append(loop.time() - started)
+                if winner is not attempts[0]:
+                    self.counters["hedge_wins"] += 1
+                for attempt in attempts:
+                    if attempt is not winner:
+                        await attempt.cancel()
+                if usage is not None:
+                    usage.update(winner.usage)
+
+                while True:
+                    item = await winner.queue.get()
+                    if item is _END:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+                if usage is not None:
+                    usage.update(winner.usage)
+            finally:
+                for attempt in attempts:
+                    await attempt.cancel()
+                    if attempt.worker is not primary:
+                        self.pool.release(attempt.worker)
+
+    def stats(self) -> dict[str, Any]:
+        delay = self.hedge_delay()
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "hedge_delay_ms": round(delay * 1000, 1) if delay is not None else None,
+            "budget": round(self._budget, 2),
+        }
+
+
+# Singleton-like hedger in front of the shared worker pool
+hedger = Hedger(worker_pool)
@@ -0,0 +1,281 @@
+import asyncio
+from typing import AsyncIterator, Optional, Union
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.schemas.llama_inference_schema import LlamaCLIResponse, LlamaInferenceParameters
+from app.services.batching import micro_batcher
+from app.services.cancellation import cancellation_stats, process_cpu_seconds, reclaimed_cpu_seconds
+from app.services.generation import STOP_CACHED, STOP_DEADLINE, GenerationGuard
+from app.services.hedging import hedger
+from app.services.llama_argv import compile_argv, compile_server_options
+from app.services.llama_runner import LlamaExecutionError, LlamaRunner
+from app.services.prefix_cache import parse_session_reuse, prefix_cache
+from app.services.response_cache import cache_key, is_cacheable, response_cache
+from app.services.scheduler import estimate_cost, inference_gate, priority_lane
+from app.services.singleflight import inflight
+from app.services.supervisor import circuit_breaker
+from app.services.timings import parse_cli_timings, server_timings, timing_stats
+from app.services.tracing import add_llama_timings, add_span, annotate
+from app.services.worker_pool import worker_pool
+from app.utils.text_utils import estimate_tokens
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Canonicalises a prompt so that trivially different copies of a document
+    (CRLF vs LF line endings, trailing whitespace) map to the same request.
+
+    Only used for the cache/single-flight key: the model always gets the prompt
+    as it was sent.
+    """
+    lines = prompt.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+class ExecutionPlan:
+    """Decides how a single request is executed and under which key it is cached/coalesced.
+
+    Requests go to the persistent worker pool when it is running and every option
+    they set can be passed in a `/completion` body; load-time flags (threads, KV
+    cache types, mlock, another model, ...) need a fresh llama-cli spawn.
+
+    Every execution carries a generation budget (`predict_tokens`, or
+    `settings.default_predict_tokens` for plain prompts), plus the request's stop
+    sequences and deadline, which are both passed to the backend and enforced on
+    the output stream by a `GenerationGuard`.
+    """
+
+    def __init__(self, prompt: str, params: Optional[LlamaInferenceParameters] = None, verbose: bool = False):
+        self.prompt = prompt
+        self.verbose = verbose
+        self.model_path = (params.model_path if params is not None else None) or settings.model_path
+        if params is not None:
+            self.argv = compile_argv(params)
+            # Per-request llama-cli flags: a nonzero exit may be llama-cli rejecting them.
+            # A generation budget alone (--predict) is always accepted
+            self.custom_flags = any(arg.startswith("--") and arg != "--predict" for arg in self.argv)
+            self.server_options, needs_cli = compile_server_options(params)
+            needs_cli = needs_cli or self.model_path != settings.model_path
+            self.budget_tokens = params.predict_tokens or settings.default_predict_tokens
+            self.stop_sequences = list(params.reverse_prompt or [])
+            self.deadline_s = params.deadline_ms / 1000 if params.deadline_ms else None
+            self.echoes_prompt = not params.no_display_prompt
+        else:
+            self.argv, self.server_options, needs_cli = [], {}, False
+            self.custom_flags = False
+            self.budget_tokens = settings.default_predict_tokens
+            self.stop_sequences = []
+            self.deadline_s = None
+            self.echoes_prompt = True
+        if "--predict" not in self.argv:
+            self.argv += ["--predict", str(self.budget_tokens)]
+        self.server_options.setdefault("n_predict", self.budget_tokens)
+        self.lane = priority_lane.get()
+        self.cost = estimate_cost(estimate_tokens(self.prompt), self.budget_tokens)
+        self.use_pool = worker_pool.started and not needs_cli
+
+        key_params = {
+            "backend": "server" if self.use_pool else "cli",
+            "ctx_size": settings.context_size,
+            "gpu_layers": settings.gpu_layers,
+            "main_gpu": settings.main_gpu,
+            "numa": settings.numa,
+            "argv": self.argv,
+            "server_options": self.server_options,
+            "seed": params.seed if params is not None else None,
+            "temperature": params.temperature if params is not None else None,
+        }
+        self.key = cache_key(normalize_prompt(prompt), self.model_path, key_params) if is_cacheable(key_params) else None
+
+        # Prompts built from a registered template reuse the template's evaluated prefix
+        self.template = prefix_cache.match(self.prompt)
+        if self.template is not None:
+            self.server_options["cache_prompt"] = True
+
+    def runner(self) -> LlamaRunner:
+        return LlamaRunner(binary_path=settings.llama_cli_path, model_path=self.model_path)
+
+    def guard(self) -> GenerationGuard:
+        # llama-cli echoes the prompt on stdout; resident workers return only the completion
+        echo_prefix = self.prompt if self.echoes_prompt and not self.use_pool else ""
+        return GenerationGuard(self.stop_sequences, self.budget_tokens, self.deadline_s, echo_prefix)
+
+
+async def _execute_stream(plan: ExecutionPlan) -> AsyncIterator[Union[str, LlamaCLIResponse]]:
+    """Runs `plan` on its backend, yielding text pieces and finally a `LlamaCLIResponse`."""
+    guard = plan.guard()
+    loop = asyncio.get_running_loop()
+    logger.debug("Waiting for inference slot (in_flight=%d, waiting=%d)", inference_gate.in_flight, inference_gate.waiting)
+    usage: dict = {}
+    circuit_breaker.check()
+    async with inference_gate.admit(plan.lane, plan.cost):
+        started = loop.time()
+        annotate(backend="llama-server" if plan.use_pool else "llama-cli")
+        if plan.use_pool and micro_batcher.enabled:
+            source = micro_batcher.stream(plan.prompt, plan.server_options, usage)
+        elif plan.use_pool and hedger.enabled:
+            source = hedger.stream(plan.prompt, plan.server_options, usage)
+        elif plan.use_pool:
+            source = worker_pool.stream_prompt(plan.prompt, plan.server_options, usage)
+        else:
+            runner = plan.runner()
+            extra_args = plan.argv
+            if plan.template is not None:
+                extra_args = await prefix_cache.cli_args(plan.template, runner) + extra_args
+            source = await runner.open_stream(plan.prompt, verbose=plan.verbose, extra_args=extra_args)
+            usage["pid"] = source.pid
+        cpu_before = None
+        first_chunk_at = None
+        try:
+            async for chunk in guard.watch(source):
+                if first_chunk_at is None:
+                    first_chunk_at = loop.time()
+                    cpu_before = process_cpu_seconds(usage.get("pid"))
+                yield chunk
+        except LlamaExecutionError as e:
+            # Only backend faults count against the breaker, not requests the backend rejected
+            if e.backend_fault or (not plan.custom_flags and not guard.generated_text):
+                circuit_breaker.record_failure()
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            # The caller went away mid-generation: account for the work closing the source saves
+            now = loop.time()
+            decode_seconds = now - first_chunk_at if first_chunk_at is not None else 0.0
+            cpu_now = process_cpu_seconds(usage.get("pid"))
+            cores = None
+            if cpu_now is not None and cpu_before is not None and decode_seconds:
+                cores = (cpu_now - cpu_before) / decode_seconds
+            cancellation_stats.record_generation(reclaimed_cpu_seconds(
+                cores, decode_seconds, guard.tokens_generated, plan.budget_tokens - guard.tokens_generated
+            ))
+            raise
+        finally:
+            await source.aclose()
+            add_span("inference", loop.time() - started)
+    circuit_breaker.record_success()
+
+    if plan.template is not None:
+        reused = usage.get("tokens_cached") if plan.use_pool else parse_session_reuse(source.stderr)
+        prefix_cache.record(plan.template, reused)
+    timings = server_timings(usage.get("timings")) if plan.use_pool else parse_cli_timings(source.stderr)
+    timing_stats.record(timings)
+    add_llama_timings(timings)
+
+    result = LlamaCLIResponse(
+        output=guard.text.strip(),
+        tokens_generated=timings.eval_tokens if timings and timings.eval_tokens is not None else guard.tokens_generated,
+        execution_time_ms=int((loop.time() - started) * 1000),
+        stop_reason=guard.stop_reason,
+        tokens_saved=guard.tokens_saved,
+        timings=timings,
+    )
+    if guard.tokens_saved:
+        logger.info("Generation stopped early (%s); ~%d budgeted tokens saved", guard.stop_reason, guard.tokens_saved)
+    # A deadline cuts the output short depending on load, not on the inputs: never cache that
+    if plan.key is not None and settings.response_cache_enabled and guard.stop_reason != STOP_DEADLINE:
+        await response_cache.aput(plan.key, result.model_dump())
+    yield result
+
+
+async def _execute(plan: ExecutionPlan) -> LlamaCLIResponse:
+    result = None
+    async for item in _execute_stream(plan):
+        if isinstance(item, LlamaCLIResponse):
+            result = item
+    return result
+
+
+async def _cached_response(plan: ExecutionPlan) -> Optional[LlamaCLIResponse]:
+    if plan.key is None or not settings.response_cache_enabled:
+        return None
+    cached = await response_cache.aget(plan.key)
+    if cached is None:
+        return None
+    logger.debug("Response cache hit for key %s", plan.key)
+    annotate(cache="hit")
+    return LlamaCLIResponse(**{**cached, "stop_reason": STOP_CACHED, "execution_time_ms": 0, "tokens_saved": 0, "timings": None})
+
+
+async def generate(
+    prompt: str,
+    verbose: bool = False,
+    params: Optional[LlamaInferenceParameters] = None,
+) -> LlamaCLIResponse:
+    """
+    Runs a prompt through the active inference backend without blocking the event loop.
+
+    Requests whose normalised prompts and options match are answered from the
+    response cache, and concurrent ones share a single execution.
+    Otherwise the prompt goes to the persistent worker pool when it is running, or
+    to a llama-cli spawn. At most `settings.max_inflight_requests` executions run
+    concurrently; the rest wait their turn.
+
+    Args:
+        prompt (str): The text prompt to send to the model.
+        verbose (bool): Passed through to llama-cli when spawning a process.
+        params (Optional[LlamaInferenceParameters]): Per-request options; only the options it sets are forwarded.
+
+    Returns:
+        LlamaCLIResponse: The output plus why generation stopped and how much budget it saved.
+    """
+    plan = ExecutionPlan(prompt, params, verbose)
+    cached = await _cached_response(plan)
+    if cached is not None:
+        return cached
+
+    if plan.key is not None and settings.singleflight_enabled:
+        return await inflight.do(plan.key, lambda: _execute(plan))
+    return await _execute(plan)
+
+
+async def run_inference(
+    prompt: str,
+    verbose: bool = False,
+    params: Optional[LlamaInferenceParameters] = None,
+) -> str:
+    """
+    Same as `generate`, returning only the generated text.
+    """
+    return (await generate(prompt, verbose, params)).output
+
+
+async def stream_inference(
+    prompt: str,
+    verbose: bool = False,
+    params: Optional[LlamaInferenceParameters] = None,
+) -> AsyncIterator[Union[str, LlamaCLIResponse]]:
+    """
+    Streams generated text from the active inference backend as it is produced.
+
+    Holds an inference slot for the lifetime of the stream. Closing the generator
+    before it is exhausted (e.g. on client disconnect) stops the underlying
+    llama-cli process or abandons the worker's generation, unless other identical
+    requests are still attached to the same execution. A response cache hit is
+    replayed as a single chunk; completed streams are added to the cache.
+
+    Args:
+        prompt (str): The text prompt to send to the model.
+        verbose (bool): Passed through to llama-cli when spawning a process.
+        params (Optional[LlamaInferenceParameters]): Per-request options; only the options it sets are forwarded.
+
+    Yields:
+        str: Pieces of generated text, in order, followed by one final
+        `LlamaCLIResponse` describing the whole generation.
+    """
+    plan = ExecutionPlan(prompt, params, verbose)
+    cached = await _cached_response(plan)
+    if cached is not None:
+        yield cached.output
+        yield cached
+        return
+
+    if plan.key is not None and settings.singleflight_enabled:
+        source = inflight.stream(plan.key, lambda: _execute_stream(plan))
+    else:
+        source = _execute_stream(plan)
+    try:
+        async for item in source:
+            yield item
+    finally:
+        await source.aclose()
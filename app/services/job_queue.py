@@ -0,0 +1,332 @@
+"""
+Persistent background queue for summarization jobs.
+
+Jobs are stored in a local SQLite database (`settings.job_db_path`), so they
+survive API restarts: on start-up, jobs that were running when the process died
+are put back in the queue and picked up again. `settings.job_worker_count`
+asyncio workers take queued jobs oldest-first and run them through the
+map-reduce summarizer in the "batch" priority lane of the inference gate.
+
+A job hit by a transient backend error (open circuit breaker, no healthy
+worker, full admission queue, worker crash or timeout) goes back to the queue
+and is retried after an exponential backoff, up to `settings.job_max_attempts`
+runs; other errors fail it right away.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.services.llama_runner import LlamaExecutionError
+from app.services.scheduler import LANE_BATCH, QueueFullError, lane
+from app.services.supervisor import BackendUnavailableError
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+FINAL_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    content TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    retry_at REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+"""
+
+_SUMMARY_COLUMNS = "id, status, error, attempts, retry_at, created_at, started_at, finished_at"
+
+# Longest delay between two runs of a job that keeps hitting transient errors
+_MAX_RETRY_BACKOFF = 300.0
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether `error` may go away on retry: the backend was unavailable or failed, not the request."""
+    if isinstance(error, (BackendUnavailableError, QueueFullError)):
+        return True
+    return isinstance(error, LlamaExecutionError) and error.backend_fault
+
+
+class JobQueue:
+    """SQLite-backed job store plus the asyncio workers that drain it.
+
+    All database access goes through one connection guarded by a lock and runs in
+    a worker thread (`asyncio.to_thread`), so the event loop never blocks on disk.
+
+    Args:
+        db_path (Optional[str]): SQLite file (defaults to `settings.job_db_path`).
+        worker_count (Optional[int]): Concurrent jobs (defaults to `settings.job_worker_count`).
+    """
+
+    def __init__(self, db_path: Optional[str] = None, worker_count: Optional[int] = None):
+        self.db_path = db_path
+        self.worker_count = worker_count
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: list[asyncio.Task] = []
+        self._running: dict[str, asyncio.Task] = {}
+        self._cancel_requested: set[str] = set()
+
+    # ───── Storage ─────
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            path = Path(self.db_path or settings.job_db_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Databases created before retries existed lack the column
+            if "retry_at" not in {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}:
+                conn.execute("ALTER TABLE jobs ADD COLUMN retry_at REAL")
+            self._conn = conn
+        return self._conn
+
+    def _query(self, sql: str, args: Sequence[Any] = ()) -> list[dict]:
+        with self._lock:
+            rows = self._connect().execute(sql, args).fetchall()
+        return [dict(row) for row in rows]
+
+    def _execute(self, sql: str, args: Sequence[Any] = ()) -> int:
+        with self._lock:
+            return self._connect().execute(sql, args).rowcount
+
+    async def _run(self, fn, *args):
+        return await asyncio.to_thread(fn, *args)
+
+    def _claim_next(self) -> Optional[dict]:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id, content, attempts + 1 AS attempt FROM jobs "
+                    "WHERE status = ? AND (retry_at IS NULL OR retry_at <= ?) ORDER BY created_at LIMIT 1",
+                    (STATUS_QUEUED, time.time()),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        (STATUS_RUNNING, time.time(), row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return dict(row) if row is not None else None
+
+    def _next_retry_in(self) -> Optional[float]:
+        """Seconds until the earliest backed-off job may run again, or None if there is none."""
+        now = time.time()
+        rows = self._query(
+            "SELECT MIN(retry_at) AS retry_at FROM jobs WHERE status = ? AND retry_at > ?", (STATUS_QUEUED, now)
+        )
+        retry_at = rows[0]["retry_at"]
+        return retry_at - now if retry_at is not None else None
+
+    def _requeue(self, job_id: str, error: str, retry_at: float) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, retry_at = ? WHERE id = ? AND status = ?",
+            (STATUS_QUEUED, error, retry_at, job_id, STATUS_RUNNING),
+        )
+
+    def _finish(self, job_id: str, status: str, result: Optional[str] = None, error: Optional[str] = None) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND status = ?",
+            (status, result, error, time.time(), job_id, STATUS_RUNNING),
+        )
+
+    # ───── Public API ─────
+    async def submit(self, contents: Sequence[str]) -> list[str]:
+        """
+        Queues one job per document.
+
+        Returns:
+            list[str]: The new job ids, in the order of `contents`.
+        """
+        now = time.time()
+        ids = [uuid.uuid4().hex for _ in contents]
+        rows = [(job_id, STATUS_QUEUED, content, now + i * 1e-6) for i, (job_id, content) in enumerate(zip(ids, contents))]
+
+        def insert():
+            with self._lock:
+                self._connect().executemany(
+                    "INSERT INTO jobs (id, status, content, created_at) VALUES (?, ?, ?, ?)", rows
+                )
+
+        await self._run(insert)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        logger.info("Queued %d summarization job(s)", len(ids))
+        return ids
+
+    async def get(self, job_id: str, include_result: bool = True) -> Optional[dict]:
+        columns = _SUMMARY_COLUMNS + (", result" if include_result else "")
+        rows = await self._run(self._query, f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    async def results(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        finished_after: Optional[float] = None,
+        limit: int = 100,
+    ) -> list[dict]:
+        """
+        Fetches finished jobs with their results, either by id or in order of completion.
+
+        Args:
+            ids (Optional[Sequence[str]]): Specific jobs to fetch (any status).
+            finished_after (Optional[float]): Only jobs finished after this epoch time; pass the
+                last `finished_at` seen to page through a backfill.
+            limit (int): Maximum number of jobs returned.
+        """
+        columns = _SUMMARY_COLUMNS + ", result"
+        if ids:
+            placeholders = ", ".join("?" for _ in ids)
+            sql = f"SELECT {columns} FROM jobs WHERE id IN ({placeholders}) ORDER BY created_at LIMIT ?"
+            args = [*ids, limit]
+        else:
+            placeholders = ", ".join("?" for _ in FINAL_STATUSES)
+            sql = (
+                f"SELECT {columns} FROM jobs WHERE status IN ({placeholders}) AND finished_at > ? "
+                "ORDER BY finished_at LIMIT ?"
+            )
+            args = [*FINAL_STATUSES, finished_after or 0.0, limit]
+        return await self._run(self._query, sql, args)
+
+    async def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancels a queued or running job.
+
+        Returns:
+            Optional[str]: The job's status after the call, or None if it does not exist.
+        """
+        task = self._running.get(job_id)
+        if task is not None:
+            logger.info("Cancelling running job %s", job_id)
+            self._cancel_requested.add(job_id)
+            task.cancel()
+        await self._run(
+            self._execute,
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+            (STATUS_CANCELLED, time.time(), job_id, STATUS_QUEUED, STATUS_RUNNING),
+        )
+        job = await self.get(job_id, include_result=False)
+        return job["status"] if job else None
+
+    async def stats(self) -> dict[str, Any]:
+        rows = await self._run(self._query, "SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")
+        return {
+            "workers": len(self._workers),
+            "running": len(self._running),
+            **{row["status"]: row["count"] for row in rows},
+        }
+
+    # ───── Workers ─────
+    async def start(self) -> None:
+        """Re-queues jobs interrupted by a restart and starts the workers."""
+        requeued = await self._run(
+            self._execute, "UPDATE jobs SET status = ? WHERE status = ?", (STATUS_QUEUED, STATUS_RUNNING)
+        )
+        if requeued:
+            logger.info("Resuming %d job(s) interrupted by the last shutdown", requeued)
+        self._wakeup = asyncio.Event()
+        count = self.worker_count if self.worker_count is not None else settings.job_worker_count
+        self._workers = [asyncio.ensure_future(self._work(i)) for i in range(count)]
+        logger.info("Started %d job worker(s)", count)
+
+    async def stop(self) -> None:
+        """Stops the workers. Jobs they were running stay `running` and resume on the next start."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+    async def _work(self, index: int) -> None:
+        failures = 0
+        while True:
+            try:
+                job = await self._next_job()
+            except Exception as e:
+                # A database error (locked, I/O, ...) must not stop the worker for good
+                failures += 1
+                delay = min(settings.job_retry_backoff_seconds * 2 ** (failures - 1), _MAX_RETRY_BACKOFF)
+                logger.error("Job worker %d could not claim a job; retrying in %.0fs: %s", index, delay, e)
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            if job is not None:
+                await self._process(index, job)
+
+    async def _next_job(self) -> Optional[dict]:
+        """Claims the next due job, or waits for new work and returns None."""
+        job = await self._run(self._claim_next)
+        if job is not None:
+            return job
+        self._wakeup.clear()
+        # Re-check after clearing so a submit in between is not missed
+        job = await self._run(self._claim_next)
+        if job is None:
+            # Sleep until new work arrives or a backed-off job is due
+            retry_in = await self._run(self._next_retry_in)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=retry_in)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def _process(self, index: int, job: dict) -> None:
+        from app.services.summarizer import summarize
+
+        job_id = job["id"]
+        logger.info("Job worker %d running job %s", index, job_id)
+        # Backfills must not delay interactive requests (see app.services.scheduler)
+        with lane(LANE_BATCH):
+            task = asyncio.ensure_future(summarize(job["content"]))
+        self._running[job_id] = task
+        try:
+            summary = await task
+        except asyncio.CancelledError:
+            if job_id not in self._cancel_requested:
+                # The worker itself is being stopped; leave the job to resume on restart
+                raise
+            logger.info("Job %s cancelled", job_id)
+        except Exception as e:
+            if is_transient(e) and job["attempt"] < settings.job_max_attempts:
+                delay = min(settings.job_retry_backoff_seconds * 2 ** (job["attempt"] - 1), _MAX_RETRY_BACKOFF)
+                logger.warning("Job %s hit a transient backend error (attempt %d); retrying in %.0fs: %s",
+                               job_id, job["attempt"], delay, e)
+                await self._run(self._requeue, job_id, str(e), time.time() + delay)
+            else:
+                logger.error("Job %s failed: %s", job_id, e)
+                await self._run(self._finish, job_id, STATUS_FAILED, None, str(e))
+        else:
+            await self._run(self._finish, job_id, STATUS_SUCCEEDED, summary)
+        finally:
+            self._running.pop(job_id, None)
+            self._cancel_requested.discard(job_id)
+
+
+# Singleton-like queue used by the /jobs routes and the FastAPI lifespan
+job_queue = JobQueue()
@@ -0,0 +1,189 @@
+"""
+Compiles validated `LlamaInferenceParameters` into llama-cli arguments.
+
+The field-to-flag table is built once at import time from the schema itself: each
+field's description names its CLI flag (e.g. "(--temp)"). Compiling a request only
+walks the fields the caller actually set (`model_fields_set`), so unset options keep
+llama.cpp's (or our settings') defaults, and an explicitly set value is forwarded
+even when it equals the schema default (the runner's own flags may differ from it).
+
+Requests come from unauthenticated HTTP bodies, so only the options in
+`CLI_REQUEST_OPTIONS` (sampling, generation and a few numeric load-time
+settings) are compiled. Anything else, in particular options that take file
+paths or hosts (lookup caches, LoRA adapters, mmproj, images, RPC servers),
+is rejected with `UnsupportedOptionError`.
+"""
+import re
+from typing import Any, NamedTuple, Optional
+
+from app.schemas.llama_inference_schema import LlamaInferenceParameters
+
+_FLAG_PATTERN = re.compile(r"--[a-z][a-z0-9-]*")
+
+# Fields whose description does not name the flag
+FLAG_OVERRIDES = {
+    "ctx_size": "--ctx-size",
+    "gpu_layers": "--gpu-layers",
+    "main_gpu": "--main-gpu",
+    "numa": "--numa",
+    "verbose": "--verbose",
+    "seed": "--seed",
+    "pooling": "--pooling",
+    "attention": "--attention",
+}
+
+# Handled by the runner / inference service itself (prompt transport, model selection, deadline)
+RUNNER_FIELDS = frozenset({"prompt", "model_path", "deadline_ms"})
+
+# Options of other llama.cpp tools (cvector-generator, export-lora) that llama-cli rejects
+TOOL_ONLY_FIELDS = frozenset({
+    "cvector_output", "positive_file", "negative_file", "pca_batch", "pca_iter", "method",
+    "export_model_path", "export_threads", "export_output",
+})
+
+# Boolean fields whose default is True and which have an explicit negative flag
+NEGATED_FLAGS = {
+    "cont_batching": "--no-cont-batching",
+}
+
+# Per-request options a resident llama-server accepts in the /completion body
+SERVER_REQUEST_OPTIONS = {
+    "predict_tokens": "n_predict",
+    "reverse_prompt": "stop",
+    "seed": "seed",
+    "temperature": "temperature",
+    "top_k": "top_k",
+    "top_p": "top_p",
+    "min_p": "min_p",
+    "tail_free_sampling": "tfs_z",
+    "typical_p": "typical_p",
+    "repeat_last_n": "repeat_last_n",
+    "repeat_penalty": "repeat_penalty",
+    "presence_penalty": "presence_penalty",
+    "frequency_penalty": "frequency_penalty",
+    "dynatemp_range": "dynatemp_range",
+    "dynatemp_exp": "dynatemp_exponent",
+    "mirostat": "mirostat",
+    "mirostat_lr": "mirostat_eta",
+    "mirostat_ent": "mirostat_tau",
+    "xtc_probability": "xtc_probability",
+    "xtc_threshold": "xtc_threshold",
+    "top_n_sigma": "top_n_sigma",
+    "ignore_eos": "ignore_eos",
+}
+
+# Output-formatting options that have no effect on a server completion
+SERVER_IGNORED_FIELDS = frozenset({"verbose", "no_display_prompt", "color", "deadline_ms"})
+
+# Options a request may pass to llama-cli: the sampling/generation options above, output
+# formatting, and load-time settings that take numbers or fixed choices, never paths or hosts
+CLI_REQUEST_OPTIONS = frozenset(SERVER_REQUEST_OPTIONS) | SERVER_IGNORED_FIELDS | frozenset({
+    "ctx_size", "threads", "threads_batch", "no_kv_offload", "cache_type_k", "cache_type_v",
+    "defrag_thold", "mlock", "no_mmap", "run_time_repack",
+    "rope_scaling", "rope_scale", "rope_freq_base", "rope_freq_scale",
+    "yarn_orig_ctx", "yarn_ext_factor", "yarn_attn_factor", "yarn_beta_slow", "yarn_beta_fast",
+    "grp_attn_n", "grp_attn_w",
+}) - RUNNER_FIELDS
+
+
+class UnsupportedOptionError(ValueError):
+    """Raised when a request sets options that may not be passed per request."""
+
+    def __init__(self, fields: list[str]):
+        super().__init__(f"Options not accepted per request: {', '.join(fields)}")
+        self.fields = fields
+
+
+class FlagSpec(NamedTuple):
+    flag: str
+    negated_flag: Optional[str]
+
+
+def _build_flag_table() -> dict[str, FlagSpec]:
+    table = {}
+    for name, field in LlamaInferenceParameters.model_fields.items():
+        if name in RUNNER_FIELDS or name in TOOL_ONLY_FIELDS:
+            continue
+        flag = FLAG_OVERRIDES.get(name)
+        if flag is None:
+            match = _FLAG_PATTERN.search(field.description or "")
+            if match is None:
+                raise RuntimeError(f"No llama-cli flag known for LlamaInferenceParameters.{name}")
+            flag = match.group(0)
+        table[name] = FlagSpec(flag, NEGATED_FLAGS.get(name))
+    return table
+
+
+FLAG_TABLE: dict[str, FlagSpec] = _build_flag_table()
+_FIELD_ORDER = {name: index for index, name in enumerate(LlamaInferenceParameters.model_fields)}
+
+
+def _format(value: Any) -> str:
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def compile_argv(params: LlamaInferenceParameters) -> list[str]:
+    """
+    Turns the options a request set into llama-cli arguments.
+
+    Args:
+        params (LlamaInferenceParameters): A validated request.
+
+    Returns:
+        list[str]: Arguments to append after the runner's base command, in schema order.
+
+    Raises:
+        UnsupportedOptionError: If the request sets options outside `CLI_REQUEST_OPTIONS`.
+    """
+    rejected = sorted(params.model_fields_set - CLI_REQUEST_OPTIONS - RUNNER_FIELDS, key=_FIELD_ORDER.get)
+    if rejected:
+        raise UnsupportedOptionError(rejected)
+    argv: list[str] = []
+    for name in sorted(params.model_fields_set, key=_FIELD_ORDER.get):
+        spec = FLAG_TABLE.get(name)
+        if spec is None:
+            continue
+        value = getattr(params, name)
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            if value:
+                argv.append(spec.flag)
+            elif spec.negated_flag:
+                argv.append(spec.negated_flag)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, (tuple, list)):
+                    argv.extend([spec.flag, *(_format(part) for part in item)])
+                else:
+                    argv.extend([spec.flag, _format(item)])
+        else:
+            argv.extend([spec.flag, _format(value)])
+    return argv
+
+
+def compile_server_options(params: LlamaInferenceParameters) -> tuple[dict[str, Any], bool]:
+    """
+    Maps the options a request set onto a llama-server `/completion` body.
+
+    Returns:
+        tuple[dict, bool]: The request options, and whether the request also set
+        options a resident server cannot honour (load-time flags such as `threads`
+        or `mlock`, or a different model), which means it needs a llama-cli spawn.
+    """
+    options: dict[str, Any] = {}
+    needs_cli = False
+    for name in params.model_fields_set:
+        if name == "prompt" or name in SERVER_IGNORED_FIELDS:
+            continue
+        value = getattr(params, name)
+        if value is None:
+            continue
+        option = SERVER_REQUEST_OPTIONS.get(name)
+        if option is None:
+            needs_cli = True
+        else:
+            options[option] = value
+    return options, needs_cli
@@ -1,9 +1,35 @@
-import subprocess
+import asyncio
+import codecs
+import os
+import signal
 import shlex
-from typing import Optional
+import time
+from typing import Optional, Sequence
 from pathlib import Path
 from app.config.settings import settings
 from app.config.logging_config import logger
+from app.services.prompt_transport import PromptTransport, redact_command
+from app.services.metrics import SPAWN_SECONDS
+from app.services.tracing import add_span
+
+class LlamaExecutionError(RuntimeError):
+    """Raised when a generation fails on either backend.
+
+    Args:
+        message (str): What went wrong.
+        backend_fault (bool): True when the backend itself failed (crash, timeout,
+            unreachable worker), False when it rejected the request (e.g. invalid
+            per-request flags); only backend faults count against the circuit breaker.
+    """
+
+    def __init__(self, message: str, backend_fault: bool = True):
+        super().__init__(message)
+        self.backend_fault = backend_fault
+
+
+# (binary, model) pairs that passed `LlamaRunner.verify_paths`
+_verified_paths: set[tuple[Path, Path]] = set()
+
 
 class LlamaRunner:
     """Handles execution of the llama-cli binary with a given prompt and configuration.
@@ -17,44 +43,59 @@ class LlamaRunner:
         - numa: NUMA binding mode
     """
 
-    def __init__(self, binary_path: Optional[Path] = None):
+    def __init__(self, binary_path: Optional[Path] = None, model_path: Optional[Path] = None):
         self.binary_path = Path(binary_path) if binary_path else Path(settings.llama_cli_path)
-        self.model_path = Path(settings.model_path)
+        self.model_path = Path(model_path) if model_path else Path(settings.model_path)
         self.gpu_layers = settings.gpu_layers
         self.ctx_size = settings.context_size
         self.main_gpu = settings.main_gpu
         self.numa = settings.numa
 
-        logger.debug("Initialized LlamaRunner with config: "
-                     f"binary_path={self.binary_path}, model_path={self.model_path}, "
-                     f"gpu_layers={self.gpu_layers}, ctx_size={self.ctx_size}, "
-                     f"main_gpu={self.main_gpu}, numa={self.numa}")
+        logger.debug("Initialized LlamaRunner with config: binary_path=%s, model_path=%s, gpu_layers=%s, "
+                     "ctx_size=%s, main_gpu=%s, numa=%s", self.binary_path, self.model_path,
+                     self.gpu_layers, self.ctx_size, self.main_gpu, self.numa)
 
-    def run_prompt(self, prompt: str, verbose: bool = False, dry_run: bool = False) -> str:
+    def verify_paths(self) -> None:
         """
-        Executes llama-cli with the given prompt and configuration options.
-
-        Args:
-            prompt (str): The text prompt to send to the model.
-            verbose (bool): If True, includes '--verbose' flag in command.
-            dry_run (bool): If True, log the command and return a dummy string instead of executing.
-
-        Returns:
-            str: The model's generated output as a single string.
+        Verifies that the llama binary and model file exist, and remembers that they did.
 
         Raises:
             FileNotFoundError: If llama binary or model file is missing.
-            RuntimeError: If the llama-cli command fails.
         """
-        logger.debug("run_prompt() called with prompt=%r, verbose=%s, dry_run=%s", prompt, verbose, dry_run)
-
         if not self.binary_path.is_file():
             logger.error("Llama binary not found at path: %s", self.binary_path)
             raise FileNotFoundError(f"Llama binary not found: {self.binary_path}")
         if not self.model_path.is_file():
             logger.error("Model file not found at path: %s", self.model_path)
             raise FileNotFoundError(f"Model file not found: {self.model_path}")
+        _verified_paths.add((self.binary_path, self.model_path))
+
+    def _check_paths(self) -> None:
+        # Paths verified at startup (or by an earlier request) are not stat'ed again per call
+        if (self.binary_path, self.model_path) not in _verified_paths:
+            self.verify_paths()
+
+    def build_command(
+        self,
+        prompt: str,
+        verbose: bool = False,
+        extra_args: Sequence[str] = (),
+        prompt_args: Optional[Sequence[str]] = None,
+    ) -> list[str]:
+        """
+        Builds the llama-cli argument vector for the given prompt.
 
+        Args:
+            prompt (str): The text prompt to send to the model.
+            verbose (bool): If True, includes '--verbose' flag in command.
+            extra_args (Sequence[str]): Per-request flags (see `app.services.llama_argv`), appended
+                last so they take precedence over the settings-derived defaults.
+            prompt_args (Optional[Sequence[str]]): How the prompt is handed over (see
+                `PromptTransport`); defaults to `--prompt <prompt>`.
+
+        Returns:
+            list[str]: The command line, ready for subprocess execution.
+        """
         logger.debug("Using binary path: %s", self.binary_path)
         logger.debug("Using model path: %s", self.model_path)
         logger.debug("Using context size: %s", self.ctx_size)
@@ -65,45 +106,245 @@ class LlamaRunner:
         cmd = [
             str(self.binary_path),
             "-m", str(self.model_path),
-            "--prompt", prompt,
+            *(prompt_args if prompt_args is not None else ["--prompt", prompt]),
             "--ctx-size", str(self.ctx_size),
             "--gpu-layers", str(self.gpu_layers),
             "--main-gpu", str(self.main_gpu),
             "--numa", self.numa,
         ]
 
-        logger.debug("Built command: %s", " ".join(cmd))
+        logger.debug("Built command: %s", redact_command(cmd))
 
         if verbose:
             logger.debug("Verbose mode enabled; adding --verbose flag to command.")
             cmd.append("--verbose")
 
+        if extra_args:
+            logger.debug("Appending per-request arguments: %s", list(extra_args))
+            cmd.extend(extra_args)
+
+        return cmd
+
+    async def open_stream(
+        self,
+        prompt: str,
+        verbose: bool = False,
+        timeout: Optional[float] = None,
+        extra_args: Sequence[str] = (),
+    ) -> "LlamaStream":
+        """
+        Starts llama-cli and returns a `LlamaStream` over its incremental stdout.
+
+        The caller owns the stream and must `await stream.aclose()` when done; closing
+        a stream whose process is still running kills it. Large prompts are passed
+        through a tmpfs file or stdin (see `PromptTransport`); the file is removed
+        when the stream is closed.
+
+        Args:
+            prompt (str): The text prompt to send to the model.
+            verbose (bool): If True, includes '--verbose' flag in command.
+            timeout (Optional[float]): Overall wall-clock limit in seconds (defaults to `settings.cli_timeout`).
+            extra_args (Sequence[str]): Per-request llama-cli flags.
+
+        Raises:
+            FileNotFoundError: If llama binary or model file is missing.
+        """
+        self._check_paths()
+        transport = PromptTransport(prompt)
+        try:
+            cmd = self.build_command(prompt, verbose, extra_args, prompt_args=transport.args)
+            logger.info("Launching llama-cli subprocess (streaming)...")
+            spawn_started = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE if transport.stdin is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+            spawn_seconds = time.perf_counter() - spawn_started
+            SPAWN_SECONDS.observe(spawn_seconds)
+            add_span("spawn", spawn_seconds)
+        except BaseException:
+            transport.cleanup()
+            raise
+        return LlamaStream(
+            process,
+            timeout=timeout if timeout is not None else settings.cli_timeout,
+            transport=transport,
+        )
+
+    async def run_prompt_async(
+        self,
+        prompt: str,
+        verbose: bool = False,
+        dry_run: bool = False,
+        extra_args: Sequence[str] = (),
+    ) -> str:
+        """
+        Executes llama-cli with the given prompt without blocking the event loop.
+
+        The subprocess is driven through `asyncio.create_subprocess_exec`, so other
+        requests (e.g. `/health`, `/ping`) are served while the model generates.
+        On timeout or cancellation the llama-cli process is killed.
+
+        Args:
+            prompt (str): The text prompt to send to the model.
+            verbose (bool): If True, includes '--verbose' flag in command.
+            dry_run (bool): If True, log the command and return a dummy string instead of executing.
+            extra_args (Sequence[str]): Per-request llama-cli flags.
+
+        Returns:
+            str: The model's generated output as a single string.
+
+        Raises:
+            FileNotFoundError: If llama binary or model file is missing.
+            RuntimeError: If the llama-cli command fails or times out.
+        """
+        logger.debug("run_prompt_async() called with prompt of %d chars, verbose=%s, dry_run=%s", len(prompt), verbose, dry_run)
+
         if dry_run:
-            logger.debug("Dry run detected. Simulating execution.")
-            logger.info("[DRY RUN] Command that would have been executed: %s", " ".join(shlex.quote(arg) for arg in cmd))
-            logger.debug("Dry run enabled; skipping execution and returning placeholder output.")
-            logger.info("Dry run complete. Returning simulated output.")
+            self._check_paths()
+            cmd = self.build_command(prompt, verbose, extra_args)
+            logger.info("[DRY RUN] Command that would have been executed: %s", redact_command([shlex.quote(arg) for arg in cmd]))
             return "[DRY RUN] Llama output placeholder."
 
-        logger.info("Launching llama-cli subprocess...")
-        logger.debug("Subprocess command arguments: %s", cmd)
-        logger.debug("About to invoke subprocess with command.")
-
+        stream = await self.open_stream(prompt, verbose, extra_args=extra_args)
         try:
-            logger.debug("⏳ Timeout set to %s seconds", settings.cli_timeout)
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=settings.cli_timeout, check=True)
-            logger.debug("Subprocess finished with return code: %d", result.returncode)
-        except subprocess.CalledProcessError as e:
-            logger.error("Llama CLI failed with return code %d", e.returncode)
-            logger.error("Stdout:\n%s", e.stdout)
-            logger.error("Stderr:\n%s", e.stderr)
-            logger.debug("Exception raised: %s", str(e))
-            raise RuntimeError(f"Llama execution failed:\n{e.stderr}")
+            output = "".join([chunk async for chunk in stream])
+        finally:
+            await stream.aclose()
 
         logger.info("Llama CLI executed successfully")
-        logger.debug("Raw stdout:\n%s", result.stdout)
-        logger.debug("Raw stderr:\n%s", result.stderr)
-        logger.debug("Final output returned: %s", result.stdout.strip())
-        logger.debug("Returning output from run_prompt method.")
+        logger.debug("Raw stderr:\n%s", stream.stderr)
+        return output.strip()
+
+
+class LlamaStream:
+    """Async iterator over the stdout of a running llama-cli process.
+
+    Text is yielded as soon as llama-cli writes it, decoded incrementally so that
+    multi-byte characters split across reads are never mangled. stderr is drained
+    in the background to keep the pipe from filling up. When the prompt travels
+    over stdin it is written in the background as well, and a temporary prompt
+    file is removed as soon as the process has exited or the stream is closed.
+
+    Attributes:
+        ttft_ms (Optional[float]): Milliseconds from spawn to the first stdout chunk.
+        duration_ms (Optional[float]): Milliseconds from spawn to process exit.
+        returncode (Optional[int]): Exit status once the process has finished.
+        stderr (str): Collected stderr output, complete once iteration ends.
+    """
+
+    READ_SIZE = 4096
+
+    def __init__(
+        self,
+        process: asyncio.subprocess.Process,
+        timeout: float,
+        transport: Optional[PromptTransport] = None,
+    ):
+        self.process = process
+        self.timeout = timeout
+        self.transport = transport
+        self.ttft_ms: Optional[float] = None
+        self.duration_ms: Optional[float] = None
+        self._loop = asyncio.get_running_loop()
+        self._started = self._loop.time()
+        self._stderr_task = asyncio.ensure_future(process.stderr.read())
+        self._stderr = b""
+        self._stdin_task = None
+        if transport is not None and transport.stdin is not None:
+            self._stdin_task = asyncio.ensure_future(self._feed_stdin(transport.stdin))
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.process.returncode
+
+    @property
+    def stderr(self) -> str:
+        return self._stderr.decode("utf-8", errors="replace")
+
+    async def _feed_stdin(self, data: bytes) -> None:
+        try:
+            self.process.stdin.write(data)
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            logger.warning("llama-cli pid %s exited before reading the whole prompt", self.pid)
+        finally:
+            self.process.stdin.close()
+
+    def _release_prompt(self) -> None:
+        if self._stdin_task is not None and not self._stdin_task.done():
+            self._stdin_task.cancel()
+        if self.transport is not None:
+            self.transport.cleanup()
+
+    def _elapsed_ms(self) -> float:
+        return (self._loop.time() - self._started) * 1000
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        deadline = self._started + self.timeout
+        while True:
+            remaining = deadline - self._loop.time()
+            try:
+                data = await asyncio.wait_for(self.process.stdout.read(self.READ_SIZE), timeout=max(remaining, 0))
+            except asyncio.TimeoutError:
+                logger.error("Llama CLI timed out after %s seconds; killing pid %s", self.timeout, self.pid)
+                self.kill()
+                raise LlamaExecutionError(f"Llama execution timed out after {self.timeout} seconds")
+            if not data:
+                break
+            text = decoder.decode(data)
+            if text:
+                if self.ttft_ms is None:
+                    self.ttft_ms = self._elapsed_ms()
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+        await self.process.wait()
+        self._release_prompt()
+        self._stderr = await self._stderr_task
+        self.duration_ms = self._elapsed_ms()
+        if self.process.returncode != 0:
+            logger.error("Llama CLI failed with return code %d", self.process.returncode)
+            logger.error("Stderr:\n%s", self.stderr)
+            # Killed by a signal is a crash; a nonzero exit may just be llama-cli rejecting its arguments
+            raise LlamaExecutionError(f"Llama execution failed:\n{self.stderr}", backend_fault=self.process.returncode < 0)
+
+    def kill(self) -> None:
+        """
+        Kills the process immediately if it is still running. Never awaits.
+
+        The process runs in its own session, so the whole process group is killed;
+        wrapper scripts cannot leave children behind that keep the pipes open.
+        """
+        if self.process.returncode is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
 
-        return result.stdout.strip()
\ No newline at end of file
+    async def aclose(self) -> None:
+        """Stops the process (if still running) and reaps it."""
+        if self.process.returncode is None:
+            logger.info("Stopping llama-cli pid %s before completion", self.pid)
+        self.kill()
+        await self.process.wait()
+        self._release_prompt()
+        if not self._stderr_task.done():
+            # The whole process group is gone, so stderr reaches EOF almost immediately
+            try:
+                self._stderr = await asyncio.wait_for(self._stderr_task, timeout=1)
+            except asyncio.TimeoutError:
+                pass
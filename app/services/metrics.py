@@ -0,0 +1,174 @@
+"""
+Minimal Prometheus-compatible metrics registry.
+
+Recording is a dict lookup plus an integer/float add on the event loop thread,
+with no locks, so it is cheap enough for every request. Values that already
+live in the services (queue depth, cache hit ratios, rejection counters, ...)
+are not copied on the hot path at all: collectors registered with
+`MetricsRegistry.register_collector` read them when `/metrics` is scraped.
+
+Exposition follows the Prometheus text format (version 0.0.4).
+"""
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional, Sequence
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# A collected sample: (metric name suffix, labels, value)
+Sample = tuple[str, dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict[str, str]) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: tuple) -> dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> Iterable[Sample]:
+        return ()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        for key, value in self._values.items():
+            yield "_total", self._labels(key), value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def samples(self) -> Iterable[Sample]:
+        for key, (counts, total) in self._values.items():
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                yield "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield "_sum", labels, total
+            yield "_count", labels, cumulative
+
+
+class _Collected(_Metric):
+    def __init__(self, name: str, kind: str, help_text: str, samples: Iterable[Sample]):
+        super().__init__(name, help_text)
+        self.kind = kind
+        self._samples = list(samples)
+
+    def samples(self) -> Iterable[Sample]:
+        return self._samples
+
+
+class MetricsRegistry:
+    """Holds the hot-path metrics and the scrape-time collectors, and renders them."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[["MetricsRegistry"], Iterable[_Metric]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[["MetricsRegistry"], Iterable[_Metric]]) -> None:
+        """Adds a function called at scrape time that returns metrics built with `gauge`/`collected_counter`."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    @staticmethod
+    def gauge(name: str, help_text: str, values: Iterable[tuple[dict[str, str], Optional[float]]]) -> _Metric:
+        return _Collected(name, "gauge", help_text, (("", labels, v) for labels, v in values if v is not None))
+
+    @staticmethod
+    def collected_counter(name: str, help_text: str, values: Iterable[tuple[dict[str, str], Optional[float]]]) -> _Metric:
+        return _Collected(name, "counter", help_text, (("_total", labels, v) for labels, v in values if v is not None))
+
+    def render(self) -> str:
+        metrics = list(self._metrics.values())
+        for collector in self._collectors:
+            metrics.extend(collector(self))
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Singleton-like registry rendered by GET /metrics
+metrics = MetricsRegistry()
+
+REQUEST_LATENCY = metrics.histogram(
+    "medparswell_request_duration_seconds", "HTTP request latency by route.", ("route", "method", "status")
+)
+QUEUE_WAIT = metrics.histogram(
+    "medparswell_queue_wait_seconds", "Time requests waited for an inference slot.", ("lane",)
+)
+SPAWN_SECONDS = metrics.histogram(
+    "medparswell_llama_cli_spawn_seconds", "Time to spawn a llama-cli process."
+)
+MODEL_LOAD_SECONDS = metrics.histogram(
+    "medparswell_model_load_seconds", "Model load time (llama-server startup, llama-cli reported load).", ("backend",)
+)
+TOKENS_PER_SECOND = metrics.histogram(
+    "medparswell_tokens_per_second", "Per-request llama.cpp throughput.", ("phase",), buckets=RATE_BUCKETS
+)
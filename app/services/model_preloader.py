@@ -0,0 +1,224 @@
+"""
+Page-cache preloading of the model weights.
+
+llama.cpp memory-maps the GGUF, so after a deploy or a page-cache eviction the
+first generations fault the weights in from disk, one page at a time. At
+startup `ModelPreloader` walks `settings.model_path` and, for a split model
+(`...-00001-of-00003.gguf`), its sibling parts on a background thread:
+
+- `willneed`: maps each file and calls `madvise(MADV_WILLNEED)` on it chunk by
+  chunk, so the kernel reads it ahead in large sequential I/O;
+- `read`: reads each file sequentially, which guarantees the pages are cached
+  (as far as memory allows) at the cost of copying them once.
+
+`residency` reports how much of each file is in the page cache (`mincore`), via
+`GET /admin/model/residency`, to tell when an instance is hot. Where `mincore`
+is unavailable the resident figures are `None`.
+"""
+import ctypes
+import ctypes.util
+import mmap
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+
+PAGE_SIZE = mmap.PAGESIZE
+
+# Pages passed to one mincore call, to bound the size of its result vector
+_MINCORE_WINDOW = 1 << 18
+
+_SPLIT_NAME = re.compile(r"^(?P<stem>.+)-(?P<part>\d{5})-of-(?P<count>\d{5})\.gguf$")
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        libc.mmap.restype = ctypes.c_void_p
+        libc.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long]
+        libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+        libc.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.POINTER(ctypes.c_ubyte)]
+        _libc = libc
+    return _libc
+
+
+def model_files(model_path: str) -> list[Path]:
+    """
+    Returns the files of a model: all existing parts of a split GGUF, whichever
+    part `model_path` names, or `model_path` itself.
+    """
+    path = Path(model_path)
+    match = _SPLIT_NAME.match(path.name)
+    if not match:
+        return [path]
+    count = int(match["count"])
+    parts = [path.with_name(f"{match['stem']}-{i:05d}-of-{count:05d}.gguf") for i in range(1, count + 1)]
+    return [p for p in parts if p.is_file()]
+
+
+def resident_bytes(path: Path) -> Optional[int]:
+    """
+    Returns how many bytes of `path` are in the page cache, or None where
+    `mincore` is not available.
+    """
+    size = path.stat().st_size
+    if size == 0:
+        return 0
+    try:
+        libc = _load_libc()
+    except (OSError, AttributeError):
+        return None
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        address = libc.mmap(None, size, mmap.PROT_READ, mmap.MAP_SHARED, fd, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            logger.warning("Cannot map %s to check residency: %s", path, os.strerror(ctypes.get_errno()))
+            return None
+        try:
+            pages = (size + PAGE_SIZE - 1) // PAGE_SIZE
+            vector = (ctypes.c_ubyte * min(pages, _MINCORE_WINDOW))()
+            resident = 0
+            for first in range(0, pages, _MINCORE_WINDOW):
+                count = min(_MINCORE_WINDOW, pages - first)
+                length = min(count * PAGE_SIZE, size - first * PAGE_SIZE)
+                if libc.mincore(address + first * PAGE_SIZE, length, vector) != 0:
+                    logger.warning("mincore failed for %s: %s", path, os.strerror(ctypes.get_errno()))
+                    return None
+                # Only the lowest bit of each entry is defined ("page is resident")
+                resident += count - bytes(vector)[:count].count(0)
+        finally:
+            libc.munmap(address, size)
+    finally:
+        os.close(fd)
+    return min(resident * PAGE_SIZE, size)
+
+
+class ModelPreloader:
+    """Prefetches the model files into the page cache on a background thread."""
+
+    def __init__(self):
+        self.state = "idle"
+        self.mode: Optional[str] = None
+        self.error: Optional[str] = None
+        self.bytes_total = 0
+        self.bytes_done = 0
+        self.duration_ms: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, mode: Optional[str] = None) -> bool:
+        """
+        Starts prefetching `settings.model_path` unless that is already running.
+
+        Args:
+            mode (str, optional): `willneed`, `read` or `off`; defaults to `settings.preload_mode`.
+
+        Returns:
+            bool: Whether a preload was started.
+        """
+        mode = mode or settings.preload_mode
+        if mode == "off" or self.running:
+            return False
+        files = model_files(settings.model_path)
+        self.state, self.mode, self.error = "running", mode, None
+        self.bytes_total = sum(f.stat().st_size for f in files if f.is_file())
+        self.bytes_done = 0
+        self.duration_ms = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(files, mode), name="model-preloader", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """Asks a running preload to stop after its current chunk."""
+        self._stop.set()
+
+    def _run(self, files: list[Path], mode: str) -> None:
+        started = time.monotonic()
+        chunk = settings.preload_chunk_mb * 1024 * 1024
+        try:
+            for path in files:
+                if mode == "read":
+                    self._read(path, chunk)
+                else:
+                    self._advise(path, chunk)
+                if self._stop.is_set():
+                    break
+        except Exception as e:
+            self.state, self.error = "failed", str(e)
+            logger.warning("Model preload failed: %s", e)
+            return
+        finally:
+            self.duration_ms = round((time.monotonic() - started) * 1000, 1)
+        self.state = "stopped" if self._stop.is_set() else "done"
+        logger.info("Model preload (%s) %s: %d bytes in %.0f ms", mode, self.state, self.bytes_done, self.duration_ms)
+
+    def _advise(self, path: Path, chunk: int) -> None:
+        size = path.stat().st_size
+        if size == 0:
+            return
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            # Chunk offsets are multiples of the chunk size, hence page-aligned
+            for offset in range(0, size, chunk):
+                if self._stop.is_set():
+                    return
+                length = min(chunk, size - offset)
+                mapped.madvise(mmap.MADV_WILLNEED, offset, length)
+                self.bytes_done += length
+
+    def _read(self, path: Path, chunk: int) -> None:
+        buffer = bytearray(chunk)
+        with open(path, "rb", buffering=0) as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            while not self._stop.is_set():
+                read = f.readinto(buffer)
+                if not read:
+                    return
+                self.bytes_done += read
+
+    def residency(self) -> dict[str, Any]:
+        """
+        Reports the preload progress and the page-cache residency of every model file.
+
+        Returns:
+            dict: Preload `state`, `mode` and progress, the `files` with their size and
+            resident bytes, and the overall `resident_fraction`.
+        """
+        files = []
+        for path in model_files(settings.model_path):
+            if not path.is_file():
+                files.append({"path": str(path), "bytes": None, "resident_bytes": None})
+                continue
+            size = path.stat().st_size
+            files.append({"path": str(path), "bytes": size, "resident_bytes": resident_bytes(path)})
+        total = sum(f["bytes"] or 0 for f in files)
+        known = all(f["resident_bytes"] is not None for f in files)
+        resident = sum(f["resident_bytes"] for f in files) if known else None
+        return {
+            "state": self.state,
+            "mode": self.mode,
+            "error": self.error,
+            "bytes_total": self.bytes_total,
+            "bytes_done": self.bytes_done,
+            "duration_ms": self.duration_ms,
+            "files": files,
+            "resident_bytes": resident,
+            "resident_fraction": round(resident / total, 4) if known and total else None,
+        }
+
+
+# Singleton-like preloader started by the startup sequence
+model_preloader = ModelPreloader()
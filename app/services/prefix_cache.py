@@ -0,0 +1,168 @@
+"""
+Reuse of the evaluated KV state of shared prompt prefixes.
+
+Prompts built from a registered template share a long instruction preamble.
+Evaluating it again for every request wastes prompt-eval time, so:
+
+- llama-cli: the prefix is evaluated once per model and saved with
+  `--prompt-cache <file>`; later requests load it read-only
+  (`--prompt-cache <file> --prompt-cache-ro`) and only evaluate their own suffix.
+- llama-server workers: requests are sent with `cache_prompt: true`, so a slot
+  keeps the KV state of its previous prompt and reuses the common prefix.
+
+Hits and skipped prompt-eval tokens are taken from what llama.cpp reports
+(session-file messages on llama-cli stderr, `tokens_cached` from llama-server).
+"""
+import asyncio
+import hashlib
+import re
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.services.response_cache import model_identity
+
+_SESSION_MATCH = re.compile(r"session file matches (\d+) / (\d+) tokens of prompt")
+_SESSION_LOW_SIMILARITY = re.compile(r"low similarity to prompt \((\d+) / (\d+) tokens\)")
+_SESSION_LOADED = re.compile(r"loaded a session with prompt size of (\d+) tokens")
+
+
+class PromptTemplate(NamedTuple):
+    name: str
+    prefix: str
+
+
+def parse_session_reuse(stderr: str) -> Optional[int]:
+    """
+    Extracts how many prompt tokens llama-cli reused from a `--prompt-cache` file.
+
+    Returns:
+        Optional[int]: Reused tokens, 0 if the session did not match, or None if
+        llama-cli did not report on a session file at all.
+    """
+    match = _SESSION_MATCH.search(stderr) or _SESSION_LOW_SIMILARITY.search(stderr)
+    if match:
+        return int(match.group(1))
+    if "exact match for prompt" in stderr:
+        loaded = _SESSION_LOADED.search(stderr)
+        return int(loaded.group(1)) if loaded else None
+    if "session file does not exist" in stderr:
+        return 0
+    return None
+
+
+async def save_prompt_state(runner, prompt: str, path: Path) -> bool:
+    """
+    Evaluates `prompt` with llama-cli and saves the resulting KV state to `path`.
+
+    Args:
+        runner (LlamaRunner): Runner for the binary and model the state belongs to.
+        prompt (str): The text whose evaluated state is saved.
+        path (Path): Destination `--prompt-cache` file.
+
+    Returns:
+        bool: Whether llama-cli wrote the state file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    stream = await runner.open_stream(
+        prompt,
+        extra_args=["--prompt-cache", str(path), "--predict", "1", "--no-display-prompt"],
+    )
+    try:
+        async for _ in stream:
+            pass
+    except RuntimeError as e:
+        logger.warning("Saving prompt state to %s failed: %s", path, e)
+    finally:
+        await stream.aclose()
+    return path.is_file()
+
+
+class PrefixCache:
+    """Registry of prompt templates plus the per-model prefix state saved for them."""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self._cache_dir = cache_dir
+        self.templates: dict[str, PromptTemplate] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._unprimable: set[str] = set()
+        self.counters: dict[str, dict[str, int]] = {}
+
+    @property
+    def cache_dir(self) -> Path:
+        return Path(self._cache_dir or settings.prompt_cache_dir)
+
+    def register(self, name: str, prefix: str) -> PromptTemplate:
+        """Registers (or replaces) a template whose prompts all start with `prefix`."""
+        template = PromptTemplate(name, prefix.rstrip())
+        self.templates[name] = template
+        self.counters.setdefault(name, {"lookups": 0, "hits": 0, "prompt_tokens_skipped": 0})
+        return template
+
+    def match(self, prompt: str) -> Optional[PromptTemplate]:
+        """Returns the registered template with the longest prefix of `prompt`, if any."""
+        if not settings.prompt_cache_enabled:
+            return None
+        matches = [t for t in self.templates.values() if t.prefix and prompt.startswith(t.prefix)]
+        return max(matches, key=lambda t: len(t.prefix)) if matches else None
+
+    def path_for(self, template: PromptTemplate, model_path: str) -> Path:
+        identity = {"prefix": template.prefix, "model": model_identity(model_path), "ctx": settings.context_size}
+        digest = hashlib.sha256(repr(sorted(identity.items())).encode("utf-8")).hexdigest()[:24]
+        return self.cache_dir / f"{template.name}-{digest}.bin"
+
+    async def cli_args(self, template: PromptTemplate, runner) -> list[str]:
+        """
+        Returns the llama-cli flags that load `template`'s saved prefix state,
+        evaluating and saving the prefix first if that has not happened yet.
+
+        Args:
+            template (PromptTemplate): The matched template.
+            runner (LlamaRunner): Runner for the request's binary and model.
+
+        Returns:
+            list[str]: `--prompt-cache` flags, or an empty list if the state could not be saved.
+        """
+        path = self.path_for(template, str(runner.model_path))
+        if path.is_file():
+            return ["--prompt-cache", str(path), "--prompt-cache-ro"]
+        if str(path) in self._unprimable:
+            return []
+
+        lock = self._locks.setdefault(str(path), asyncio.Lock())
+        async with lock:
+            if not path.is_file() and str(path) not in self._unprimable:
+                logger.info("Evaluating prompt prefix %r once into %s", template.name, path)
+                if not await save_prompt_state(runner, template.prefix, path):
+                    logger.warning("llama-cli did not write a prompt cache for %r; prefix reuse disabled", template.name)
+                    self._unprimable.add(str(path))
+                    return []
+        return ["--prompt-cache", str(path), "--prompt-cache-ro"]
+
+    def record(self, template: PromptTemplate, tokens_reused: Optional[int]) -> None:
+        """Counts one request built from `template` and the prompt tokens it did not re-evaluate."""
+        counters = self.counters.setdefault(template.name, {"lookups": 0, "hits": 0, "prompt_tokens_skipped": 0})
+        counters["lookups"] += 1
+        if tokens_reused:
+            counters["hits"] += 1
+            counters["prompt_tokens_skipped"] += tokens_reused
+
+    def stats(self) -> dict[str, Any]:
+        lookups = sum(c["lookups"] for c in self.counters.values())
+        hits = sum(c["hits"] for c in self.counters.values())
+        return {
+            "enabled": settings.prompt_cache_enabled,
+            "lookups": lookups,
+            "hits": hits,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "prompt_tokens_skipped": sum(c["prompt_tokens_skipped"] for c in self.counters.values()),
+            "templates": {
+                name: {"prefix_chars": len(template.prefix), **self.counters.get(name, {})}
+                for name, template in self.templates.items()
+            },
+        }
+
+
+# Singleton-like registry shared by every inference entry point
+prefix_cache = PrefixCache()
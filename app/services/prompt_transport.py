@@ -0,0 +1,117 @@
+"""
+Chooses how a prompt reaches llama-cli.
+
+Small prompts go on the command line (`--prompt`). Large ones would hit the
+per-argument limit (`MAX_ARG_STRLEN`, 128 KiB on Linux) and would be copied into
+every process listing and `/proc/<pid>/cmdline`, so they are written to a private
+file on tmpfs (`--file`) or, when no writable tmpfs is available, piped through
+stdin (`--file /dev/stdin`).
+"""
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+
+TRANSPORT_ARGV = "argv"
+TRANSPORT_FILE = "file"
+TRANSPORT_STDIN = "stdin"
+
+_DEFAULT_TMPFS = "/dev/shm"
+
+
+def _prompt_dir() -> Optional[str]:
+    directory = settings.prompt_tmp_dir or _DEFAULT_TMPFS
+    if os.path.isdir(directory) and os.access(directory, os.W_OK):
+        return directory
+    return None
+
+
+def choose_transport(prompt: str, mode: Optional[str] = None) -> str:
+    """
+    Resolves the transport for a prompt.
+
+    Args:
+        prompt (str): The prompt to send.
+        mode (Optional[str]): "auto", "argv", "file" or "stdin"; defaults to `settings.prompt_transport`.
+
+    Returns:
+        str: The concrete transport ("argv", "file" or "stdin").
+    """
+    mode = mode or settings.prompt_transport
+    if mode != "auto":
+        return mode
+    if len(prompt.encode("utf-8")) <= settings.prompt_argv_max_bytes:
+        return TRANSPORT_ARGV
+    return TRANSPORT_FILE if _prompt_dir() is not None else TRANSPORT_STDIN
+
+
+class PromptTransport:
+    """A prompt prepared for one llama-cli invocation.
+
+    Attributes:
+        mode (str): "argv", "file" or "stdin".
+        args (list[str]): Arguments that hand the prompt to llama-cli.
+        stdin (Optional[bytes]): Data to write to the process's stdin, if any.
+        path (Optional[Path]): The temporary prompt file, if any.
+
+    `cleanup()` removes the temporary file and is safe to call more than once;
+    the transport is also a context manager for synchronous callers.
+    """
+
+    def __init__(self, prompt: str, mode: Optional[str] = None):
+        self.mode = choose_transport(prompt, mode)
+        self.size = len(prompt.encode("utf-8"))
+        self.stdin: Optional[bytes] = None
+        self.path: Optional[Path] = None
+
+        if self.mode == TRANSPORT_ARGV:
+            self.args = ["--prompt", prompt]
+        elif self.mode == TRANSPORT_FILE:
+            directory = _prompt_dir()
+            if directory is None:
+                raise RuntimeError("No writable directory for prompt files; set LLAMA_PROMPT_TMP_DIR")
+            # mkstemp creates the file 0600, so other users cannot read the record
+            fd, name = tempfile.mkstemp(prefix="medparswell-prompt-", suffix=".txt", dir=directory)
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(prompt)
+            self.path = Path(name)
+            self.args = ["--file", name]
+        elif self.mode == TRANSPORT_STDIN:
+            self.stdin = prompt.encode("utf-8")
+            self.args = ["--file", "/dev/stdin"]
+        else:
+            raise ValueError(f"Unknown prompt transport: {self.mode}")
+        logger.debug("Prompt of %d bytes passed via %s", self.size, self.mode)
+
+    def cleanup(self) -> None:
+        if self.path is not None:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+    def __enter__(self) -> "PromptTransport":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.cleanup()
+
+
+def redact_command(cmd: list[str]) -> str:
+    """
+    Renders a command line for logging with the prompt text replaced by its size.
+    """
+    shown = []
+    hide_next = False
+    for arg in cmd:
+        if hide_next:
+            shown.append(f"<prompt: {len(arg.encode('utf-8'))} bytes>")
+            hide_next = False
+        else:
+            shown.append(arg)
+            hide_next = arg in ("--prompt", "-p")
+    return " ".join(shown)
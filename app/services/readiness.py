@@ -0,0 +1,136 @@
+"""
+Startup sequence and readiness.
+
+The FastAPI lifespan runs `Startup.run` in the background, so the process
+answers `GET /livez` while it loads:
+
+1. verify: the llama-cli binary and model file are checked once; requests then
+   skip the per-call checks (see `LlamaRunner.verify_paths`). The model files
+   are then prefetched into the page cache in the background
+   (`app.services.model_preloader`).
+2. backend: the llama-server worker pool and its supervisor are started when
+   `settings.worker_count > 0`.
+3. warm-up (`settings.warmup_enabled`): every `settings.warmup_prompts` prompt is
+   run once per worker, or once through llama-cli, and the prefixes of the
+   registered prompt templates are evaluated (saved for llama-cli, left in the
+   slot's KV cache on workers), so the first real request finds the model
+   mapped and its caches primed.
+
+`GET /readyz` answers 200 only once this has finished and the backend can
+serve (see `backend_health`), so a load balancer holds traffic until then. A
+failed warm-up prompt is logged but does not keep the instance unready; a
+missing binary/model or a backend that did not start does.
+"""
+import asyncio
+import time
+from typing import Any, Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.services.llama_runner import LlamaRunner
+from app.services.model_preloader import model_preloader
+from app.services.prefix_cache import prefix_cache
+from app.services.supervisor import backend_health, worker_supervisor
+from app.services.worker_pool import worker_pool
+
+PHASE_STARTING = "starting"
+PHASE_VERIFYING = "verifying"
+PHASE_STARTING_BACKEND = "starting_backend"
+PHASE_WARMING = "warming"
+PHASE_READY = "ready"
+PHASE_FAILED = "failed"
+
+
+class Startup:
+    """Runs the startup sequence once and reports how far it got."""
+
+    def __init__(self):
+        self.phase = PHASE_STARTING
+        self.error: Optional[str] = None
+        self.started_at = time.monotonic()
+        self.ready_after_ms: Optional[float] = None
+        self.warmup = {"prompts": 0, "templates": 0, "failures": 0, "duration_ms": None}
+
+    async def run(self) -> None:
+        self.started_at = time.monotonic()
+        try:
+            self.phase = PHASE_VERIFYING
+            LlamaRunner().verify_paths()
+            # Prefetching the weights overlaps with the workers loading them
+            model_preloader.start()
+            if settings.worker_count > 0:
+                self.phase = PHASE_STARTING_BACKEND
+                await worker_pool.start()
+                await worker_supervisor.start()
+            if settings.warmup_enabled:
+                self.phase = PHASE_WARMING
+                await self.warm_up()
+        except Exception as e:
+            self.phase = PHASE_FAILED
+            self.error = str(e)
+            logger.error("❌ Startup failed; instance stays unready: %s", e)
+            return
+        self.phase = PHASE_READY
+        self.ready_after_ms = round((time.monotonic() - self.started_at) * 1000, 1)
+        logger.info("✅ Ready to serve after %.0f ms", self.ready_after_ms)
+
+    async def warm_up(self) -> None:
+        """Runs the warm-up prompts and primes the prompt-template prefixes."""
+        # The summarizer registers its templates on import; importing it here also
+        # takes that import off the first /summarize request
+        import app.services.summarizer  # noqa: F401
+
+        started = time.monotonic()
+        budget = settings.warmup_predict_tokens
+        templates = list(prefix_cache.templates.values()) if settings.prompt_cache_enabled else []
+        if worker_pool.started:
+            # Workers are leased through the pool so warm-up never overlaps a request
+            async with worker_pool.acquire_all() as workers:
+                results = await asyncio.gather(*(
+                    worker.complete(prompt, {"n_predict": budget, "cache_prompt": True})
+                    for worker in workers
+                    for prompt in [*settings.warmup_prompts, *(t.prefix for t in templates)]
+                ), return_exceptions=True)
+        else:
+            runner = LlamaRunner()
+            results = await asyncio.gather(
+                *(runner.run_prompt_async(prompt, extra_args=["--predict", str(budget)])
+                  for prompt in settings.warmup_prompts),
+                *(prefix_cache.cli_args(template, runner) for template in templates),
+                return_exceptions=True,
+            )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning("Warm-up request failed: %s", result)
+        self.warmup.update(
+            prompts=len(settings.warmup_prompts),
+            templates=len(templates),
+            failures=sum(isinstance(r, Exception) for r in results),
+            duration_ms=round((time.monotonic() - started) * 1000, 1),
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.phase == PHASE_READY
+
+    def report(self) -> dict[str, Any]:
+        """
+        Reports whether this instance should receive traffic.
+
+        Returns:
+            dict: `ready`, the startup `phase` (and `error` if it failed), warm-up
+            figures, and the backend status from `backend_health`.
+        """
+        backend = backend_health()
+        return {
+            "ready": self.ready and backend["status"] != "unavailable",
+            "phase": self.phase,
+            "error": self.error,
+            "ready_after_ms": self.ready_after_ms,
+            "warmup": self.warmup,
+            "backend": backend["status"],
+        }
+
+
+# Singleton-like startup state, run by the FastAPI lifespan
+startup = Startup()
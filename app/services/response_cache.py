@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+
+
+def model_identity(model_path: str) -> dict:
+    """
+    Identifies a model file by path, size and modification time.
+
+    Replacing the GGUF on disk changes its identity and therefore every cache key
+    derived from it, without having to hash multi-GB weights.
+    """
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return {"path": str(model_path)}
+    return {"path": str(model_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def cache_key(prompt: str, model_path: str, params: dict) -> str:
+    """
+    Builds a content-addressed key for an inference request.
+
+    Args:
+        prompt (str): The exact prompt sent to the model.
+        model_path (str): Path of the model that would serve the request.
+        params (dict): Every parameter that can influence the output (sampling, seed, context, backend).
+
+    Returns:
+        str: Hex SHA-256 digest of the canonicalised request.
+    """
+    payload = json.dumps(
+        {"prompt": prompt, "model": model_identity(model_path), "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(params: dict) -> bool:
+    """
+    Returns False for requests that explicitly ask for non-reproducible output,
+    i.e. a random seed (`seed=-1`) combined with a non-zero temperature.
+    """
+    return not (params.get("seed") == -1 and (params.get("temperature") or 0) > 0)
+
+
+class ResponseCache:
+    """Two-tier cache of generated outputs keyed by `cache_key`.
+
+    - Memory tier: bounded LRU (`settings.response_cache_max_entries`).
+    - Disk tier (optional, `settings.response_cache_dir`): one JSON file per entry,
+      expired after `settings.response_cache_ttl` seconds and evicted oldest-first
+      once the directory exceeds `settings.response_cache_max_bytes`.
+
+    Disk hits are promoted into memory. Hit/miss counters are exposed via `stats()`.
+
+    `aget`/`aput` run in worker threads, so `get`, `put` and `clear` hold a lock
+    while they touch the LRU, the disk index and the byte count.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        ttl_seconds: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self._max_entries = max_entries
+        self._cache_dir = cache_dir
+        self._ttl_seconds = ttl_seconds
+        self._max_bytes = max_bytes
+        self._memory: OrderedDict[str, Any] = OrderedDict()
+        self._disk_index: Optional[dict[str, tuple[int, float]]] = None
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    # Unset options follow the settings, which are only read on first use
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries if self._max_entries is not None else settings.response_cache_max_entries
+
+    @property
+    def cache_dir(self) -> Optional[Path]:
+        directory = self._cache_dir if self._cache_dir is not None else settings.response_cache_dir
+        return Path(directory) if directory else None
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self._ttl_seconds if self._ttl_seconds is not None else settings.response_cache_ttl
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes if self._max_bytes is not None else settings.response_cache_max_bytes
+
+    # ───── Memory tier ─────
+    def _memory_get(self, key: str) -> Optional[Any]:
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, key: str, value: Any) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    # ───── Disk tier ─────
+    def _path_for(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _load_disk_index(self) -> dict[str, tuple[int, float]]:
+        if self._disk_index is None:
+            self._disk_index = {}
+            self._disk_bytes = 0
+            if self.cache_dir.is_dir():
+                for path in self.cache_dir.glob("*/*.json"):
+                    stat = path.stat()
+                    self._disk_index[path.stem] = (stat.st_size, stat.st_mtime)
+                    self._disk_bytes += stat.st_size
+        return self._disk_index
+
+    def _disk_remove(self, key: str) -> None:
+        index = self._load_disk_index()
+        size, _ = index.pop(key, (0, 0.0))
+        self._disk_bytes -= size
+        try:
+            self._path_for(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _disk_get(self, key: str) -> Optional[Any]:
+        index = self._load_disk_index()
+        if key not in index:
+            return None
+        _, written_at = index[key]
+        if time.time() - written_at > self.ttl_seconds:
+            self.counters["expired"] += 1
+            self._disk_remove(key)
+            return None
+        try:
+            return json.loads(self._path_for(key).read_text(encoding="utf-8"))["output"]
+        except (OSError, ValueError, KeyError):
+            logger.warning("Dropping unreadable response cache entry %s", key)
+            self._disk_remove(key)
+            return None
+
+    def _disk_put(self, key: str, value: Any) -> None:
+        index = self._load_disk_index()
+        path = self._path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A temp file of its own, so concurrent writers of one key cannot clobber each other's
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+                tmp_file.write(json.dumps({"output": value}))
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        if key in index:
+            self._disk_bytes -= index[key][0]
+        size = path.stat().st_size
+        index[key] = (size, time.time())
+        self._disk_bytes += size
+
+        if self._disk_bytes > self.max_bytes:
+            for old_key, _ in sorted(index.items(), key=lambda item: item[1][1]):
+                if self._disk_bytes <= self.max_bytes:
+                    break
+                self._disk_remove(old_key)
+                self.counters["evictions"] += 1
+
+    # ───── Public API ─────
+    def get(self, key: str) -> Optional[Any]:
+        """Looks a key up in memory, then on disk. Counts the hit or miss."""
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[Any]:
+        value = self._memory_get(key)
+        if value is not None:
+            self.counters["memory_hits"] += 1
+            return value
+        if self.cache_dir is not None:
+            value = self._disk_get(key)
+            if value is not None:
+                self.counters["disk_hits"] += 1
+                self._memory_put(key, value)
+                return value
+        self.counters["misses"] += 1
+        return None
+
+    def put(self, key: str, value: Any) -> None:
+        """Stores a JSON-serialisable response in every enabled tier."""
+        with self._lock:
+            self._memory_put(key, value)
+            if self.cache_dir is not None:
+                self._disk_put(key, value)
+            self.counters["stores"] += 1
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """`get` that moves disk I/O off the event loop."""
+        if self.cache_dir is None or key in self._memory:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, value: Any) -> None:
+        """`put` that moves disk I/O off the event loop."""
+        if self.cache_dir is None:
+            self.put(key, value)
+        else:
+            await asyncio.to_thread(self.put, key, value)
+
+    def clear(self) -> None:
+        """Drops every entry from both tiers. Counters are kept."""
+        with self._lock:
+            self._memory.clear()
+            if self.cache_dir is not None:
+                for key in list(self._load_disk_index()):
+                    self._disk_remove(key)
+
+    def stats(self) -> dict[str, Any]:
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_max_entries": self.max_entries,
+            "disk_enabled": self.cache_dir is not None,
+            "disk_entries": len(self._disk_index or {}),
+            "disk_bytes": self._disk_bytes,
+            "disk_max_bytes": self.max_bytes,
+        }
+
+
+# Singleton-like cache shared by every inference entry point
+response_cache = ResponseCache()
@@ -0,0 +1,285 @@
+"""
+Admission control for inference executions.
+
+At most `settings.max_inflight_requests` executions run at once. When a slot
+frees up, the waiting request with the lowest score is admitted:
+
+    score = cost + lane penalty - aging rate * seconds waited
+
+- cost: estimated work, prompt tokens plus `DECODE_COST_FACTOR` x the token budget,
+  so short jobs go first within a lane (shortest-job-first);
+- lane penalty: `settings.scheduler_batch_penalty_tokens` for the "batch" lane,
+  0 for "interactive", so clinician requests overtake backfills;
+- aging: every second of waiting lowers the score by
+  `settings.scheduler_aging_tokens_per_second`, so long or batch jobs are never
+  starved.
+
+The lane comes from the `priority_lane` context variable; `/jobs` workers run in
+the batch lane, everything else is interactive by default.
+
+Backpressure: routes call `check_capacity()` before doing any work, which raises
+`QueueFullError` (HTTP 429 with `Retry-After`) once `settings.max_queue_depth`
+requests are waiting or the estimated queue time exceeds
+`settings.max_queue_wait_seconds`. Requests whose client deadline
+(`X-Request-Deadline`) has passed are dropped with `DeadlineExceededError`
+instead of being admitted.
+"""
+import asyncio
+import contextvars
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.services.metrics import QUEUE_WAIT
+from app.services.tracing import add_span
+
+LANE_INTERACTIVE = "interactive"
+LANE_BATCH = "batch"
+LANES = (LANE_INTERACTIVE, LANE_BATCH)
+
+# Generating a token costs several times more than evaluating a prompt token
+DECODE_COST_FACTOR = 4
+
+priority_lane: contextvars.ContextVar[str] = contextvars.ContextVar("priority_lane", default=LANE_INTERACTIVE)
+# Absolute client deadline (epoch seconds) of the request being served, if it sent one
+request_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a request is shed because the inference queue is over its limits."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(RuntimeError):
+    """Raised when a request's client deadline passed before it could be admitted."""
+
+
+@contextmanager
+def lane(name: str) -> Iterator[None]:
+    """Runs the enclosed inference calls (and the tasks they spawn) in the given lane."""
+    if name not in LANES:
+        raise ValueError(f"Unknown priority lane: {name}")
+    token = priority_lane.set(name)
+    try:
+        yield
+    finally:
+        priority_lane.reset(token)
+
+
+def estimate_cost(prompt_tokens: int, predict_tokens: int) -> int:
+    return prompt_tokens + DECODE_COST_FACTOR * predict_tokens
+
+
+class _Waiter:
+    def __init__(self, lane_name: str, cost: int, enqueued: float, deadline: Optional[float]):
+        self.lane = lane_name
+        self.cost = cost
+        self.enqueued = enqueued
+        self.deadline = deadline
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class _LaneStats:
+    def __init__(self):
+        self.admitted = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.recent: deque[float] = deque(maxlen=1024)
+
+    def record(self, wait_ms: float) -> None:
+        self.admitted += 1
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.recent.append(wait_ms)
+
+    def summary(self) -> dict[str, Any]:
+        recent = sorted(self.recent)
+        return {
+            "admitted": self.admitted,
+            "mean_wait_ms": round(self.total_wait_ms / self.admitted, 1) if self.admitted else 0.0,
+            "p95_wait_ms": round(recent[int(0.95 * (len(recent) - 1))], 1) if recent else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 1),
+        }
+
+
+class _Admission:
+    def __init__(self, gate: "InferenceGate", lane_name: Optional[str], cost: int):
+        self._gate = gate
+        self._lane = lane_name
+        self._cost = cost
+
+    async def __aenter__(self) -> "InferenceGate":
+        await self._gate.acquire(self._lane, self._cost)
+        self._started = time.monotonic()
+        return self._gate
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._gate.release(self._cost, time.monotonic() - self._started)
+
+
+class InferenceGate:
+    """Bounds the number of inference executions running at the same time.
+
+    The limit comes from `settings.max_inflight_requests`. Callers beyond the limit
+    wait without blocking the event loop, so cheap endpoints keep responding while
+    inference saturates the CPU. `async with gate:` admits in the caller's lane at
+    zero cost; `async with gate.admit(lane, cost):` passes a cost estimate.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        self._limit = limit
+        self._waiters: list[_Waiter] = []
+        self.in_flight = 0
+        self.lane_stats = {name: _LaneStats() for name in LANES}
+        # Observed execution seconds per unit of estimated cost (EWMA)
+        self.seconds_per_cost: Optional[float] = None
+        self._in_flight_cost = 0
+        self.counters = {"shed_queue_depth": 0, "shed_queue_time": 0, "dropped_expired": 0}
+
+    @property
+    def limit(self) -> int:
+        return self._limit if self._limit is not None else settings.max_inflight_requests
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def admit(self, lane_name: Optional[str] = None, cost: int = 0) -> _Admission:
+        return _Admission(self, lane_name, cost)
+
+    def _score(self, waiter: _Waiter, now: float) -> float:
+        penalty = settings.scheduler_batch_penalty_tokens if waiter.lane == LANE_BATCH else 0
+        return waiter.cost + penalty - settings.scheduler_aging_tokens_per_second * (now - waiter.enqueued)
+
+    def estimated_wait_seconds(self) -> Optional[float]:
+        """Time until a newly queued request would start, from observed throughput; None until measured."""
+        if self.seconds_per_cost is None:
+            return None
+        queued_cost = self._in_flight_cost + sum(w.cost for w in self._waiters)
+        return queued_cost * self.seconds_per_cost / self.limit
+
+    def check_capacity(self, deadline: Optional[float] = None) -> None:
+        """
+        Sheds a new request early if the queue is over its depth or time limit.
+
+        Args:
+            deadline (Optional[float]): The client's deadline (epoch seconds), if it sent one.
+
+        Raises:
+            QueueFullError: With a `retry_after` (seconds) based on the estimated queue time.
+            DeadlineExceededError: If the deadline has passed or would pass while queued.
+        """
+        estimate = self.estimated_wait_seconds()
+        if deadline is not None and time.time() + (estimate or 0.0) >= deadline:
+            self.counters["dropped_expired"] += 1
+            raise DeadlineExceededError("Client deadline would pass before the request is served")
+        retry_after = max(1, math.ceil(estimate)) if estimate is not None else 1
+        max_depth = settings.max_queue_depth
+        if max_depth and self.waiting >= max_depth:
+            self.counters["shed_queue_depth"] += 1
+            logger.warning("Shedding request: %d requests already queued", self.waiting)
+            raise QueueFullError(f"Inference queue is full ({self.waiting} waiting)", retry_after)
+        max_wait = settings.max_queue_wait_seconds
+        if max_wait and estimate is not None and estimate > max_wait:
+            self.counters["shed_queue_time"] += 1
+            logger.warning("Shedding request: estimated queue time %.1fs exceeds %ss", estimate, max_wait)
+            raise QueueFullError(f"Estimated queue time {estimate:.0f}s exceeds {max_wait}s", retry_after)
+
+    def _expired(self, deadline: Optional[float]) -> bool:
+        return deadline is not None and time.time() >= deadline
+
+    def _grant(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._waiters and self.in_flight < self.limit:
+            now = loop.time()
+            waiter = min(self._waiters, key=lambda w: self._score(w, now))
+            self._waiters.remove(waiter)
+            if waiter.future.done():
+                continue
+            if self._expired(waiter.deadline):
+                # Nobody is waiting for this answer any more; do not spend a slot on it
+                self.counters["dropped_expired"] += 1
+                waiter.future.set_exception(DeadlineExceededError("Client deadline passed while queued"))
+                continue
+            self.in_flight += 1
+            self._in_flight_cost += waiter.cost
+            waiter.future.set_result(None)
+
+    async def acquire(self, lane_name: Optional[str] = None, cost: int = 0) -> None:
+        """
+        Waits for an execution slot.
+
+        Raises:
+            DeadlineExceededError: If the request's client deadline passes before it is admitted.
+        """
+        lane_name = lane_name or priority_lane.get()
+        deadline = request_deadline.get()
+        loop = asyncio.get_running_loop()
+        if self._expired(deadline):
+            self.counters["dropped_expired"] += 1
+            raise DeadlineExceededError("Client deadline already passed")
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self._in_flight_cost += cost
+            self.lane_stats[lane_name].record(0.0)
+            QUEUE_WAIT.observe(0.0, lane=lane_name)
+            add_span("queue", 0.0)
+            return
+
+        waiter = _Waiter(lane_name, cost, loop.time(), deadline)
+        self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                # Admitted just as the caller went away; hand the slot on
+                self.release(cost)
+            raise
+        wait_ms = (loop.time() - waiter.enqueued) * 1000
+        self.lane_stats[lane_name].record(wait_ms)
+        QUEUE_WAIT.observe(wait_ms / 1000, lane=lane_name)
+        add_span("queue", wait_ms / 1000)
+        if wait_ms > 1000:
+            logger.debug("Admitted %s request (cost %d) after %.0f ms", lane_name, cost, wait_ms)
+
+    def release(self, cost: int = 0, duration: Optional[float] = None) -> None:
+        self.in_flight -= 1
+        self._in_flight_cost -= cost
+        if cost > 0 and duration is not None:
+            sample = duration / cost
+            self.seconds_per_cost = sample if self.seconds_per_cost is None else 0.8 * self.seconds_per_cost + 0.2 * sample
+        self._grant()
+
+    async def __aenter__(self) -> "InferenceGate":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+    def stats(self) -> dict[str, Any]:
+        estimate = self.estimated_wait_seconds()
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "estimated_wait_s": round(estimate, 2) if estimate is not None else None,
+            **self.counters,
+            "lanes": {
+                name: {"waiting": sum(1 for w in self._waiters if w.lane == name), **stats.summary()}
+                for name, stats in self.lane_stats.items()
+            },
+        }
+
+
+# Singleton-like gate shared by every inference entry point
+inference_gate = InferenceGate()
@@ -0,0 +1,225 @@
+"""
+Multi-turn Q&A sessions over one ingested document.
+
+A document is evaluated once when the session is created and its KV state is
+saved to `settings.session_dir`:
+
+- llama-server workers: the slot holding the document is saved with
+  `/slots/0?action=save` (workers run with `--slot-save-path`). A follow-up on a
+  worker that still holds the session reuses the slot directly; on any other
+  worker the saved state is restored first (`action=restore`).
+- llama-cli: the document is saved as a `--prompt-cache` file, which follow-ups
+  load read-only.
+
+Either way a follow-up only evaluates the question. Sessions are evicted least
+recently used first once their state files exceed `settings.session_max_bytes`
+or their memory footprint exceeds `settings.session_max_memory_bytes`. That
+footprint is the document text plus the KV state restored for it, which the
+saved state file holds, so it is measured by the file's size.
+
+The state is saved right after ingestion rather than when a session goes idle:
+a worker's slot is overwritten by whichever request it serves next, so its KV
+state has to be saved before the worker goes back to the pool.
+
+Sessions only live in this process, so the state files of an earlier process
+cannot be used; `purge_stale_state` deletes them at startup.
+"""
+import re
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.schemas.llama_inference_schema import LlamaCLIResponse
+from app.services.llama_runner import LlamaRunner
+from app.services.prefix_cache import save_prompt_state
+from app.services.scheduler import estimate_cost, inference_gate
+from app.services.worker_pool import worker_pool
+from app.utils.text_utils import estimate_tokens
+
+SESSION_TEMPLATE = "The following is a clinical document.\n\n{document}\n\n"
+QUESTION_TEMPLATE = "Question: {question}\nAnswer:"
+
+# Name of a session state file (see `Session.filename`); other files in the directory are left alone
+_STATE_FILE = re.compile(r"^[0-9a-f]{32}\.bin$")
+
+
+class Session:
+    def __init__(self, session_id: str, document: str):
+        self.id = session_id
+        self.prefix = SESSION_TEMPLATE.format(document=document)
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.turns = 0
+        self.state_bytes = 0
+
+    @property
+    def filename(self) -> str:
+        return f"{self.id}.bin"
+
+    @property
+    def memory_bytes(self) -> int:
+        # The KV state is restored from the saved file, so its size is what a restore loads
+        return len(self.prefix.encode("utf-8")) + self.state_bytes
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "session_id": self.id,
+            "created_at": self.created_at,
+            "last_used": self.last_used,
+            "turns": self.turns,
+            "document_tokens": estimate_tokens(self.prefix),
+            "state_bytes": self.state_bytes,
+        }
+
+
+class SessionManager:
+    """Creates sessions, answers follow-ups from their saved state and enforces the budgets."""
+
+    def __init__(self, session_dir: Optional[str] = None):
+        self._session_dir = session_dir
+        self.sessions: OrderedDict[str, Session] = OrderedDict()
+        self.counters = {"created": 0, "questions": 0, "resident_hits": 0, "restores": 0, "evictions": 0}
+
+    @property
+    def session_dir(self) -> Path:
+        return Path(self._session_dir or settings.session_dir)
+
+    def _path(self, session: Session) -> Path:
+        return self.session_dir / session.filename
+
+    def get(self, session_id: str) -> Optional[Session]:
+        return self.sessions.get(session_id)
+
+    async def create(self, document: str) -> Session:
+        """
+        Ingests a document into a new session and saves its evaluated state.
+
+        Raises:
+            RuntimeError: If the document could not be evaluated.
+        """
+        session = Session(uuid.uuid4().hex, document)
+        self.session_dir.mkdir(parents=True, exist_ok=True)
+        logger.info("Ingesting document into session %s (~%d tokens)", session.id, estimate_tokens(session.prefix))
+
+        async with inference_gate.admit(cost=estimate_cost(estimate_tokens(session.prefix), 1)):
+            if worker_pool.started:
+                async with worker_pool.acquire() as worker:
+                    await worker.complete(session.prefix, {"n_predict": 1, "cache_prompt": True, "id_slot": 0})
+                    worker.resident_session = session.id
+                    await worker.slot_action("save", session.filename)
+            elif not await save_prompt_state(LlamaRunner(), session.prefix, self._path(session)):
+                raise RuntimeError("llama-cli did not save the session state")
+
+        session.state_bytes = self._path(session).stat().st_size if self._path(session).is_file() else 0
+        self.sessions[session.id] = session
+        self.counters["created"] += 1
+        self._enforce_budgets()
+        return session
+
+    async def ask(self, session_id: str, question: str, predict_tokens: Optional[int] = None) -> LlamaCLIResponse:
+        """
+        Answers a follow-up question about a session's document.
+
+        Raises:
+            KeyError: If the session does not exist (or was evicted).
+            RuntimeError: If inference fails.
+        """
+        session = self.sessions[session_id]
+        self.sessions.move_to_end(session_id)
+        session.last_used = time.time()
+        session.turns += 1
+        self.counters["questions"] += 1
+
+        prompt = session.prefix + QUESTION_TEMPLATE.format(question=question)
+        budget = predict_tokens or settings.default_predict_tokens
+        started = time.perf_counter()
+        # The document itself is restored, not re-evaluated, so only the question counts
+        async with inference_gate.admit(cost=estimate_cost(estimate_tokens(question), budget)):
+            if worker_pool.started:
+                async with worker_pool.acquire() as worker:
+                    if worker.resident_session == session.id:
+                        self.counters["resident_hits"] += 1
+                    else:
+                        logger.debug("Restoring session %s into worker %d", session.id, worker.index)
+                        await worker.slot_action("restore", session.filename)
+                        self.counters["restores"] += 1
+                    output = await worker.complete(prompt, {"n_predict": budget, "cache_prompt": True, "id_slot": 0})
+                    worker.resident_session = session.id
+            else:
+                extra_args = ["--predict", str(budget), "--no-display-prompt"]
+                if self._path(session).is_file():
+                    extra_args = ["--prompt-cache", str(self._path(session)), "--prompt-cache-ro", *extra_args]
+                    self.counters["restores"] += 1
+                output = await LlamaRunner().run_prompt_async(prompt, extra_args=extra_args)
+
+        return LlamaCLIResponse(
+            output=output,
+            tokens_generated=estimate_tokens(output),
+            execution_time_ms=int((time.perf_counter() - started) * 1000),
+        )
+
+    def close(self, session_id: str) -> bool:
+        """Deletes a session and its saved state. Returns False if it did not exist."""
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._path(session).unlink(missing_ok=True)
+        for worker in worker_pool.workers:
+            if worker.resident_session == session_id:
+                worker.resident_session = None
+        return True
+
+    def purge_stale_state(self) -> int:
+        """
+        Deletes saved state files that belong to no open session, e.g. those left
+        by a previous process.
+
+        Returns:
+            int: The number of files deleted.
+        """
+        if not self.session_dir.is_dir():
+            return 0
+        stale = [
+            path for path in self.session_dir.iterdir()
+            if _STATE_FILE.match(path.name) and path.stem not in self.sessions
+        ]
+        for path in stale:
+            path.unlink(missing_ok=True)
+        if stale:
+            logger.info("Deleted %d session state file(s) left by an earlier process", len(stale))
+        return len(stale)
+
+    def _enforce_budgets(self) -> None:
+        while len(self.sessions) > 1 and (
+            self.disk_bytes > settings.session_max_bytes or self.memory_bytes > settings.session_max_memory_bytes
+        ):
+            oldest = next(iter(self.sessions))
+            logger.info("Evicting least recently used session %s", oldest)
+            self.close(oldest)
+            self.counters["evictions"] += 1
+
+    @property
+    def disk_bytes(self) -> int:
+        return sum(s.state_bytes for s in self.sessions.values())
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(s.memory_bytes for s in self.sessions.values())
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.counters,
+            "sessions": len(self.sessions),
+            "disk_bytes": self.disk_bytes,
+            "disk_max_bytes": settings.session_max_bytes,
+            "memory_bytes": self.memory_bytes,
+            "memory_max_bytes": settings.session_max_memory_bytes,
+        }
+
+
+# Singleton-like session registry used by the /sessions routes
+session_manager = SessionManager()
@@ -0,0 +1,145 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from app.config.logging_config import logger
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SharedStream:
+    """Fans one async text stream out to any number of subscribers.
+
+    A background task pumps the source into a buffer; every subscriber replays the
+    buffer from the start and then follows live output, so late joiners see the
+    full text. When the last subscriber leaves early, the source is closed, which
+    stops the underlying generation.
+    """
+
+    def __init__(self, source: AsyncIterator[str]):
+        self._source = source
+        self._chunks: list[str] = []
+        self._error: Optional[BaseException] = None
+        self._done = False
+        self._changed = asyncio.Event()
+        self.subscribers = 0
+        self._task = asyncio.ensure_future(self._pump())
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _pump(self) -> None:
+        try:
+            async for chunk in self._source:
+                self._chunks.append(chunk)
+                self._notify()
+        except asyncio.CancelledError:
+            self._error = RuntimeError("Shared generation was cancelled")
+            raise
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._notify()
+            await self._source.aclose()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        self.subscribers += 1
+        position = 0
+        try:
+            while True:
+                while position < len(self._chunks):
+                    yield self._chunks[position]
+                    position += 1
+                if self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self._task.done():
+                logger.debug("Last subscriber left a shared stream; cancelling generation")
+                self._task.cancel()
+
+
+class SingleFlight:
+    """Coalesces concurrent identical requests onto one running execution.
+
+    The first caller for a key (the leader) starts the work; callers arriving while
+    it runs (followers) attach to it and receive the same result or stream. The
+    execution is only cancelled once every attached caller has gone away. Nothing
+    is remembered after completion; that is the response cache's job.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+        self._streams: dict[str, SharedStream] = {}
+        self.counters = {"leaders": 0, "followers": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs `fn()` once per key among concurrent callers and returns its result to all of them.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget_call(key, call))
+            self.counters["leaders"] += 1
+        else:
+            logger.debug("Coalescing request onto in-flight execution %s", key)
+            self.counters["followers"] += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+                # Let the execution unwind (and stop its process) before giving up
+                await asyncio.gather(call.task, return_exceptions=True)
+            raise
+        finally:
+            call.waiters -= 1
+
+    def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Returns a subscription to the in-flight stream for `key`, starting `factory()` if there is none.
+        """
+        shared = self._streams.get(key)
+        if shared is None or shared.done:
+            shared = SharedStream(factory())
+            self._streams[key] = shared
+            shared._task.add_done_callback(lambda _: self._forget_stream(key, shared))
+            self.counters["leaders"] += 1
+        else:
+            logger.debug("Coalescing stream onto in-flight execution %s", key)
+            self.counters["followers"] += 1
+        return shared.subscribe()
+
+    def _forget_call(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _forget_stream(self, key: str, shared: SharedStream) -> None:
+        if self._streams.get(key) is shared:
+            del self._streams[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            **self.counters,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
+
+
+# Singleton-like coalescer shared by every inference entry point
+inflight = SingleFlight()
@@ -1 +1,207 @@
-# summarizer logic here
+"""
+Map-reduce summarization of documents longer than the model's context window.
+
+1. Chunk: the document is split at paragraph boundaries into chunks of at most
+   `settings.summary_chunk_tokens` tokens. Boundaries are content-defined (a chunk
+   ends after a paragraph whose hash selects it, or when the budget is full), so an
+   edit only moves the boundaries around the edited paragraph. Each chunk is
+   prefixed with the tail of the previous one (`settings.summary_chunk_overlap_tokens`)
+   so facts that straddle a boundary are seen together.
+2. Map: every chunk is summarised concurrently through `generate`, i.e. across
+   the worker pool / inference gate, and through the response cache. Unchanged
+   chunks of a re-submitted document are therefore cache hits.
+3. Reduce: partial summaries are grouped up to the chunk budget (at most
+   `settings.summary_reduce_fan_in` per group) and summarised again, level by
+   level, until one summary remains.
+"""
+import asyncio
+import hashlib
+import re
+from typing import Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.schemas.llama_inference_schema import LlamaInferenceParameters
+from app.services.inference import generate
+from app.services.prefix_cache import prefix_cache
+from app.services.tracing import span
+from app.utils.text_utils import CHARS_PER_TOKEN, estimate_tokens
+
+MAP_TEMPLATE = (
+    "Summarize the following excerpt of a clinical document. Keep diagnoses, "
+    "medications, procedures, results and dates.\n\n{text}\n\nSummary:"
+)
+REDUCE_TEMPLATE = (
+    "Combine the following partial summaries of one clinical document into a single "
+    "concise summary without repeating facts.\n\n{text}\n\nSummary:"
+)
+
+# The instruction preambles are evaluated once and reused (see app.services.prefix_cache)
+prefix_cache.register("summary-map", MAP_TEMPLATE.split("{text}")[0])
+prefix_cache.register("summary-reduce", REDUCE_TEMPLATE.split("{text}")[0])
+
+# A chunk may end after roughly one in BOUNDARY_MODULUS paragraphs once it is half full
+BOUNDARY_MODULUS = 4
+_TEMPLATE_TOKENS = estimate_tokens(MAP_TEMPLATE)
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def chunk_budget() -> int:
+    """Tokens of document text per chunk, leaving room for the template and the summary."""
+    if settings.summary_chunk_tokens:
+        return settings.summary_chunk_tokens
+    return max(settings.context_size - settings.summary_predict_tokens - _TEMPLATE_TOKENS, 64)
+
+
+def _split_long(paragraph: str, budget: int) -> list[str]:
+    """Splits a paragraph that alone exceeds the budget, preferring sentence ends."""
+    limit = budget * CHARS_PER_TOKEN
+    pieces = []
+    while len(paragraph) > limit:
+        cut = max(paragraph.rfind(". ", 0, limit), paragraph.rfind("\n", 0, limit))
+        cut = cut + 1 if cut > limit // 2 else limit
+        pieces.append(paragraph[:cut].strip())
+        paragraph = paragraph[cut:].strip()
+    if paragraph:
+        pieces.append(paragraph)
+    return pieces
+
+
+def _is_boundary(paragraph: str) -> bool:
+    digest = hashlib.blake2b(paragraph.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % BOUNDARY_MODULUS == 0
+
+
+def _tail(text: str, tokens: int) -> str:
+    if tokens <= 0:
+        return ""
+    tail = text[-tokens * CHARS_PER_TOKEN:]
+    # Start the overlap at a word boundary
+    space = tail.find(" ")
+    return tail[space + 1:] if 0 <= space < len(tail) // 2 else tail
+
+
+def split_into_chunks(text: str, budget: Optional[int] = None, overlap: Optional[int] = None) -> list[str]:
+    """
+    Splits a document into overlapping, token-budgeted chunks.
+
+    Args:
+        text (str): The document.
+        budget (Optional[int]): Max tokens per chunk, overlap included (defaults to `chunk_budget()`).
+        overlap (Optional[int]): Tokens of the previous chunk repeated at the start of the next one.
+
+    Returns:
+        list[str]: Chunks in document order; a document that fits yields a single chunk.
+    """
+    budget = budget or chunk_budget()
+    overlap = settings.summary_chunk_overlap_tokens if overlap is None else overlap
+    overlap = min(overlap, budget // 4)
+    body_budget = budget - overlap
+
+    paragraphs = []
+    for paragraph in _PARAGRAPH_BREAK.split(text.strip()):
+        paragraph = paragraph.strip()
+        if paragraph:
+            paragraphs.extend(_split_long(paragraph, body_budget))
+
+    bodies: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+    for paragraph in paragraphs:
+        tokens = estimate_tokens(paragraph)
+        if current and current_tokens + tokens > body_budget:
+            bodies.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += tokens
+        if current_tokens >= body_budget // 2 and _is_boundary(paragraph):
+            bodies.append("\n\n".join(current))
+            current, current_tokens = [], 0
+    if current:
+        bodies.append("\n\n".join(current))
+
+    if len(bodies) <= 1:
+        return bodies
+    chunks = [bodies[0]]
+    for previous, body in zip(bodies, bodies[1:]):
+        prefix = _tail(previous, overlap)
+        chunks.append(f"{prefix}\n\n{body}" if prefix else body)
+    return chunks
+
+
+async def _summarize_text(template: str, text: str) -> str:
+    params = LlamaInferenceParameters(
+        prompt=template.format(text=text),
+        predict_tokens=settings.summary_predict_tokens,
+        no_display_prompt=True,
+    )
+    result = await generate(prompt=params.prompt, params=params)
+    return result.output
+
+
+async def _summarize_all(template: str, texts: list[str]) -> list[str]:
+    """Summarises `texts` concurrently; the first failure cancels the others and is raised."""
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(_summarize_text(template, text)) for text in texts]
+    except ExceptionGroup as e:
+        raise e.exceptions[0]
+    return [task.result() for task in tasks]
+
+
+def _group(summaries: list[str], budget: int, fan_in: int) -> list[list[str]]:
+    groups: list[list[str]] = []
+    current: list[str] = []
+    current_tokens = 0
+    for summary in summaries:
+        tokens = estimate_tokens(summary)
+        if current and (len(current) >= fan_in or current_tokens + tokens > budget):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(summary)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    # A level that cannot merge anything would never terminate
+    if len(groups) == len(summaries) and len(summaries) > 1:
+        groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+    return groups
+
+
+async def summarize(content: str, verbose: bool = False) -> str:
+    """
+    Summarises a document of any length.
+
+    Documents that fit in one chunk are sent to the model as-is, with the
+    `settings.summary_predict_tokens` budget `chunk_budget()` leaves room for.
+    Longer documents are summarised map-reduce style.
+
+    Args:
+        content (str): The document to summarise.
+        verbose (bool): Passed through to llama-cli for single-prompt documents.
+
+    Returns:
+        str: The summary.
+
+    Raises:
+        RuntimeError: If any inference call fails; the calls still running are cancelled.
+    """
+    chunks = split_into_chunks(content)
+    if len(chunks) <= 1:
+        params = LlamaInferenceParameters(prompt=content, predict_tokens=settings.summary_predict_tokens)
+        result = await generate(prompt=content, verbose=verbose, params=params)
+        return result.output
+
+    budget = chunk_budget()
+    logger.info("Summarising document in %d chunks (budget %d tokens each)", len(chunks), budget)
+    with span("map"):
+        summaries = await _summarize_all(MAP_TEMPLATE, chunks)
+
+    level = 0
+    while len(summaries) > 1:
+        level += 1
+        groups = _group(list(summaries), budget, settings.summary_reduce_fan_in)
+        logger.debug("Reduce level %d: %d partial summaries in %d groups", level, len(summaries), len(groups))
+        with span("reduce"):
+            summaries = await _summarize_all(REDUCE_TEMPLATE, ["\n\n".join(group) for group in groups])
+    return summaries[0]
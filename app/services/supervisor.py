@@ -0,0 +1,272 @@
+"""
+Supervision of the inference backends.
+
+- `WorkerSupervisor` probes every llama-server worker's `/health` each
+  `settings.supervisor_probe_interval` seconds. A worker whose process died, or
+  that failed `settings.supervisor_probe_failures` probes in a row, is taken out
+  of rotation and restarted after an exponential backoff. A worker restarted
+  `settings.supervisor_max_restarts` times within
+  `settings.supervisor_quarantine_seconds` is quarantined for that long before
+  the next attempt.
+- `CircuitBreaker` counts consecutive inference failures on either backend. After
+  `settings.breaker_failure_threshold` of them it opens and requests fail fast
+  with `BackendUnavailableError` (HTTP 503) for `settings.breaker_reset_seconds`;
+  then a single trial request is let through and its outcome closes or re-opens
+  the breaker.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.services.worker_pool import (
+    WORKER_QUARANTINED,
+    WORKER_READY,
+    WORKER_RESTARTING,
+    LlamaServerWorker,
+    WorkerPool,
+    worker_pool,
+)
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class BackendUnavailableError(RuntimeError):
+    """Raised while the circuit breaker is open."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Fails inference fast while the backend keeps failing.
+
+    Args:
+        failure_threshold (Optional[int]): Consecutive failures that open the breaker.
+        reset_seconds (Optional[float]): How long it stays open before a trial request.
+    """
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_seconds: Optional[float] = None):
+        self._failure_threshold = failure_threshold
+        self._reset_seconds = reset_seconds
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+        self.counters = {"opened": 0, "rejected": 0}
+
+    @property
+    def failure_threshold(self) -> int:
+        return self._failure_threshold or settings.breaker_failure_threshold
+
+    @property
+    def reset_seconds(self) -> float:
+        return self._reset_seconds if self._reset_seconds is not None else settings.breaker_reset_seconds
+
+    @property
+    def current_state(self) -> str:
+        """The state, reporting an open breaker whose reset period is over as half-open."""
+        if self.state == BREAKER_OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            return BREAKER_HALF_OPEN
+        return self.state
+
+    def check(self) -> None:
+        """
+        Lets a request through, or rejects it while the breaker is open.
+
+        Raises:
+            BackendUnavailableError: If the breaker is open (or its trial request is still running).
+        """
+        if self.state == BREAKER_CLOSED:
+            return
+        now = time.monotonic()
+        remaining = self.opened_at + self.reset_seconds - now
+        if self.state == BREAKER_OPEN and remaining <= 0:
+            self.state = BREAKER_HALF_OPEN
+        # A trial whose outcome never arrived (e.g. it was cancelled) is replaced after a reset period
+        if self.state == BREAKER_HALF_OPEN and (
+            self._trial_started is None or now - self._trial_started > self.reset_seconds
+        ):
+            self._trial_started = now
+            return
+        self.counters["rejected"] += 1
+        raise BackendUnavailableError(
+            "Inference backend is unavailable; failing fast",
+            retry_after=max(1, math.ceil(remaining)),
+        )
+
+    def record_success(self) -> None:
+        if self.state != BREAKER_CLOSED:
+            logger.info("Inference backend recovered; closing circuit breaker")
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self._trial_started = None
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._trial_started = None
+        if self.state == BREAKER_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != BREAKER_OPEN:
+                logger.error("Opening circuit breaker after %d consecutive inference failures", self.consecutive_failures)
+                self.counters["opened"] += 1
+            self.state = BREAKER_OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict[str, Any]:
+        return {"state": self.current_state, "consecutive_failures": self.consecutive_failures, **self.counters}
+
+
+class _WorkerHealth:
+    def __init__(self):
+        self.probe_failures = 0
+        self.restarts: deque[float] = deque()
+        self.last_error: Optional[str] = None
+
+
+class WorkerSupervisor:
+    """Probes the pool's workers and restarts, or quarantines, the ones that fail.
+
+    Args:
+        pool (WorkerPool): The pool to supervise.
+    """
+
+    def __init__(self, pool: WorkerPool):
+        self.pool = pool
+        self.health: dict[int, _WorkerHealth] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._restarts: dict[int, asyncio.Task] = {}
+        self.counters = {"probes": 0, "probe_failures": 0, "restarts": 0, "failed_restarts": 0, "quarantines": 0}
+
+    async def start(self) -> None:
+        if self._task is None and self.pool.started:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, *self._restarts.values()) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._restarts = {}
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.supervisor_probe_interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.exception("Worker supervision round failed: %s", e)
+
+    async def check(self) -> None:
+        """Runs one supervision round: probes every worker and schedules restarts."""
+        for worker in list(self.pool.workers):
+            health = self.health.setdefault(worker.index, _WorkerHealth())
+            if worker.state != WORKER_READY or worker.index in self._restarts:
+                continue
+            self.counters["probes"] += 1
+            if await worker.probe(settings.supervisor_probe_timeout):
+                health.probe_failures = 0
+                continue
+            self.counters["probe_failures"] += 1
+            health.probe_failures += 1
+            if worker.is_alive and health.probe_failures < settings.supervisor_probe_failures:
+                continue
+            health.last_error = "process exited" if not worker.is_alive else "health probe failed"
+            logger.warning("llama-server worker %d is unhealthy (%s); taking it out of rotation",
+                           worker.index, health.last_error)
+            self._schedule_restart(worker, health)
+
+    def _schedule_restart(self, worker: LlamaServerWorker, health: _WorkerHealth) -> None:
+        now = time.monotonic()
+        while health.restarts and now - health.restarts[0] > settings.supervisor_quarantine_seconds:
+            health.restarts.popleft()
+        if len(health.restarts) >= settings.supervisor_max_restarts:
+            logger.error("Quarantining llama-server worker %d for %ss after %d restarts",
+                         worker.index, settings.supervisor_quarantine_seconds, len(health.restarts))
+            self.pool.take_out_of_rotation(worker, WORKER_QUARANTINED)
+            health.restarts.clear()
+            self.counters["quarantines"] += 1
+            delay = settings.supervisor_quarantine_seconds
+        else:
+            self.pool.take_out_of_rotation(worker, WORKER_RESTARTING)
+            delay = 0 if not health.restarts else min(2 ** len(health.restarts), settings.supervisor_restart_backoff_max)
+        self._restarts[worker.index] = asyncio.ensure_future(self._restart(worker, health, delay))
+
+    async def _restart(self, worker: LlamaServerWorker, health: _WorkerHealth, delay: float) -> None:
+        await asyncio.sleep(delay)
+        health.restarts.append(time.monotonic())
+        self.counters["restarts"] += 1
+        logger.info("Restarting llama-server worker %d (attempt %d)", worker.index, len(health.restarts))
+        try:
+            await worker.stop()
+            worker.resident_session = None
+            await worker.start(settings.worker_startup_timeout)
+        except Exception as e:
+            self.counters["failed_restarts"] += 1
+            health.last_error = str(e)
+            logger.error("Restarting llama-server worker %d failed: %s", worker.index, e)
+            self._restarts.pop(worker.index, None)
+            self._schedule_restart(worker, health)
+            return
+        health.probe_failures = 0
+        health.last_error = None
+        self._restarts.pop(worker.index, None)
+        self.pool.reinstate(worker)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.counters,
+            "workers": [
+                {
+                    "index": w.index,
+                    "state": w.state,
+                    "pid": w.process.pid if w.is_alive else None,
+                    "recent_restarts": len(self.health[w.index].restarts) if w.index in self.health else 0,
+                    "last_error": self.health[w.index].last_error if w.index in self.health else None,
+                }
+                for w in self.pool.workers
+            ],
+        }
+
+
+def backend_health() -> dict[str, Any]:
+    """
+    Reports whether the inference backend can serve requests right now.
+
+    Returns:
+        dict: `status` is "ok", "degraded" (serving with reduced capacity, or a
+        breaker trial pending) or "unavailable" (breaker open, no ready worker, or
+        missing llama-cli binary/model), plus the details behind it.
+    """
+    breaker = circuit_breaker.stats()
+    if worker_pool.started:
+        ready, total = worker_pool.ready_count, len(worker_pool.workers)
+        report = {"backend": "llama-server", "workers_ready": ready, "workers_total": total}
+        available, full = ready > 0, ready == total
+    else:
+        binary_ok = os.access(settings.llama_cli_path, os.X_OK)
+        model_ok = os.path.isfile(settings.model_path)
+        report = {"backend": "llama-cli", "binary_found": binary_ok, "model_found": model_ok}
+        available, full = binary_ok and model_ok, True
+
+    if not available or breaker["state"] == BREAKER_OPEN:
+        status = "unavailable"
+    elif not full or breaker["state"] == BREAKER_HALF_OPEN:
+        status = "degraded"
+    else:
+        status = "ok"
+    return {"status": status, **report, "circuit_breaker": breaker}
+
+
+# Singleton-like breaker in front of every inference execution
+circuit_breaker = CircuitBreaker()
+
+# Singleton-like supervisor for the shared worker pool, started by the FastAPI lifespan
+worker_supervisor = WorkerSupervisor(worker_pool)
@@ -0,0 +1,126 @@
+"""
+Per-request performance numbers reported by llama.cpp.
+
+llama-cli prints a timing block on stderr when it exits, in one of two formats
+depending on the llama.cpp version:
+
+    llama_print_timings:        load time =    1234.56 ms
+    llama_print_timings:      sample time =      12.34 ms /   128 runs   (    0.10 ms per token, 10370.00 tokens per second)
+    llama_print_timings: prompt eval time =     456.78 ms /    32 tokens (   14.27 ms per token,    70.06 tokens per second)
+    llama_print_timings:        eval time =    2345.67 ms /   127 runs   (   18.47 ms per token,    54.14 tokens per second)
+    llama_print_timings:       total time =    3456.78 ms /   159 tokens
+
+or `llama_perf_context_print:` / `llama_perf_sampler_print:` lines with the same
+fields (`sampling time` instead of `sample time`). llama-server returns the same
+numbers as a `timings` object on the final streamed event.
+
+stderr is collected in the background while tokens stream and is parsed once,
+after the process has exited, so none of this runs on the per-token path.
+"""
+import re
+from collections import deque
+from typing import Any, Optional
+
+from app.schemas.llama_inference_schema import LlamaTimings
+from app.services.metrics import MODEL_LOAD_SECONDS, TOKENS_PER_SECOND
+
+_TIMING_LINE = re.compile(
+    r"(?:llama_print_timings|llama_perf_\w+_print):\s+(load|sample|sampling|prompt eval|eval|total) time\s*=\s*"
+    r"([\d.]+) ms(?:\s*/\s*(\d+) (?:runs|tokens))?"
+)
+
+
+def _per_second(count: Optional[int], ms: Optional[float]) -> Optional[float]:
+    if not count or not ms:
+        return None
+    return round(count / ms * 1000, 2)
+
+
+def parse_cli_timings(stderr: str) -> Optional[LlamaTimings]:
+    """
+    Extracts llama-cli's timing block from its stderr.
+
+    Returns:
+        Optional[LlamaTimings]: The reported timings, or None if llama-cli did not
+        print them (e.g. the process was stopped before it finished).
+    """
+    fields: dict[str, Any] = {}
+    for phase, ms, count in _TIMING_LINE.findall(stderr):
+        ms = float(ms)
+        count = int(count) if count else None
+        if phase == "load":
+            fields["load_ms"] = ms
+        elif phase in ("sample", "sampling"):
+            fields["sample_ms"] = ms
+        elif phase == "prompt eval":
+            fields.update(prompt_eval_ms=ms, prompt_tokens=count,
+                          prompt_tokens_per_second=_per_second(count, ms))
+        elif phase == "eval":
+            fields.update(eval_ms=ms, eval_tokens=count, eval_tokens_per_second=_per_second(count, ms))
+        else:
+            fields["total_ms"] = ms
+    return LlamaTimings(**fields) if fields else None
+
+
+def server_timings(timings: Optional[dict]) -> Optional[LlamaTimings]:
+    """Converts the `timings` object of llama-server's final event to `LlamaTimings`."""
+    if not timings:
+        return None
+    prompt_ms, predicted_ms = timings.get("prompt_ms"), timings.get("predicted_ms")
+    return LlamaTimings(
+        prompt_eval_ms=prompt_ms,
+        prompt_tokens=timings.get("prompt_n"),
+        prompt_tokens_per_second=timings.get("prompt_per_second") or _per_second(timings.get("prompt_n"), prompt_ms),
+        eval_ms=predicted_ms,
+        eval_tokens=timings.get("predicted_n"),
+        eval_tokens_per_second=timings.get("predicted_per_second") or _per_second(timings.get("predicted_n"), predicted_ms),
+        total_ms=(prompt_ms or 0) + (predicted_ms or 0) if prompt_ms or predicted_ms else None,
+    )
+
+
+class TimingStats:
+    """Recent llama.cpp timings, summarised for capacity planning."""
+
+    FIELDS = ("load_ms", "prompt_tokens_per_second", "eval_tokens_per_second")
+
+    def __init__(self, window: int = 1024):
+        self.samples: dict[str, deque[float]] = {name: deque(maxlen=window) for name in self.FIELDS}
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.eval_tokens = 0
+
+    def record(self, timings: Optional[LlamaTimings]) -> None:
+        if timings is None:
+            return
+        self.requests += 1
+        self.prompt_tokens += timings.prompt_tokens or 0
+        self.eval_tokens += timings.eval_tokens or 0
+        for name in self.FIELDS:
+            value = getattr(timings, name)
+            if value is not None:
+                self.samples[name].append(value)
+        if timings.load_ms is not None:
+            MODEL_LOAD_SECONDS.observe(timings.load_ms / 1000, backend="llama-cli")
+        if timings.prompt_tokens_per_second is not None:
+            TOKENS_PER_SECOND.observe(timings.prompt_tokens_per_second, phase="prompt")
+        if timings.eval_tokens_per_second is not None:
+            TOKENS_PER_SECOND.observe(timings.eval_tokens_per_second, phase="eval")
+
+    def stats(self) -> dict[str, Any]:
+        summary: dict[str, Any] = {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "eval_tokens": self.eval_tokens,
+        }
+        for name, values in self.samples.items():
+            ordered = sorted(values)
+            summary[name] = {
+                "mean": round(sum(ordered) / len(ordered), 2) if ordered else None,
+                "p50": ordered[len(ordered) // 2] if ordered else None,
+                "p05": ordered[int(0.05 * (len(ordered) - 1))] if ordered else None,
+            }
+        return summary
+
+
+# Singleton-like aggregate of the timings of every inference execution
+timing_stats = TimingStats()
@@ -0,0 +1,230 @@
+"""
+Per-request phase tracing.
+
+`app.middleware.TracingMiddleware` opens a `Trace` for every HTTP request and
+makes it current for everything the request runs, including tasks it spawns.
+Code on the request path adds phases to it with `add_span` / `span`; outside a
+request (background jobs, the shared execution of a coalesced request's
+followers) these are no-ops:
+
+- `validate` / `serialize`: request parsing and validation, and response
+  serialization (`app.middleware.TracedRoute`)
+- `queue`: waiting for an inference slot (`InferenceGate.acquire`)
+- `spawn`: starting a llama-cli process (`LlamaRunner.open_stream`)
+- `inference`: wall-clock time on the backend, and the phases llama.cpp reports
+  for it: `load`, `prompt_eval`, `generate`
+- `map` / `reduce`: the stages of a map-reduce summary
+
+Phases that occur several times (e.g. one `queue` wait per chunk of a long
+document) are summed, so concurrent phases can add up to more than the request.
+
+The phases are returned in a `Server-Timing` header, which is sent with the
+response head: a streamed response only carries the phases finished before its
+first byte. The complete trace is logged as one JSON line on the
+`medparswell.trace` logger when the request ends, and the most recent ones are
+kept for `GET /admin/traces`.
+
+Sampled requests (`settings.profile_sample_rate`) are additionally run under
+`cProfile`, with the profile written to `settings.profile_dir`.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.schemas.llama_inference_schema import LlamaTimings
+
+trace_logger = logging.getLogger("medparswell.trace")
+
+
+class Trace:
+    """Phases of one HTTP request.
+
+    Args:
+        method (str): HTTP method.
+        path (str): Request path.
+    """
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        # name -> [seconds, occurrences]
+        self.spans: dict[str, list] = {}
+        self.attributes: dict[str, Any] = {}
+        self._marks: dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def mark(self, name: str) -> None:
+        """Remembers the current time, to be closed into a span by `end_mark`."""
+        self._marks[name] = time.perf_counter()
+
+    def end_mark(self, name: str, span_name: Optional[str] = None) -> None:
+        started = self._marks.pop(name, None)
+        if started is not None:
+            self.add(span_name or name, time.perf_counter() - started)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """The phases so far, plus `total` up to now, as a `Server-Timing` header value."""
+        parts = []
+        for name, (seconds, count) in self.spans.items():
+            part = f"{name};dur={seconds * 1000:.1f}"
+            if count > 1:
+                part += f';desc="x{count}"'
+            parts.append(part)
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def record(self, status: int) -> dict[str, Any]:
+        return {
+            "trace_id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "started_at": round(self.started_at, 3),
+            "duration_ms": round(self.elapsed() * 1000, 1),
+            "spans": {
+                name: {"ms": round(seconds * 1000, 1), "count": count}
+                for name, (seconds, count) in self.spans.items()
+            },
+            **self.attributes,
+        }
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def add_span(name: str, seconds: float) -> None:
+    """Adds a phase to the current request's trace, if there is one."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times the enclosed block as a phase of the current request's trace."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - started)
+
+
+def annotate(**attributes: Any) -> None:
+    """Adds attributes (backend, cache outcome, ...) to the current request's trace record."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+def add_llama_timings(timings: Optional[LlamaTimings]) -> None:
+    """Adds the phases llama.cpp reported for a generation to the current trace."""
+    trace = current_trace.get()
+    if trace is None or timings is None:
+        return
+    for name, ms in (("load", timings.load_ms), ("prompt_eval", timings.prompt_eval_ms), ("generate", timings.eval_ms)):
+        if ms is not None:
+            trace.add(name, ms / 1000)
+
+
+class TraceRecorder:
+    """Logs finished traces and keeps the most recent ones."""
+
+    def __init__(self, window: int = 256):
+        self.recent: deque[dict[str, Any]] = deque(maxlen=window)
+        self.profiles_written = 0
+
+    def finish(self, trace: Trace, status: int) -> dict[str, Any]:
+        record = trace.record(status)
+        self.recent.append(record)
+        if trace_logger.isEnabledFor(logging.INFO):
+            trace_logger.info(json.dumps(record))
+        return record
+
+    def stats(self, limit: int = 20) -> dict[str, Any]:
+        recent = list(self.recent)
+        return {
+            "profiles_written": self.profiles_written,
+            "recent": recent[-limit:][::-1],
+            "slowest": sorted(recent, key=lambda r: r["duration_ms"], reverse=True)[:limit],
+        }
+
+
+# Singleton-like store of finished request traces
+trace_recorder = TraceRecorder()
+
+
+class RequestProfiler:
+    """Runs sampled requests under cProfile.
+
+    cProfile profiles the whole event-loop thread while it is enabled, so work of
+    other requests interleaved with the sampled one shows up in its profile too;
+    only one request is profiled at a time to keep that bounded.
+    """
+
+    def __init__(self):
+        self.active = False
+
+    def start(self, rate: Optional[float] = None) -> Optional[cProfile.Profile]:
+        """Starts profiling with probability `rate` (default `settings.profile_sample_rate`)."""
+        rate = settings.profile_sample_rate if rate is None else rate
+        if self.active or random.random() >= rate:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already active
+            return None
+        self.active = True
+        return profiler
+
+    def stop(self, profiler: cProfile.Profile) -> None:
+        profiler.disable()
+        self.active = False
+
+    @staticmethod
+    def write(profiler: cProfile.Profile, trace: Trace) -> Path:
+        """Dumps a profile next to the most recent ones, keeping at most `settings.profile_max_files`."""
+        directory = Path(settings.profile_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        slug = trace.path.strip("/").replace("/", "_") or "root"
+        path = directory / f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(trace.started_at))}-{slug}-{trace.id}.prof"
+        profiler.dump_stats(path)
+        profiles = sorted(directory.glob("*.prof"), key=os.path.getmtime)
+        for stale in profiles[:max(len(profiles) - settings.profile_max_files, 0)]:
+            stale.unlink(missing_ok=True)
+        logger.info("Wrote request profile %s", path)
+        trace_recorder.profiles_written += 1
+        return path
+
+
+# Singleton-like profiler hook used by TracingMiddleware
+request_profiler = RequestProfiler()
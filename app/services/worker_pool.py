@@ -0,0 +1,446 @@
+import asyncio
+import json
+import socket
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from app.config.settings import settings
+from app.config.logging_config import logger
+from app.services.llama_runner import LlamaExecutionError
+from app.services.metrics import MODEL_LOAD_SECONDS
+
+if TYPE_CHECKING:
+    import httpx
+
+
+# Worker states (see app.services.supervisor)
+WORKER_READY = "ready"
+WORKER_RESTARTING = "restarting"
+WORKER_QUARANTINED = "quarantined"
+
+
+def _execution_error(message: str, error: "httpx.HTTPError") -> LlamaExecutionError:
+    """Wraps an HTTP error; a 4xx answer means the worker rejected the request, not that it failed."""
+    import httpx
+
+    rejected = isinstance(error, httpx.HTTPStatusError) and error.response.status_code < 500
+    return LlamaExecutionError(message, backend_fault=not rejected)
+
+
+def _free_port(host: str) -> int:
+    """Ask the OS for a currently unused TCP port on `host`."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class LlamaServerWorker:
+    """A long-lived `llama-server` process that keeps the model resident in memory.
+
+    The worker loads the GGUF once when started and then serves any number of
+    completions over its local HTTP API, instead of paying the model load on
+    every request like a fresh `llama-cli` spawn does.
+    """
+
+    def __init__(self, index: int, binary_path: Path, model_path: Path, host: str, port: int):
+        self.index = index
+        self.binary_path = binary_path
+        self.model_path = model_path
+        self.host = host
+        self.port = port
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.client: Optional["httpx.AsyncClient"] = None
+        # Session whose KV state currently occupies slot 0 (see app.services.sessions)
+        self.resident_session: Optional[str] = None
+        # Only ready workers are handed out by the pool
+        self.state = WORKER_READY
+        self._log_handle = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    def build_command(self) -> list[str]:
+        cmd = [
+            str(self.binary_path),
+            "-m", str(self.model_path),
+            "--host", self.host,
+            "--port", str(self.port),
+            # llama-server splits the context between its slots
+            "--ctx-size", str(settings.context_size * settings.worker_slots),
+            "--gpu-layers", str(settings.gpu_layers),
+            "--main-gpu", str(settings.main_gpu),
+            "--numa", settings.numa,
+            "--slot-save-path", str(Path(settings.session_dir).resolve()),
+        ]
+        if settings.worker_slots > 1:
+            cmd += ["--parallel", str(settings.worker_slots), "--cont-batching"]
+        return cmd
+
+    async def start(self, timeout: float) -> None:
+        """
+        Launches the llama-server process and waits until its `/health` endpoint reports ready.
+
+        Raises:
+            RuntimeError: If the process exits or does not become ready within `timeout` seconds.
+        """
+        # httpx is only needed once the optional worker pool is started
+        import httpx
+
+        cmd = self.build_command()
+        log_path = Path(settings.log_file).parent / f"llama-server-{self.index}.log"
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        self._log_handle = open(log_path, "ab")
+
+        logger.info("Starting llama-server worker %d on %s", self.index, self.base_url)
+        logger.debug("Worker %d command: %s", self.index, " ".join(cmd))
+        self.process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=self._log_handle,
+            stderr=self._log_handle,
+        )
+        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=settings.cli_timeout)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if not self.is_alive:
+                await self.stop()
+                raise RuntimeError(f"llama-server worker {self.index} exited during startup (see {log_path})")
+            try:
+                response = await self.client.get("/health", timeout=2.0)
+                if response.status_code == 200:
+                    logger.info("llama-server worker %d is ready (pid=%s)", self.index, self.process.pid)
+                    MODEL_LOAD_SECONDS.observe(timeout - (deadline - loop.time()), backend="llama-server")
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+
+        await self.stop()
+        raise RuntimeError(f"llama-server worker {self.index} did not become ready within {timeout}s")
+
+    async def probe(self, timeout: float) -> bool:
+        """Returns whether the process is running and its `/health` endpoint answers 200 within `timeout`."""
+        import httpx
+
+        if not self.is_alive or self.client is None:
+            return False
+        try:
+            response = await self.client.get("/health", timeout=timeout)
+        except httpx.HTTPError:
+            return False
+        return response.status_code == 200
+
+    async def stop(self) -> None:
+        """Terminates the worker process and releases its HTTP client."""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        if self.is_alive:
+            logger.info("Stopping llama-server worker %d (pid=%s)", self.index, self.process.pid)
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                logger.warning("Worker %d ignored SIGTERM; killing it", self.index)
+                self.process.kill()
+                await self.process.wait()
+        if self._log_handle is not None:
+            self._log_handle.close()
+            self._log_handle = None
+
+    async def complete(self, prompt: str, options: Optional[dict] = None) -> str:
+        """
+        Runs a single completion on this worker.
+
+        Args:
+            prompt (str): The text prompt to send to the model.
+            options (Optional[dict]): Extra `/completion` fields (see `compile_server_options`).
+
+        Raises:
+            LlamaExecutionError: If the worker is down or the completion request fails.
+        """
+        import httpx
+
+        if not self.is_alive or self.client is None:
+            raise LlamaExecutionError(f"llama-server worker {self.index} is not running")
+        try:
+            response = await self.client.post("/completion", json={**(options or {}), "prompt": prompt})
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error("Worker %d completion failed: %s", self.index, e)
+            raise _execution_error(f"Llama execution failed on worker {self.index}: {e}", e)
+        return response.json().get("content", "").strip()
+
+    async def slot_action(self, action: str, filename: str, slot: int = 0) -> dict:
+        """
+        Saves or restores a slot's KV state to/from `filename` in the worker's `--slot-save-path`.
+
+        Args:
+            action (str): "save" or "restore".
+            filename (str): State file name (no directories).
+            slot (int): Slot id.
+
+        Raises:
+            LlamaExecutionError: If the worker is down or rejects the request.
+        """
+        import httpx
+
+        if not self.is_alive or self.client is None:
+            raise LlamaExecutionError(f"llama-server worker {self.index} is not running")
+        try:
+            response = await self.client.post(f"/slots/{slot}", params={"action": action}, json={"filename": filename})
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error("Worker %d slot %s failed: %s", self.index, action, e)
+            raise _execution_error(f"Slot {action} failed on worker {self.index}: {e}", e)
+        return response.json()
+
+    async def stream(self, prompt: str, options: Optional[dict] = None, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        """
+        Runs a completion with `stream: true` and yields content pieces as the server emits them.
+
+        Closing the generator early drops the HTTP connection, which makes llama-server
+        abandon the generation. If `usage` is given, it receives the worker's `pid`
+        up front and the final event's `tokens_cached` and `timings`.
+
+        Raises:
+            LlamaExecutionError: If the worker is down or the completion request fails.
+        """
+        import httpx
+
+        if not self.is_alive or self.client is None:
+            raise LlamaExecutionError(f"llama-server worker {self.index} is not running")
+        if usage is not None:
+            usage["pid"] = self.process.pid
+        try:
+            async with self.client.stream("POST", "/completion", json={**(options or {}), "prompt": prompt, "stream": True}) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    event = json.loads(line[len("data: "):])
+                    if event.get("content"):
+                        yield event["content"]
+                    if event.get("stop"):
+                        if usage is not None:
+                            usage.update(tokens_cached=event.get("tokens_cached"), timings=event.get("timings"))
+                        break
+        except httpx.HTTPError as e:
+            logger.error("Worker %d streaming completion failed: %s", self.index, e)
+            raise _execution_error(f"Llama execution failed on worker {self.index}: {e}", e)
+
+
+class WorkerPool:
+    """Pool of model-resident `llama-server` workers with idle-worker dispatch.
+
+    Configuration is loaded from `settings` when the pool is started:
+        - worker_count: Number of workers to run
+        - llama_server_path: Path to the llama-server binary
+        - model_path: Path to the model GGUF file
+        - worker_host / worker_base_port: Where the workers listen
+        - worker_startup_timeout: How long to wait for the model to load
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        binary_path: Optional[Path] = None,
+        model_path: Optional[Path] = None,
+        host: Optional[str] = None,
+        base_port: Optional[int] = None,
+    ):
+        self._size = size
+        self._binary_path = binary_path
+        self._model_path = model_path
+        self._host = host
+        self._base_port = base_port
+        self.workers: list[LlamaServerWorker] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._queued: set[int] = set()
+        # Callers blocked in `acquire` waiting for an idle worker
+        self._waiting = 0
+
+    @property
+    def started(self) -> bool:
+        return bool(self.workers)
+
+    async def start(self) -> None:
+        """
+        Starts every worker and waits until all of them have loaded the model.
+
+        Raises:
+            FileNotFoundError: If the llama-server binary or model file is missing.
+            RuntimeError: If any worker fails to start.
+        """
+        if self.started:
+            return
+
+        size = self._size if self._size is not None else settings.worker_count
+        binary_path = Path(self._binary_path or settings.llama_server_path or "")
+        model_path = Path(self._model_path or settings.model_path)
+        host = self._host or settings.worker_host
+        base_port = self._base_port if self._base_port is not None else settings.worker_base_port
+
+        if not binary_path.is_file():
+            logger.error("llama-server binary not found at path: %s", binary_path)
+            raise FileNotFoundError(f"llama-server binary not found: {binary_path}")
+        if not model_path.is_file():
+            logger.error("Model file not found at path: %s", model_path)
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+
+        workers = [
+            LlamaServerWorker(
+                index=i,
+                binary_path=binary_path,
+                model_path=model_path,
+                host=host,
+                port=base_port + i if base_port else _free_port(host),
+            )
+            for i in range(size)
+        ]
+        results = await asyncio.gather(
+            *(w.start(settings.worker_startup_timeout) for w in workers),
+            return_exceptions=True,
+        )
+        failures = [r for r in results if isinstance(r, BaseException)]
+        if failures:
+            await asyncio.gather(*(w.stop() for w in workers))
+            raise RuntimeError(f"Failed to start worker pool: {failures[0]}")
+
+        self.workers = workers
+        self._idle = asyncio.Queue()
+        self._queued = set()
+        for worker in workers:
+            self._make_idle(worker)
+        logger.info("Worker pool started with %d llama-server worker(s)", size)
+
+    async def stop(self) -> None:
+        """Stops all workers. Safe to call when the pool was never started."""
+        if not self.started:
+            return
+        await asyncio.gather(*(w.stop() for w in self.workers))
+        self.workers = []
+        self._idle = None
+        self._queued = set()
+        logger.info("Worker pool stopped")
+
+    def _make_idle(self, worker: LlamaServerWorker) -> None:
+        if (
+            self._idle is not None
+            and worker in self.workers
+            and worker.state == WORKER_READY
+            and worker.index not in self._queued
+        ):
+            self._queued.add(worker.index)
+            self._idle.put_nowait(worker)
+
+    def take_out_of_rotation(self, worker: LlamaServerWorker, state: str) -> None:
+        """
+        Marks a worker restarting or quarantined. Once no worker is ready, callers
+        waiting in `acquire` are woken so they fail instead of waiting forever.
+        """
+        worker.state = state
+        if self.ready_count == 0 and self._idle is not None:
+            for _ in range(self._waiting):
+                # A None wakes one waiter, which re-checks `ready_count`
+                self._idle.put_nowait(None)
+
+    def reinstate(self, worker: LlamaServerWorker) -> None:
+        """Marks a recovered worker ready and puts it back into rotation."""
+        worker.state = WORKER_READY
+        self._make_idle(worker)
+
+    @property
+    def busy_count(self) -> int:
+        """Ready workers currently leased to a request."""
+        return sum(1 for w in self.workers if w.state == WORKER_READY and w.index not in self._queued)
+
+    @property
+    def ready_count(self) -> int:
+        return sum(1 for w in self.workers if w.state == WORKER_READY)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[LlamaServerWorker]:
+        """
+        Holds the next idle worker for the duration of the `async with` block,
+        waiting for one if all are busy. Workers the supervisor took out of
+        rotation are skipped until they are reinstated.
+        """
+        if not self.started:
+            raise LlamaExecutionError("Worker pool is not running")
+        while True:
+            if self.ready_count == 0:
+                raise LlamaExecutionError("No healthy llama-server worker is available")
+            self._waiting += 1
+            try:
+                worker = await self._idle.get()
+            finally:
+                self._waiting -= 1
+            if worker is None:
+                continue
+            self._queued.discard(worker.index)
+            if worker.state == WORKER_READY:
+                break
+        try:
+            yield worker
+        finally:
+            self.release(worker)
+
+    @asynccontextmanager
+    async def acquire_all(self) -> AsyncIterator[list[LlamaServerWorker]]:
+        """
+        Holds every ready worker for the duration of the `async with` block, waiting
+        for those leased to requests. Lets a caller run something once on each
+        worker (e.g. warm-up) without overlapping a request.
+        """
+        async with AsyncExitStack() as leases:
+            yield [await leases.enter_async_context(self.acquire()) for _ in range(self.ready_count)]
+
+    def try_acquire(self) -> Optional[LlamaServerWorker]:
+        """Takes an idle ready worker without waiting; None if all are busy. Hand it back with `release`."""
+        while self._idle is not None and not self._idle.empty():
+            worker = self._idle.get_nowait()
+            if worker is None:
+                continue
+            self._queued.discard(worker.index)
+            if worker.state == WORKER_READY:
+                return worker
+        return None
+
+    def release(self, worker: LlamaServerWorker) -> None:
+        """Returns a worker taken with `try_acquire` to the idle rotation."""
+        self._make_idle(worker)
+
+    async def run_prompt(self, prompt: str, options: Optional[dict] = None) -> str:
+        """
+        Dispatches a prompt to the next idle worker, waiting for one if all are busy.
+
+        Returns:
+            str: The model's generated output.
+        """
+        async with self.acquire() as worker:
+            logger.debug("Dispatching prompt to worker %d", worker.index)
+            worker.resident_session = None
+            return await worker.complete(prompt, options)
+
+    async def stream_prompt(self, prompt: str, options: Optional[dict] = None, usage: Optional[dict] = None) -> AsyncIterator[str]:
+        """
+        Streams a prompt's output from the next idle worker, holding it until the stream ends.
+        """
+        async with self.acquire() as worker:
+            logger.debug("Dispatching streaming prompt to worker %d", worker.index)
+            worker.resident_session = None
+            async for chunk in worker.stream(prompt, options, usage):
+                yield chunk
+
+
+# Singleton-like pool started and stopped by the FastAPI lifespan
+worker_pool = WorkerPool()
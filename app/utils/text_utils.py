@@ -0,0 +1,17 @@
+import math
+
+# Rough characters-per-token ratio of llama-family BPE vocabularies on English prose
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens in `text` without loading a tokenizer.
+
+    Args:
+        text (str): Any text.
+
+    Returns:
+        int: Approximate token count (0 for empty text).
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
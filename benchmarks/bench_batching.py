@@ -0,0 +1,91 @@
+"""
+Throughput vs. latency of micro-batching for different batch windows.
+
+Starts a llama-server worker pool and fires `--requests` prompts with
+`--concurrency` callers in flight, once without batching (one request per
+worker at a time) and once per batch window. Prints requests/s and latency
+percentiles for each run.
+
+Usage:
+    LLAMA_WORKER_SLOTS=4 python benchmarks/bench_batching.py \\
+        --server /opt/llama.cpp/llama-server --model /models/model.gguf \\
+        --workers 1 --windows 0,5,20,50 --requests 64 --concurrency 16
+
+Without `--server`, the fake server from tests/mocks is used, which only
+exercises the scheduling overhead (it does not batch anything).
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.config.settings import settings  # noqa: E402
+from app.services.batching import MicroBatcher  # noqa: E402
+from app.services.worker_pool import WorkerPool  # noqa: E402
+
+FAKE_SERVER = Path(__file__).resolve().parents[1] / "tests" / "mocks" / "llama_cpp" / "fake_llama_server.py"
+PROMPT = "Summarize: patient {i} admitted with chest pain, troponin negative, discharged on aspirin."
+
+
+async def _run(stream_factory, requests: int, concurrency: int, predict: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            async for _ in stream_factory(PROMPT.format(i=i), {"n_predict": predict}):
+                pass
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "req_per_s": requests / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", default=None, help="llama-server binary (default: fake test server)")
+    parser.add_argument("--model", default=None, help="GGUF model (default: LLAMA_MODEL_PATH)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--windows", default="0,5,20,50", help="Comma-separated batch windows in ms")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--predict", type=int, default=64)
+    args = parser.parse_args()
+
+    pool = WorkerPool(
+        size=args.workers,
+        binary_path=Path(args.server) if args.server else FAKE_SERVER,
+        model_path=Path(args.model or settings.model_path),
+        base_port=0,
+    )
+    await pool.start()
+    try:
+        rows = [("unbatched", await _run(pool.stream_prompt, args.requests, args.concurrency, args.predict))]
+        for window in (float(w) for w in args.windows.split(",")):
+            batcher = MicroBatcher(pool, window_ms=window, max_batch=settings.worker_slots)
+            result = await _run(batcher.stream, args.requests, args.concurrency, args.predict)
+            result["mean_batch"] = batcher.stats()["mean_batch_size"]
+            rows.append((f"window={window:g}ms", result))
+    finally:
+        await pool.stop()
+
+    print(f"workers={args.workers} slots={settings.worker_slots} requests={args.requests} concurrency={args.concurrency}")
+    print(f"{'mode':<16}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'batch':>8}")
+    for name, r in rows:
+        print(f"{name:<16}{r['req_per_s']:>10.2f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r.get('mean_batch', 1.0):>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+Cold-start cost of the API: import time of `app.main` and time to the first
+`/ping` response.
+
+Each run is a fresh interpreter that imports `app.main`, runs the FastAPI
+lifespan startup and sends `GET /ping` straight to the ASGI app (no server or
+network in between). Prints the median and worst of `--runs` runs:
+
+- import: `import app.main`
+- first ping: interpreter start to the `/ping` response, i.e. what a new uvicorn
+  worker or test process pays before it can serve
+
+Usage:
+    python benchmarks/bench_cold_start.py --runs 10
+
+Without LLAMA_LLAMA_CLI_PATH / LLAMA_MODEL_PATH in the environment, the fake
+llama-cli from tests/mocks and a placeholder model are used. Logs, the job
+database and caches go to a temporary directory; no worker pool is started.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+FAKE_CLI = ROOT / "tests" / "mocks" / "llama_cpp" / "fake_llama_cli.sh"
+
+CHILD = """
+import time
+started = time.perf_counter()
+import asyncio, json
+import app.main
+imported = time.perf_counter()
+
+async def first_ping():
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": "/ping", "raw_path": b"/ping", "query_string": b"",
+             "root_path": "", "headers": [], "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 80)}
+    async with app.main.app.router.lifespan_context(app.main.app):
+        await app.main.app(scope, receive, send)
+        answered_at = time.time()
+    return messages[0]["status"], answered_at
+
+status, answered_at = asyncio.run(first_ping())
+print(json.dumps({"import_ms": (imported - started) * 1000, "answered_at": answered_at, "status": status}))
+"""
+
+
+def _run_once(env: dict) -> dict:
+    # Wall clock, since the child's answer time is compared with the spawn time here
+    spawned_at = time.time()
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    if sample["status"] != 200:
+        raise RuntimeError(f"/ping answered {sample['status']}")
+    return {"import_ms": sample["import_ms"], "first_ping_ms": (sample["answered_at"] - spawned_at) * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = Path(tmp) / "model.gguf"
+        model.write_bytes(b"GGUF")
+        env = {
+            **os.environ,
+            "LLAMA_LLAMA_CLI_PATH": os.environ.get("LLAMA_LLAMA_CLI_PATH", str(FAKE_CLI)),
+            "LLAMA_MODEL_PATH": os.environ.get("LLAMA_MODEL_PATH", str(model)),
+            "LLAMA_WORKER_COUNT": "0",
+            "LLAMA_LOG_FILE": str(Path(tmp) / "logs" / "medparswell.log"),
+            "LLAMA_JOB_DB_PATH": str(Path(tmp) / "jobs.sqlite3"),
+            "LLAMA_RESPONSE_CACHE_DIR": "",
+        }
+        _run_once(env)  # warm the filesystem cache and bytecode
+        samples = [_run_once(env) for _ in range(args.runs)]
+
+    for name in ("import_ms", "first_ping_ms"):
+        values = [s[name] for s in samples]
+        print(f"{name:14s} median {statistics.median(values):7.1f} ms   max {max(values):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
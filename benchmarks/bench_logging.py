@@ -0,0 +1,119 @@
+"""
+Per-request logging overhead before and after the queue-based pipeline.
+
+Replays the log calls of one `/summarize` request (received, content length,
+llama-cli launch, raw output, generated summary, ...) `--requests` times, with a
+document and summary of realistic size, through:
+
+- before: synchronous console + file handlers on the calling thread, payloads
+  formatted into f-strings whether or not the level is enabled;
+- after: `app.config.logging_config` (QueueHandler, payload redaction, listener
+  thread doing the I/O), payloads passed as lazy `%s` arguments.
+
+Prints the time spent on the calling thread per request, which is what an
+event-loop request pays, and for "after" the time the listener needed to drain.
+`--flush-latency-ms` adds a delay to every file flush, to see what a slow or
+contended disk costs each pipeline.
+
+Usage:
+    python benchmarks/bench_logging.py --requests 5000 --level INFO
+    python benchmarks/bench_logging.py --requests 5000 --level DEBUG --json
+    python benchmarks/bench_logging.py --requests 1000 --flush-latency-ms 0.5
+"""
+import argparse
+import logging
+import logging.handlers
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.config import logging_config  # noqa: E402
+
+DOCUMENT = "Patient admitted with chest pain; troponin negative; discharged on aspirin. " * 400
+SUMMARY = "Chest pain, troponin negative, discharged on aspirin 81 mg daily. " * 8
+STDOUT = DOCUMENT + SUMMARY
+
+
+def request_before(logger: logging.Logger) -> None:
+    logger.info("📝 Received summarization request")
+    logger.debug(f"📥 Content length: {len(DOCUMENT)} chars")
+    logger.info("Launching llama-cli subprocess...")
+    logger.debug(f"Raw stdout:\n{STDOUT}")
+    logger.debug(f"Final output returned: {SUMMARY.strip()}")
+    logger.info("Llama CLI executed successfully")
+    logger.debug(f"📤 Generated summary: {SUMMARY}")
+
+
+def request_after(logger: logging.Logger) -> None:
+    logger.info("📝 Received summarization request")
+    logger.debug("📥 Content length: %d chars", len(DOCUMENT))
+    logger.info("Launching llama-cli subprocess...")
+    logger.debug("Raw stdout:\n%s", STDOUT)
+    logger.info("Llama CLI executed successfully")
+    logger.debug("📤 Generated summary: %s", SUMMARY)
+
+
+def _configure_before(level: str, log_file: Path, console) -> None:
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    formatter = logging.Formatter(logging_config.LOG_FORMAT)
+    for handler in (logging.StreamHandler(console), logging.FileHandler(log_file)):
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def _run(replay, requests: int) -> float:
+    logger = logging.getLogger("medparswell")
+    started = time.perf_counter()
+    for _ in range(requests):
+        replay(logger)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--level", default="INFO")
+    parser.add_argument("--json", action="store_true", help="JSON records for the new pipeline")
+    parser.add_argument("--flush-latency-ms", type=float, default=0.0, help="Simulated latency of each file flush")
+    args = parser.parse_args()
+
+    if args.flush_latency_ms:
+        flush = logging.FileHandler.flush
+
+        def slow_flush(handler):
+            flush(handler)
+            time.sleep(args.flush_latency_ms / 1000)
+
+        logging.FileHandler.flush = slow_flush
+
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        _configure_before(args.level, Path(tmp) / "before.log", devnull)
+        before = _run(request_before, args.requests)
+
+        stderr, sys.stderr = sys.stderr, devnull
+        try:
+            logging_config.configure_logging(args.level, Path(tmp) / "after.log", json_format=args.json)
+            after = _run(request_after, args.requests)
+            drain_started = time.perf_counter()
+            logging_config.shutdown_logging()
+            drain = time.perf_counter() - drain_started
+        finally:
+            sys.stderr = stderr
+
+        sizes = {name: (Path(tmp) / name).stat().st_size for name in ("before.log", "after.log")}
+
+    print(f"{args.requests} requests at {args.level}, {args.flush_latency_ms} ms per file flush")
+    print(f"before: {before:8.1f} µs/request on the caller, log {sizes['before.log'] / 1e6:.1f} MB")
+    print(f"after:  {after:8.1f} µs/request on the caller, log {sizes['after.log'] / 1e6:.1f} MB "
+          f"(listener drained the backlog in {drain * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import os
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.services.supervisor import circuit_breaker
 
 # Use the FastAPI test client
 @pytest.fixture(scope="module")
@@ -12,4 +13,9 @@ def client():
 @pytest.fixture(autouse=True, scope="function")
 def set_fake_llama_cli_path(monkeypatch):
     mock_path = os.path.abspath("tests/mocks/llama_cpp/fake_llama_cli.sh")
-    monkeypatch.setenv("LLAMA_CLI_PATH", mock_path)
\ No newline at end of file
+    monkeypatch.setenv("LLAMA_CLI_PATH", mock_path)
+# Failures provoked by one test must not leave the circuit breaker open for the next
+@pytest.fixture(autouse=True)
+def reset_circuit_breaker():
+    yield
+    circuit_breaker.record_success()
@@ -5,13 +5,45 @@
 # Purpose: Simulates the behavior of `llama-cli` for testing purposes.
 # This script echoes received arguments and outputs a canned response.
 # Used in unit tests to mock the CLI interface without running the real model.
+# Set FAKE_LLAMA_GEN_DELAY (seconds) to simulate a slow generation.
+# A prompt passed with --file (a path or /dev/stdin) is echoed as well.
+# A llama.cpp timing block is printed on stderr on exit.
+# Set FAKE_LLAMA_REJECT_ARG to make it exit 1, like llama-cli on an invalid
+# argument, whenever that argument is passed.
 # -----------------------------------------------------------------------------
 
 
 # Simulated fake llama-cli for testing
+if [ -n "$FAKE_LLAMA_REJECT_ARG" ]; then
+  for arg in "$@"; do
+    if [ "$arg" = "$FAKE_LLAMA_REJECT_ARG" ]; then
+      echo "error: invalid argument: $arg" >&2
+      exit 1
+    fi
+  done
+fi
+
+sleep "${FAKE_LLAMA_GEN_DELAY:-0}"
 echo "Simulated llama-cli"
 echo "Prompt received: $*"
 
+prev=""
+for arg in "$@"; do
+  if [ "$prev" = "--file" ]; then
+    echo "File prompt: $(cat "$arg")"
+  fi
+  prev="$arg"
+done
+
 # Fake response
 echo "The capital of France is Paris."
+
+# Timing block, as recent llama.cpp prints it on exit
+cat >&2 <<'EOF'
+llama_perf_sampler_print:    sampling time =       1.50 ms /    12 runs   (    0.12 ms per token,  8000.00 tokens per second)
+llama_perf_context_print:        load time =     120.00 ms
+llama_perf_context_print: prompt eval time =      40.00 ms /    20 tokens (    2.00 ms per token,   500.00 tokens per second)
+llama_perf_context_print:        eval time =     100.00 ms /    10 runs   (   10.00 ms per token,   100.00 tokens per second)
+llama_perf_context_print:       total time =     260.00 ms /    30 tokens
+EOF
 exit 0
\ No newline at end of file
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# File: fake_llama_server.py
+# Purpose: Simulates the behavior of `llama-server` for testing purposes.
+# Serves `/health` and `/completion` (optionally streamed as SSE) like the
+# real server and echoes the prompt back together with its own PID, so tests
+# can check that requests are served by long-lived workers without loading a
+# real model. `/slots/0?action=save|restore` writes/reads the last prompt to a
+# file in `--slot-save-path`, and `tokens_cached` counts the characters of the
+# prompt shared with the slot's previous one. The final streamed event carries
+# fixed `timings`.
+#
+# Environment:
+#   FAKE_LLAMA_LOAD_DELAY   Seconds to report 503 "loading model" on /health.
+#   FAKE_LLAMA_GEN_DELAY    Seconds to sleep before answering a completion.
+# -----------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+STARTED_AT = time.monotonic()
+LOAD_DELAY = float(os.getenv("FAKE_LLAMA_LOAD_DELAY", "0"))
+GEN_DELAY = float(os.getenv("FAKE_LLAMA_GEN_DELAY", "0"))
+SLOT_SAVE_PATH = None
+SLOT_PROMPT = {"prompt": ""}
+
+
+class FakeLlamaHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            if time.monotonic() - STARTED_AT < LOAD_DELAY:
+                self._send_json(503, {"error": {"message": "Loading model"}})
+            else:
+                self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        url = urlparse(self.path)
+        if url.path.startswith("/slots/"):
+            self._slot_action(parse_qs(url.query).get("action", [""])[0], payload.get("filename", ""))
+            return
+        if self.path != "/completion":
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        time.sleep(GEN_DELAY)
+        prompt = payload.get("prompt", "")
+        tokens_cached = len(os.path.commonprefix([SLOT_PROMPT["prompt"], prompt])) if payload.get("cache_prompt") else 0
+        SLOT_PROMPT["prompt"] = prompt
+        content = f"Simulated llama-server[{os.getpid()}]: {prompt}"
+        if payload.get("stream"):
+            self._send_stream(content)
+        else:
+            self._send_json(200, {"content": content, "tokens_predicted": len(content.split()), "tokens_cached": tokens_cached})
+
+    def _slot_action(self, action, filename):
+        if SLOT_SAVE_PATH is None or not filename:
+            self._send_json(400, {"error": {"message": "slot save path not set"}})
+            return
+        path = os.path.join(SLOT_SAVE_PATH, filename)
+        if action == "save":
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(SLOT_PROMPT["prompt"])
+            self._send_json(200, {"filename": filename, "n_saved": len(SLOT_PROMPT["prompt"])})
+        elif action == "restore" and os.path.isfile(path):
+            with open(path, encoding="utf-8") as handle:
+                SLOT_PROMPT["prompt"] = handle.read()
+            self._send_json(200, {"filename": filename, "n_restored": len(SLOT_PROMPT["prompt"])})
+        else:
+            self._send_json(400, {"error": {"message": f"cannot {action} {filename}"}})
+
+    def _send_stream(self, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for piece in content.split(" "):
+            event = {"content": piece + " ", "stop": False}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        timings = {"prompt_n": 20, "prompt_ms": 40.0, "predicted_n": 10, "predicted_ms": 100.0}
+        final = {"content": "", "stop": True, "timings": timings}
+        self.wfile.write(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--slot-save-path", default=None)
+    args, _ = parser.parse_known_args()
+    global SLOT_SAVE_PATH
+    SLOT_SAVE_PATH = args.slot_save_path
+    ThreadingHTTPServer((args.host, args.port), FakeLlamaHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
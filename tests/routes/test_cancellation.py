@@ -0,0 +1,46 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config.settings import settings
+from app.main import app
+from app.services.cancellation import cancellation_stats, process_cpu_seconds, reclaimed_cpu_seconds
+
+FAKE_CLI = Path(__file__).resolve().parents[1] / "mocks" / "llama_cpp" / "fake_llama_cli.sh"
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def fake_backend(tmp_path, monkeypatch):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr(settings, "llama_cli_path", str(FAKE_CLI))
+    monkeypatch.setattr(settings, "model_path", str(model))
+    monkeypatch.setattr(settings, "response_cache_enabled", False)
+
+
+def test_deadline_cancels_running_generation(monkeypatch):
+    monkeypatch.setenv("FAKE_LLAMA_GEN_DELAY", "10")
+    before = cancellation_stats.stats()
+    started = time.monotonic()
+    response = client.post(
+        "/summarize",
+        json={"content": "A slow document"},
+        headers={"X-Request-Deadline": str(time.time() + 0.5)},
+    )
+    assert response.status_code == 504
+    assert time.monotonic() - started < 5
+    after = cancellation_stats.stats()
+    assert after["deadlines_expired"] == before["deadlines_expired"] + 1
+    assert after["generations_cancelled"] == before["generations_cancelled"] + 1
+
+
+def test_reclaimed_cpu_estimate():
+    assert process_cpu_seconds(os.getpid()) is not None
+    # 10 tokens in 2s on 4 cores, 90 tokens left -> 0.2 s/token * 90 * 4
+    assert reclaimed_cpu_seconds(4.0, 2.0, 10, 90) == pytest.approx(72.0)
+    assert reclaimed_cpu_seconds(None, 0.0, 0, 90) == 0.0
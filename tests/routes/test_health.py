@@ -8,3 +8,15 @@ def test_ping():
     assert response.status_code == 200
     assert response.json().get("status") == "ok"
     assert "medparswell" in response.json().get("message", "")
+
+
+def test_health_reports_backend_readiness(monkeypatch):
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "model_path", "/nonexistent/model.gguf")
+    response = client.get("/health")
+    assert response.status_code == 503
+    body = response.json()
+    assert body["status"] == "unavailable"
+    assert body["backend"] == "llama-cli"
+    assert body["model_found"] is False
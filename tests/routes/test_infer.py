@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+from app.config.settings import settings
+from app.main import app
+
+FAKE_CLI = Path(__file__).resolve().parents[1] / "mocks" / "llama_cpp" / "fake_llama_cli.sh"
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def fake_backend(tmp_path, monkeypatch):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr(settings, "llama_cli_path", str(FAKE_CLI))
+    monkeypatch.setattr(settings, "model_path", str(model))
+
+
+def test_infer_forwards_non_default_flags():
+    response = client.post("/infer", json={"prompt": "Hello", "threads": 4, "mlock": True})
+    assert response.status_code == 200
+    body = response.json()
+    assert "--threads 4" in body["output"]
+    assert "--mlock" in body["output"]
+    assert "--temp" not in body["output"]
+    assert body["execution_time_ms"] >= 0
+
+
+def test_infer_is_shed_with_retry_after_when_queue_is_full(monkeypatch):
+    from app.services.scheduler import inference_gate
+
+    monkeypatch.setattr(settings, "max_queue_depth", 1)
+    monkeypatch.setattr(inference_gate, "_waiters", [SimpleNamespace(cost=100)])
+    response = client.post("/infer", json={"prompt": "Hello"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_infer_with_past_deadline_is_dropped():
+    response = client.post("/infer", json={"prompt": "Hello"}, headers={"X-Request-Deadline": "1"})
+    assert response.status_code == 504
+
+
+def test_infer_reports_llama_timings():
+    response = client.post("/infer", json={"prompt": "Timings please", "threads": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["timings"]["eval_tokens_per_second"] == 100.0
+    assert body["timings"]["load_ms"] == 120.0
+    assert body["tokens_generated"] == 10
+
+
+def test_infer_rejects_options_that_take_paths():
+    response = client.post("/infer", json={"prompt": "Hello", "lookup_cache_static": "/etc/passwd"})
+    assert response.status_code == 400
+    assert "lookup_cache_static" in response.json()["detail"]
+
+
+def test_rejected_flags_do_not_open_the_circuit_breaker(monkeypatch):
+    from app.services.supervisor import circuit_breaker
+
+    monkeypatch.setenv("FAKE_LLAMA_REJECT_ARG", "--cache-type-k")
+    lenient = TestClient(app, raise_server_exceptions=False)
+    for _ in range(settings.breaker_failure_threshold + 1):
+        response = lenient.post("/infer", json={"prompt": "Hello", "cache_type_k": "q8_0"})
+        assert response.status_code == 500
+
+    assert circuit_breaker.stats()["state"] == "closed"
+    assert circuit_breaker.consecutive_failures == 0
+    assert client.post("/summarize", json={"content": "Hello"}).status_code == 200
+
+    # A plain request that fails without output is still a backend fault
+    monkeypatch.setenv("FAKE_LLAMA_REJECT_ARG", "--ctx-size")
+    lenient.post("/summarize", json={"content": "Hello again"})
+    assert circuit_breaker.consecutive_failures == 1
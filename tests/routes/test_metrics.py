@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config.settings import settings
+from app.main import app
+from app.services.metrics import MetricsRegistry
+
+FAKE_CLI = Path(__file__).resolve().parents[1] / "mocks" / "llama_cpp" / "fake_llama_cli.sh"
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def fake_backend(tmp_path, monkeypatch):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr(settings, "llama_cli_path", str(FAKE_CLI))
+    monkeypatch.setattr(settings, "model_path", str(model))
+
+
+def test_metrics_exposes_request_queue_and_throughput_series():
+    assert client.post("/infer", json={"prompt": "Count me", "threads": 2}).status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE medparswell_request_duration_seconds histogram" in body
+    assert 'medparswell_request_duration_seconds_count{route="/infer",method="POST",status="200"}' in body
+    assert 'medparswell_queue_wait_seconds_bucket{lane="interactive",le="+Inf"}' in body
+    assert 'medparswell_tokens_per_second_count{phase="eval"}' in body
+    assert "medparswell_llama_cli_spawn_seconds_count" in body
+    assert 'medparswell_cache_hit_ratio{cache="response"}' in body
+    assert 'medparswell_rejected_requests_total{reason="queue_depth"}' in body
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, route="/x")
+    lines = registry.render().splitlines()
+    assert 'demo_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/x",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/x",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{route="/x"} 3' in lines
+    assert 'demo_seconds_sum{route="/x"} 5.55' in lines
@@ -0,0 +1,46 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config.settings import settings
+from app.main import app
+from app.services.readiness import PHASE_FAILED, Startup, startup
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def local_backend(monkeypatch, tmp_path):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr(settings, "model_path", str(model))
+    monkeypatch.setattr(settings, "worker_count", 0)
+    monkeypatch.setattr(settings, "prompt_cache_dir", str(tmp_path / "prompt-cache"))
+    return model
+
+
+def test_livez_answers_before_startup():
+    assert client.get("/livez").status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_readyz_after_warmup(local_backend, monkeypatch):
+    monkeypatch.setattr(startup, "phase", "starting")
+    assert client.get("/readyz").status_code == 503
+
+    await startup.run()
+
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["phase"] == "ready"
+    assert body["warmup"]["prompts"] == len(settings.warmup_prompts)
+    assert body["warmup"]["failures"] == 0
+
+
+@pytest.mark.asyncio
+async def test_missing_model_fails_startup(local_backend, monkeypatch):
+    monkeypatch.setattr(settings, "model_path", str(local_backend.parent / "missing.gguf"))
+    failed = Startup()
+    await failed.run()
+    assert failed.phase == PHASE_FAILED
+    assert not failed.report()["ready"]
@@ -0,0 +1,40 @@
+import json
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+from app.config.settings import settings
+from app.main import app
+
+FAKE_CLI = Path(__file__).resolve().parents[1] / "mocks" / "llama_cpp" / "fake_llama_cli.sh"
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def fake_backend(tmp_path, monkeypatch):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr(settings, "llama_cli_path", str(FAKE_CLI))
+    monkeypatch.setattr(settings, "model_path", str(model))
+
+
+def test_summarize_stream_ndjson_frames():
+    response = client.post("/summarize/stream", json={"content": "What is the capital of France?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    frames = [json.loads(line) for line in response.text.splitlines() if line]
+    text = "".join(f["token"] for f in frames if "token" in f)
+    assert "Paris" in text
+    final = frames[-1]
+    assert final["done"] is True
+    assert final["ttft_ms"] is not None
+    assert final["duration_ms"] >= final["ttft_ms"]
+
+
+def test_summarize_stream_sse_frames():
+    response = client.post("/summarize/stream?format=sse", json={"content": "Hello"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(block[len("data: "):]) for block in response.text.split("\n\n") if block]
+    assert events[-1]["done"] is True
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config.settings import settings
+from app.main import app
+
+FAKE_CLI = Path(__file__).resolve().parents[1] / "mocks" / "llama_cpp" / "fake_llama_cli.sh"
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def fake_backend(tmp_path, monkeypatch):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr(settings, "llama_cli_path", str(FAKE_CLI))
+    monkeypatch.setattr(settings, "model_path", str(model))
+    monkeypatch.setattr(settings, "response_cache_enabled", False)
+
+
+def _phases(header: str) -> dict[str, float]:
+    phases = {}
+    for part in header.split(","):
+        name, *params = part.strip().split(";")
+        phases[name] = float(next(p for p in params if p.startswith("dur="))[4:])
+    return phases
+
+
+def test_infer_reports_phases_in_server_timing_and_trace_record():
+    response = client.post("/infer", json={"prompt": "Trace me", "threads": 2})
+    assert response.status_code == 200
+    phases = _phases(response.headers["server-timing"])
+    for name in ("validate", "queue", "spawn", "inference", "load", "prompt_eval", "generate", "serialize", "total"):
+        assert name in phases
+    assert phases["generate"] == 100.0  # reported by the fake llama-cli
+
+    traces = client.get("/admin/traces").json()
+    record = next(r for r in traces["recent"] if r["trace_id"] == response.headers["x-trace-id"])
+    assert record["path"] == "/infer"
+    assert record["status"] == 200
+    assert record["backend"] == "llama-cli"
+    assert record["spans"]["spawn"]["count"] == 1
+
+
+def test_validation_failure_is_traced_without_reaching_the_backend():
+    response = client.post("/infer", json={"prompt": 42})
+    assert response.status_code == 422
+    phases = _phases(response.headers["server-timing"])
+    assert "validate" in phases
+    assert "inference" not in phases
+
+
+def test_sampled_request_writes_a_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "profile_sample_rate", 1.0)
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path / "profiles"))
+    response = client.post("/infer", json={"prompt": "Profile me", "threads": 2})
+    assert response.status_code == 200
+    profiles = list((tmp_path / "profiles").glob("*.prof"))
+    assert len(profiles) == 1
+    assert response.headers["x-trace-id"] in profiles[0].name
+
+    # Only inference endpoints are profiled
+    client.get("/health")
+    assert len(list((tmp_path / "profiles").glob("*.prof"))) == 1
@@ -0,0 +1,56 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app.services.batching import MicroBatcher
+from app.services.worker_pool import WorkerPool
+
+FAKE_SERVER = Path(__file__).resolve().parents[1] / "mocks" / "llama_cpp" / "fake_llama_server.py"
+
+
+async def _collect(stream):
+    return "".join([chunk async for chunk in stream]).strip()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_a_worker_and_get_their_own_output(tmp_path):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    pool = WorkerPool(size=2, binary_path=FAKE_SERVER, model_path=model, base_port=0)
+    await pool.start()
+    try:
+        batcher = MicroBatcher(pool, window_ms=50, max_batch=4)
+        outputs = await asyncio.gather(*(_collect(batcher.stream(f"note {i}")) for i in range(8)))
+    finally:
+        await pool.stop()
+
+    for i, output in enumerate(outputs):
+        assert output.endswith(f"note {i}")
+    assert batcher.counters["batches"] == 2
+    assert batcher.counters["largest_batch"] == 4
+
+
+@pytest.mark.asyncio
+async def test_queued_requests_fail_when_no_worker_is_ready(tmp_path):
+    from app.services.llama_runner import LlamaExecutionError
+    from app.services.worker_pool import WORKER_RESTARTING
+
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    pool = WorkerPool(size=1, binary_path=FAKE_SERVER, model_path=model, base_port=0)
+    await pool.start()
+    try:
+        pool.take_out_of_rotation(pool.workers[0], WORKER_RESTARTING)
+        batcher = MicroBatcher(pool, window_ms=10, max_batch=2)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(_collect(batcher.stream(f"note {i}")) for i in range(3)), return_exceptions=True),
+            timeout=2,
+        )
+        assert all(isinstance(r, LlamaExecutionError) for r in results)
+        assert not batcher._dispatcher.done()
+
+        pool.reinstate(pool.workers[0])
+        assert (await _collect(batcher.stream("back"))).endswith("back")
+    finally:
+        await pool.stop()
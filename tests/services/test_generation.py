@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from app.services.generation import STOP_DEADLINE, STOP_EOS, STOP_SEQUENCE, GenerationGuard
+
+
+async def _chunks(*pieces, delay=0.0):
+    for piece in pieces:
+        if delay:
+            await asyncio.sleep(delay)
+        yield piece
+
+
+async def _collect(guard, source):
+    return "".join([chunk async for chunk in guard.watch(source)])
+
+
+@pytest.mark.asyncio
+async def test_stop_sequence_split_across_chunks():
+    guard = GenerationGuard(stop_sequences=["</summary>"], budget_tokens=100)
+    output = await _collect(guard, _chunks("Patient stable.</sum", "mary> trailing text"))
+    assert output == "Patient stable."
+    assert guard.stop_reason == STOP_SEQUENCE
+    assert guard.tokens_saved > 0
+
+
+@pytest.mark.asyncio
+async def test_echoed_prompt_is_not_scanned():
+    guard = GenerationGuard(stop_sequences=["STOP"], budget_tokens=100, echo_prefix="say STOP")
+    output = await _collect(guard, _chunks("say STOP", " and more"))
+    assert output == "say STOP and more"
+    assert guard.stop_reason == STOP_EOS
+
+
+@pytest.mark.asyncio
+async def test_deadline_returns_partial_output():
+    guard = GenerationGuard(budget_tokens=100, deadline_s=0.05)
+    output = await _collect(guard, _chunks("first", "second", "third", delay=0.03))
+    assert output == "first"
+    assert guard.stop_reason == STOP_DEADLINE
@@ -0,0 +1,53 @@
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+
+from app.services import hedging
+from app.services.hedging import Hedger
+from app.services.worker_pool import WorkerPool
+
+FAKE_SERVER = Path(__file__).resolve().parents[1] / "mocks" / "llama_cpp" / "fake_llama_server.py"
+
+
+def _make_slow(worker, monkeypatch, seconds):
+    original = worker.stream
+
+    async def slow_stream(prompt, options=None, usage=None):
+        await asyncio.sleep(seconds)
+        async for chunk in original(prompt, options, usage):
+            yield chunk
+
+    monkeypatch.setattr(worker, "stream", slow_stream)
+
+
+@pytest.mark.asyncio
+async def test_late_first_token_is_hedged_within_budget(tmp_path, monkeypatch):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr(hedging.settings, "hedge_min_samples", 1)
+    pool = WorkerPool(size=2, binary_path=FAKE_SERVER, model_path=model, base_port=0)
+    hedger = Hedger(pool)
+    hedger.ttft.extend([0.05] * 10)
+    await pool.start()
+    try:
+        slow, fast = pool.workers
+        _make_slow(slow, monkeypatch, 5)
+        started = time.monotonic()
+        output = "".join([chunk async for chunk in hedger.stream("hedge me")])
+        assert output.strip().endswith("hedge me")
+        assert f"[{fast.process.pid}]" in output
+        assert time.monotonic() - started < 3
+        assert hedger.counters["hedged"] == 1
+        assert hedger.counters["hedge_wins"] == 1
+
+        # Without budget the slow request is simply waited for
+        _make_slow(fast, monkeypatch, 0.3)
+        hedger._budget = 0
+        output = "".join([chunk async for chunk in hedger.stream("no hedge")])
+        assert output.strip().endswith("no hedge")
+        assert hedger.counters["hedged"] == 1
+        assert hedger.counters["skipped_budget"] == 1
+    finally:
+        await pool.stop()
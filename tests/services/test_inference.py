@@ -0,0 +1,130 @@
+import asyncio
+import time
+from pathlib import Path
+import httpx
+import pytest
+from app.config.settings import settings
+from app.main import app
+from app.services import inference
+from app.services.inference import run_inference
+from app.services.scheduler import InferenceGate
+
+FAKE_CLI = Path(__file__).resolve().parents[1] / "mocks" / "llama_cpp" / "fake_llama_cli.sh"
+
+
+@pytest.fixture
+def fake_cli(tmp_path, monkeypatch):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr(settings, "llama_cli_path", str(FAKE_CLI))
+    monkeypatch.setattr(settings, "model_path", str(model))
+    monkeypatch.setattr(inference, "inference_gate", InferenceGate(limit=1))
+    return FAKE_CLI
+
+
+@pytest.mark.asyncio
+async def test_run_inference_spawns_cli_without_blocking(fake_cli):
+    output = await run_inference("What is the capital of France?")
+    assert "Paris" in output
+
+
+@pytest.mark.asyncio
+async def test_inference_gate_bounds_concurrency(fake_cli, monkeypatch):
+    monkeypatch.setenv("FAKE_LLAMA_GEN_DELAY", "0.3")
+    gate = inference.inference_gate
+    peak = 0
+
+    async def watch():
+        nonlocal peak
+        while True:
+            peak = max(peak, gate.in_flight)
+            await asyncio.sleep(0.01)
+
+    watcher = asyncio.create_task(watch())
+    started = time.monotonic()
+    await asyncio.gather(run_inference("one"), run_inference("two"))
+    elapsed = time.monotonic() - started
+    watcher.cancel()
+
+    assert peak == 1
+    assert elapsed >= 0.6
+
+
+@pytest.mark.asyncio
+async def test_ping_stays_responsive_during_summarize(fake_cli, monkeypatch):
+    monkeypatch.setenv("FAKE_LLAMA_GEN_DELAY", "1")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        summarize = asyncio.create_task(client.post("/summarize", json={"content": "slow document"}))
+        await asyncio.sleep(0.1)
+        started = time.monotonic()
+        ping = await client.get("/ping")
+        ping_latency = time.monotonic() - started
+        assert not summarize.done()
+        response = await summarize
+
+    assert ping.status_code == 200
+    assert ping_latency < 0.5
+    assert response.status_code == 200
+    assert "Paris" in response.json()["summary"]
+
+
+@pytest.mark.asyncio
+async def test_repeated_request_is_served_from_response_cache(fake_cli, monkeypatch):
+    from app.services.response_cache import ResponseCache
+    cache = ResponseCache(max_entries=8, cache_dir="")
+    monkeypatch.setattr(inference, "response_cache", cache)
+
+    first = await run_inference("same document")
+    monkeypatch.setattr(settings, "llama_cli_path", "/nonexistent/llama-cli")
+    second = await run_inference("same document")
+
+    assert first == second
+    assert cache.stats()["memory_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_are_coalesced(fake_cli, monkeypatch):
+    from app.services.response_cache import ResponseCache
+    from app.services.singleflight import SingleFlight
+    monkeypatch.setenv("FAKE_LLAMA_GEN_DELAY", "0.2")
+    monkeypatch.setattr(inference, "response_cache", ResponseCache(max_entries=8, cache_dir=""))
+    flight = SingleFlight()
+    monkeypatch.setattr(inference, "inflight", flight)
+
+    outputs = await asyncio.gather(
+        run_inference("Discharge summary\r\n"),
+        run_inference("Discharge summary"),
+        run_inference("Discharge summary   \n"),
+    )
+
+    assert len(set(outputs)) == 1
+    assert flight.stats()["leaders"] == 1
+    assert flight.stats()["followers"] == 2
+
+
+def test_plan_sends_the_prompt_as_written_but_keys_it_normalized(fake_cli):
+    indented = inference.ExecutionPlan("def f():\r\n    return 1   \r\n")
+    plain = inference.ExecutionPlan("def f():\n    return 1")
+
+    assert indented.prompt == "def f():\r\n    return 1   \r\n"
+    assert indented.key == plain.key
+
+
+@pytest.mark.asyncio
+async def test_deadline_stopped_generation_is_not_cached(fake_cli, monkeypatch):
+    from app.schemas.llama_inference_schema import LlamaInferenceParameters
+    from app.services.response_cache import ResponseCache
+    cache = ResponseCache(max_entries=8, cache_dir="")
+    monkeypatch.setattr(inference, "response_cache", cache)
+    params = LlamaInferenceParameters(prompt="busy machine", deadline_ms=100)
+
+    monkeypatch.setenv("FAKE_LLAMA_GEN_DELAY", "0.5")
+    truncated = await inference.generate("busy machine", params=params)
+    monkeypatch.setenv("FAKE_LLAMA_GEN_DELAY", "0")
+    complete = await inference.generate("busy machine", params=params)
+
+    assert truncated.stop_reason == "deadline"
+    assert complete.stop_reason != "cached"
+    assert "Paris" in complete.output
+    assert cache.stats()["memory_hits"] == 0
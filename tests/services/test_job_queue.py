@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from app.services import summarizer
+from app.services.job_queue import JobQueue
+
+
+async def _wait_for(queue, job_id, status, timeout=5.0):
+    for _ in range(int(timeout / 0.02)):
+        job = await queue.get(job_id)
+        if job["status"] == status:
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"job {job_id} never reached {status}: {job}")
+
+
+@pytest.fixture
+def fake_summarize(monkeypatch):
+    async def summarize(content, verbose=False):
+        if content == "slow":
+            await asyncio.sleep(30)
+        return f"summary of {content}"
+
+    monkeypatch.setattr(summarizer, "summarize", summarize)
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_and_results_are_fetched_in_bulk(tmp_path, fake_summarize):
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), worker_count=2)
+    await queue.start()
+    try:
+        ids = await queue.submit(["note A", "note B", "note C"])
+        for job_id in ids:
+            await _wait_for(queue, job_id, "succeeded")
+        finished = await queue.results()
+        assert {job["id"] for job in finished} == set(ids)
+        assert await queue.results(finished_after=finished[-1]["finished_at"]) == []
+        assert {job["result"] for job in await queue.results(ids=ids)} == {
+            "summary of note A", "summary of note B", "summary of note C"
+        }
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_job_resumes_after_restart(tmp_path, fake_summarize):
+    db_path = str(tmp_path / "jobs.db")
+    first = JobQueue(db_path=db_path, worker_count=0)
+    await first.start()
+    [job_id] = await first.submit(["note"])
+    # Simulate a crash in the middle of the job
+    await asyncio.to_thread(first._claim_next)
+    assert (await first.get(job_id))["status"] == "running"
+    await first.stop()
+
+    second = JobQueue(db_path=db_path, worker_count=1)
+    await second.start()
+    try:
+        job = await _wait_for(second, job_id, "succeeded")
+        assert job["result"] == "summary of note"
+        assert job["attempts"] == 2
+    finally:
+        await second.stop()
+
+
+@pytest.mark.asyncio
+async def test_cancel_running_job(tmp_path, fake_summarize):
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), worker_count=1)
+    await queue.start()
+    try:
+        [job_id] = await queue.submit(["slow"])
+        await _wait_for(queue, job_id, "running")
+        while job_id not in queue._running:
+            await asyncio.sleep(0.01)
+        assert await queue.cancel(job_id) == "cancelled"
+        await asyncio.sleep(0.05)
+        assert queue._running == {}
+        assert (await queue.get(job_id))["status"] == "cancelled"
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_transient_backend_errors_requeue_the_job(tmp_path, monkeypatch):
+    from app.config.settings import settings
+    from app.services.supervisor import BackendUnavailableError
+
+    monkeypatch.setattr(settings, "job_retry_backoff_seconds", 0.05)
+    monkeypatch.setattr(settings, "job_max_attempts", 3)
+    calls = {}
+
+    async def summarize(content, verbose=False):
+        calls[content] = calls.get(content, 0) + 1
+        if content == "outage" and calls[content] < 3:
+            raise BackendUnavailableError("Inference backend is unavailable; failing fast", retry_after=1)
+        if content == "bad":
+            raise ValueError("unsupported document")
+        if content == "down":
+            raise BackendUnavailableError("Inference backend is unavailable; failing fast", retry_after=1)
+        return f"summary of {content}"
+
+    monkeypatch.setattr(summarizer, "summarize", summarize)
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), worker_count=1)
+    await queue.start()
+    try:
+        outage, bad, down = await queue.submit(["outage", "bad", "down"])
+        job = await _wait_for(queue, outage, "succeeded")
+        assert job["attempts"] == 3
+        assert (await _wait_for(queue, bad, "failed"))["attempts"] == 1
+        job = await _wait_for(queue, down, "failed")
+        assert job["attempts"] == 3
+        assert "unavailable" in job["error"]
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_worker_survives_a_database_error_while_claiming(tmp_path, fake_summarize, monkeypatch):
+    import sqlite3
+    from app.config.settings import settings
+
+    monkeypatch.setattr(settings, "job_retry_backoff_seconds", 0.05)
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), worker_count=1)
+    claim_next = queue._claim_next
+    failures = [sqlite3.OperationalError("database is locked")] * 2
+
+    def flaky_claim_next():
+        if failures:
+            raise failures.pop()
+        return claim_next()
+
+    monkeypatch.setattr(queue, "_claim_next", flaky_claim_next)
+    await queue.start()
+    try:
+        [job_id] = await queue.submit(["note"])
+        assert (await _wait_for(queue, job_id, "succeeded"))["result"] == "summary of note"
+    finally:
+        await queue.stop()
@@ -0,0 +1,76 @@
+import pytest
+
+from app.schemas.llama_inference_schema import LlamaInferenceParameters
+from app.services.llama_argv import (
+    FLAG_TABLE,
+    RUNNER_FIELDS,
+    TOOL_ONLY_FIELDS,
+    UnsupportedOptionError,
+    compile_argv,
+    compile_server_options,
+)
+
+
+def test_every_schema_field_has_a_flag_or_is_excluded():
+    for name in LlamaInferenceParameters.model_fields:
+        assert name in FLAG_TABLE or name in RUNNER_FIELDS or name in TOOL_ONLY_FIELDS, name
+    assert FLAG_TABLE["temperature"].flag == "--temp"
+    assert FLAG_TABLE["predict_tokens"].flag == "--predict"
+
+
+def test_unset_options_compile_to_nothing():
+    assert compile_argv(LlamaInferenceParameters(prompt="hi")) == []
+    assert compile_server_options(LlamaInferenceParameters(prompt="hi")) == ({}, False)
+
+
+def test_explicit_values_equal_to_the_schema_default_are_forwarded():
+    params = LlamaInferenceParameters(prompt="hi", ctx_size=1024, temperature=0.8)
+    assert compile_argv(params) == ["--ctx-size", "1024", "--temp", "0.8"]
+    assert compile_server_options(params) == ({"temperature": 0.8}, True)
+
+
+def test_set_values_become_flags_in_schema_order():
+    params = LlamaInferenceParameters(
+        prompt="hi",
+        mlock=True,
+        cache_type_v="q8_0",
+        threads=4,
+        no_kv_offload=True,
+        cache_type_k="q8_0",
+        threads_batch=16,
+        temperature=0.2,
+    )
+    assert compile_argv(params) == [
+        "--threads", "4",
+        "--threads-batch", "16",
+        "--temp", "0.2",
+        "--no-kv-offload",
+        "--cache-type-k", "q8_0",
+        "--cache-type-v", "q8_0",
+        "--mlock",
+    ]
+
+
+def test_path_network_and_server_options_are_rejected():
+    params = LlamaInferenceParameters(
+        prompt="hi",
+        temperature=0.2,
+        lora_scaled_adapters=[("a.gguf", 0.5)],
+        image=["x.png"],
+        lookup_cache_dynamic="/tmp/dynamic.lookup",
+        rpc="10.0.0.1:50052",
+        port=9000,
+    )
+    with pytest.raises(UnsupportedOptionError) as excinfo:
+        compile_argv(params)
+    assert set(excinfo.value.fields) == {"lora_scaled_adapters", "image", "lookup_cache_dynamic", "rpc", "port"}
+
+
+def test_server_options_split_sampling_from_load_time_flags():
+    sampling = LlamaInferenceParameters(prompt="hi", temperature=0.0, seed=7, predict_tokens=64)
+    assert compile_server_options(sampling) == ({"temperature": 0.0, "seed": 7, "n_predict": 64}, False)
+
+    load_time = LlamaInferenceParameters(prompt="hi", temperature=0.0, threads=4)
+    options, needs_cli = compile_server_options(load_time)
+    assert options == {"temperature": 0.0}
+    assert needs_cli
@@ -3,27 +3,68 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
 from pathlib import Path
 import pytest
-from app.services.llama_runner import LlamaRunner
-
-from unittest.mock import patch, MagicMock
-from subprocess import CompletedProcess
-
-def test_run_llama_cli_success():
-    fake_binary = Path("/fake/path/to/llama-cli")
-    with patch("pathlib.Path.is_file", return_value=True):
-        with patch("subprocess.run") as mock_run:
-            mock_result = CompletedProcess(args=[], returncode=0, stdout="Paris", stderr="")
-            mock_run.return_value = mock_result
-            runner = LlamaRunner(binary_path=fake_binary)
-            result = runner.run_prompt(prompt="What is the capital of France?", verbose=False)
-            assert result == "Paris"
-
-def test_run_llama_cli_failure():
-    fake_binary = Path("/fake/path/to/llama-cli")
-    with patch("pathlib.Path.is_file", return_value=True):
-        with patch("subprocess.run") as mock_run:
-            mock_run.side_effect = RuntimeError("Llama execution failed")
-            runner = LlamaRunner(binary_path=fake_binary)
-            with pytest.raises(RuntimeError) as exc_info:
-                runner.run_prompt(prompt="What is the capital of France?", verbose=True)
-            assert "Llama execution failed" in str(exc_info.value)
\ No newline at end of file
+from app.services.llama_runner import LlamaExecutionError, LlamaRunner
+
+FAKE_CLI = Path(__file__).resolve().parents[1] / "mocks" / "llama_cpp" / "fake_llama_cli.sh"
+
+
+@pytest.fixture
+def fake_model(tmp_path, monkeypatch):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr("app.services.llama_runner.settings.model_path", str(model))
+    return model
+
+
+@pytest.mark.asyncio
+async def test_run_llama_cli_success(fake_model):
+    runner = LlamaRunner(binary_path=FAKE_CLI)
+    result = await runner.run_prompt_async(prompt="What is the capital of France?", verbose=False)
+    assert result.endswith("Paris.")
+
+@pytest.mark.asyncio
+async def test_run_llama_cli_failure(fake_model, monkeypatch):
+    monkeypatch.setenv("FAKE_LLAMA_REJECT_ARG", "--verbose")
+    runner = LlamaRunner(binary_path=FAKE_CLI)
+    with pytest.raises(LlamaExecutionError) as exc_info:
+        await runner.run_prompt_async(prompt="What is the capital of France?", verbose=True)
+    assert "Llama execution failed" in str(exc_info.value)
+    assert not exc_info.value.backend_fault
+
+@pytest.mark.asyncio
+async def test_open_stream_yields_incrementally_and_kills_on_close(tmp_path, monkeypatch):
+    script = tmp_path / "slow-llama-cli"
+    script.write_text("#!/bin/bash\necho 'first token'\nsleep 30\necho 'never reached'\n")
+    script.chmod(0o755)
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr("app.services.llama_runner.settings.model_path", str(model))
+
+    runner = LlamaRunner(binary_path=script)
+    stream = await runner.open_stream(prompt="Stream me")
+    chunks = stream.__aiter__()
+    first = await chunks.__anext__()
+    assert first.startswith("first token")
+    assert stream.ttft_ms is not None
+    assert stream.returncode is None
+
+    await stream.aclose()
+    assert stream.returncode is not None
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["file", "stdin"])
+async def test_large_prompt_bypasses_argv_and_is_cleaned_up(tmp_path, monkeypatch, mode):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr("app.services.llama_runner.settings.model_path", str(model))
+    monkeypatch.setattr("app.services.prompt_transport.settings.prompt_tmp_dir", str(tmp_path))
+    monkeypatch.setattr("app.services.prompt_transport.settings.prompt_transport", mode)
+    fake_cli = Path(__file__).parents[1] / "mocks" / "llama_cpp" / "fake_llama_cli.sh"
+    prompt = "Discharge summary. " * 20000
+
+    runner = LlamaRunner(binary_path=fake_cli)
+    output = await runner.run_prompt_async(prompt)
+
+    assert f"File prompt: {prompt.strip()}" in output
+    assert "--prompt" not in output
+    assert list(tmp_path.glob("medparswell-prompt-*")) == []
@@ -0,0 +1,39 @@
+import pytest
+
+from app.config.settings import settings
+from app.services.model_preloader import ModelPreloader, model_files, resident_bytes
+
+
+def test_split_model_lists_every_part(tmp_path):
+    parts = [tmp_path / f"model-{i:05d}-of-00003.gguf" for i in (1, 2, 3)]
+    for part in parts:
+        part.write_bytes(b"GGUF")
+    assert model_files(str(parts[1])) == parts
+    single = tmp_path / "single.gguf"
+    assert model_files(str(single)) == [single]
+
+
+@pytest.mark.parametrize("mode", ["willneed", "read"])
+def test_preload_covers_all_parts(tmp_path, monkeypatch, mode):
+    parts = [tmp_path / f"model-{i:05d}-of-00002.gguf" for i in (1, 2)]
+    for part in parts:
+        part.write_bytes(b"\x01" * (3 * 1024 * 1024 + 17))
+    monkeypatch.setattr(settings, "model_path", str(parts[0]))
+    monkeypatch.setattr(settings, "preload_chunk_mb", 1)
+
+    preloader = ModelPreloader()
+    assert preloader.start(mode)
+    preloader._thread.join(timeout=10)
+
+    report = preloader.residency()
+    assert report["state"] == "done"
+    assert report["bytes_done"] == report["bytes_total"] == sum(p.stat().st_size for p in parts)
+    assert [f["path"] for f in report["files"]] == [str(p) for p in parts]
+    if report["resident_bytes"] is not None:
+        assert 0 < report["resident_fraction"] <= 1
+
+
+def test_resident_bytes_of_empty_file(tmp_path):
+    empty = tmp_path / "empty.gguf"
+    empty.touch()
+    assert resident_bytes(empty) == 0
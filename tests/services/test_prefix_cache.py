@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pytest
+
+from app.services.llama_runner import LlamaRunner
+from app.services.prefix_cache import PrefixCache, parse_session_reuse
+
+
+def test_parse_session_reuse():
+    assert parse_session_reuse("main: session file matches 412 / 530 tokens of prompt\n") == 412
+    assert parse_session_reuse(
+        "main: loaded a session with prompt size of 96 tokens\nmain: session file has exact match for prompt!\n"
+    ) == 96
+    assert parse_session_reuse("main: session file does not exist, will create.\n") == 0
+    assert parse_session_reuse("llama_perf_context_print: load time = 1 ms\n") is None
+
+
+def test_longest_registered_prefix_wins():
+    cache = PrefixCache()
+    cache.register("short", "Summarize:")
+    cache.register("long", "Summarize: the discharge note below.\n\n")
+    assert cache.match("Summarize: the discharge note below.\n\nPatient ...").name == "long"
+    assert cache.match("Translate: ...") is None
+
+
+@pytest.mark.asyncio
+async def test_prefix_is_primed_once_then_loaded_read_only(tmp_path, monkeypatch):
+    script = tmp_path / "llama-cli"
+    # Writes the --prompt-cache file like llama-cli does after evaluating the prompt
+    script.write_text(
+        '#!/bin/bash\nprev=""\nfor a in "$@"; do\n'
+        '  if [ "$prev" = "--prompt-cache" ]; then echo state > "$a"; echo "$a" >> "$(dirname "$a")/runs"; fi\n'
+        '  prev="$a"\ndone\necho ok\n'
+    )
+    script.chmod(0o755)
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    runner = LlamaRunner(binary_path=script, model_path=model)
+    cache = PrefixCache(cache_dir=str(tmp_path / "prefixes"))
+    template = cache.register("summary", "You are a clinical summarizer.\n\n")
+
+    first = await cache.cli_args(template, runner)
+    second = await cache.cli_args(template, runner)
+
+    assert first == second
+    assert first[0] == "--prompt-cache" and first[-1] == "--prompt-cache-ro"
+    assert Path(first[1]).is_file()
+    assert len((tmp_path / "prefixes" / "runs").read_text().splitlines()) == 1
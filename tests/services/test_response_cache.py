@@ -0,0 +1,78 @@
+import os
+import time
+from app.services.response_cache import ResponseCache, cache_key, is_cacheable
+
+
+def test_cache_key_depends_on_prompt_params_and_model(tmp_path):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    base = cache_key("doc", str(model), {"seed": 42, "temperature": 0.0})
+
+    assert base == cache_key("doc", str(model), {"temperature": 0.0, "seed": 42})
+    assert base != cache_key("doc2", str(model), {"seed": 42, "temperature": 0.0})
+    assert base != cache_key("doc", str(model), {"seed": 7, "temperature": 0.0})
+
+    model.write_bytes(b"GGUF v2")
+    assert base != cache_key("doc", str(model), {"seed": 42, "temperature": 0.0})
+
+
+def test_random_seed_with_sampling_is_not_cacheable():
+    assert is_cacheable({"seed": 42, "temperature": 0.8})
+    assert is_cacheable({"seed": -1, "temperature": 0.0})
+    assert not is_cacheable({"seed": -1, "temperature": 0.8})
+
+
+def test_memory_tier_is_lru():
+    cache = ResponseCache(max_entries=2, cache_dir="")
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    stats = cache.stats()
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_disk_tier_survives_restart_and_expires(tmp_path):
+    cache = ResponseCache(max_entries=4, cache_dir=str(tmp_path), ttl_seconds=60, max_bytes=10_000)
+    cache.put("k1", "summary one")
+
+    restarted = ResponseCache(max_entries=4, cache_dir=str(tmp_path), ttl_seconds=60, max_bytes=10_000)
+    assert restarted.get("k1") == "summary one"
+    assert restarted.stats()["disk_hits"] == 1
+
+    path = next(tmp_path.glob("*/k1.json"))
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    expired = ResponseCache(max_entries=4, cache_dir=str(tmp_path), ttl_seconds=60, max_bytes=10_000)
+    assert expired.get("k1") is None
+    assert not path.exists()
+
+
+def test_disk_tier_evicts_oldest_over_budget(tmp_path):
+    cache = ResponseCache(max_entries=1, cache_dir=str(tmp_path), ttl_seconds=60, max_bytes=100)
+    cache.put("old", "x" * 40)
+    time.sleep(0.01)
+    cache.put("new", "y" * 40)
+
+    assert cache.stats()["disk_bytes"] <= 100
+    assert not list(tmp_path.glob("*/old.json"))
+    assert list(tmp_path.glob("*/new.json"))
+
+
+def test_concurrent_puts_keep_the_disk_index_consistent(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    cache = ResponseCache(max_entries=4, cache_dir=str(tmp_path), ttl_seconds=60, max_bytes=2_000)
+    keys = [f"{i % 40:02d}key" for i in range(400)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda key: cache.put(key, key * 10), keys))
+
+    files = list(tmp_path.glob("*/*.json"))
+    assert cache.stats()["disk_bytes"] == sum(f.stat().st_size for f in files) <= 2_000
+    assert cache.stats()["disk_entries"] == len(files)
+    assert not list(tmp_path.glob("*/*.tmp"))
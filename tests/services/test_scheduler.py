@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import scheduler
+from app.services.scheduler import LANE_BATCH, LANE_INTERACTIVE, InferenceGate
+
+
+async def _admission_order(gate, requests):
+    order = []
+
+    async def request(name, lane_name, cost):
+        async with gate.admit(lane_name, cost):
+            order.append(name)
+
+    async with gate:
+        tasks = []
+        for name, lane_name, cost in requests:
+            tasks.append(asyncio.ensure_future(request(name, lane_name, cost)))
+            await asyncio.sleep(0.01)
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_interactive_lane_and_short_jobs_go_first(monkeypatch):
+    monkeypatch.setattr(scheduler.settings, "scheduler_aging_tokens_per_second", 0.0)
+    gate = InferenceGate(limit=1)
+    order = await _admission_order(gate, [
+        ("backfill", LANE_BATCH, 100),
+        ("long question", LANE_INTERACTIVE, 3000),
+        ("short question", LANE_INTERACTIVE, 200),
+    ])
+    assert order == ["short question", "long question", "backfill"]
+    assert gate.stats()["lanes"][LANE_BATCH]["admitted"] == 1
+    assert gate.stats()["lanes"][LANE_INTERACTIVE]["p95_wait_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_aging_prevents_starvation(monkeypatch):
+    monkeypatch.setattr(scheduler.settings, "scheduler_aging_tokens_per_second", 1_000_000.0)
+    gate = InferenceGate(limit=1)
+    order = await _admission_order(gate, [
+        ("old backfill", LANE_BATCH, 5000),
+        ("new question", LANE_INTERACTIVE, 10),
+    ])
+    assert order == ["old backfill", "new question"]
+
+
+@pytest.mark.asyncio
+async def test_sheds_when_queue_is_full_or_too_slow(monkeypatch):
+    monkeypatch.setattr(scheduler.settings, "max_queue_depth", 1)
+    monkeypatch.setattr(scheduler.settings, "max_queue_wait_seconds", 5.0)
+    gate = InferenceGate(limit=1)
+    gate.check_capacity()
+
+    async with gate.admit(cost=1000):
+        queued = asyncio.ensure_future(gate.acquire(cost=1000))
+        await asyncio.sleep(0)
+        with pytest.raises(scheduler.QueueFullError) as full:
+            gate.check_capacity()
+        assert full.value.retry_after >= 1
+        monkeypatch.setattr(scheduler.settings, "max_queue_depth", 0)
+        gate.seconds_per_cost = 0.01  # 2000 queued cost units -> ~20s
+        with pytest.raises(scheduler.QueueFullError) as slow:
+            gate.check_capacity()
+        assert slow.value.retry_after == 20
+    await queued
+    gate.release(1000)
+    assert gate.stats()["shed_queue_depth"] == 1
+    assert gate.stats()["shed_queue_time"] == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_waiters_are_dropped_before_admission():
+    gate = InferenceGate(limit=1)
+    admitted = []
+
+    async def request(name, deadline):
+        scheduler.request_deadline.set(deadline)
+        async with gate:
+            admitted.append(name)
+
+    async with gate:
+        expiring = asyncio.ensure_future(request("expiring", time.time() + 0.01))
+        patient = asyncio.ensure_future(request("patient", None))
+        await asyncio.sleep(0.05)
+    await patient
+    with pytest.raises(scheduler.DeadlineExceededError):
+        await expiring
+    assert admitted == ["patient"]
+    assert gate.stats()["dropped_expired"] == 1
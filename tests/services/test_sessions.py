@@ -0,0 +1,83 @@
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+from app.services import sessions
+from app.services.sessions import SessionManager
+from app.services.worker_pool import WorkerPool
+
+FAKE_SERVER = Path(__file__).resolve().parents[1] / "mocks" / "llama_cpp" / "fake_llama_server.py"
+
+
+@pytest_asyncio.fixture
+async def pool(tmp_path, monkeypatch):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    monkeypatch.setattr(sessions.settings, "session_dir", str(tmp_path / "sessions"))
+    pool = WorkerPool(size=1, binary_path=FAKE_SERVER, model_path=model, base_port=0)
+    await pool.start()
+    monkeypatch.setattr(sessions, "worker_pool", pool)
+    yield pool
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_follow_ups_reuse_or_restore_the_saved_document(pool):
+    manager = SessionManager()
+    session = await manager.create("Patient received ceftriaxone for pneumonia.")
+    assert (manager.session_dir / session.filename).read_text().endswith("ceftriaxone for pneumonia.\n\n")
+
+    answer = await manager.ask(session.id, "Which antibiotic?")
+    assert answer.output.endswith("Question: Which antibiotic?\nAnswer:")
+    assert manager.counters["resident_hits"] == 1
+
+    # An unrelated prompt takes over the worker's slot; the next follow-up restores the session
+    await pool.run_prompt("unrelated prompt")
+    await manager.ask(session.id, "For which diagnosis?")
+    assert manager.counters["restores"] == 1
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_session_is_evicted(pool, monkeypatch):
+    manager = SessionManager()
+    first = await manager.create("first document " * 50)
+    second = await manager.create("second document " * 50)
+    await manager.ask(first.id, "Anything?")
+    # The fake server saves the slot as the prompt text, so the state is as large as the document
+    third_bytes = 2 * len(sessions.SESSION_TEMPLATE.format(document="third").encode("utf-8"))
+    monkeypatch.setattr(sessions.settings, "session_max_memory_bytes", first.memory_bytes + third_bytes)
+
+    third = await manager.create("third")
+
+    # `first` was used more recently than `second`, so `second` goes
+    assert list(manager.sessions) == [first.id, third.id]
+    assert not (manager.session_dir / second.filename).exists()
+    assert manager.counters["evictions"] == 1
+
+
+def test_memory_budget_counts_the_saved_kv_state(tmp_path, monkeypatch):
+    manager = SessionManager(session_dir=str(tmp_path))
+    for session_id in ("a" * 32, "b" * 32):
+        session = sessions.Session(session_id, "Short note")
+        session.state_bytes = 1_000_000
+        manager.sessions[session_id] = session
+    monkeypatch.setattr(sessions.settings, "session_max_memory_bytes", 1_500_000)
+
+    manager._enforce_budgets()
+
+    assert list(manager.sessions) == ["b" * 32]
+
+
+def test_state_files_of_an_earlier_process_are_purged(tmp_path):
+    session_dir = tmp_path / "sessions"
+    session_dir.mkdir()
+    manager = SessionManager(session_dir=str(session_dir))
+    live = sessions.Session("a" * 32, "Current document")
+    manager.sessions[live.id] = live
+    (session_dir / live.filename).write_bytes(b"state")
+    (session_dir / f"{'b' * 32}.bin").write_bytes(b"orphaned state")
+    (session_dir / "unrelated.bin").write_bytes(b"not a session")
+
+    assert manager.purge_stale_state() == 1
+    assert sorted(p.name for p in session_dir.iterdir()) == [live.filename, "unrelated.bin"]
@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from app.services.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    executions = 0
+
+    async def work():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.05)
+        return "summary"
+
+    results = await asyncio.gather(*(flight.do("doc", work) for _ in range(5)))
+
+    assert results == ["summary"] * 5
+    assert executions == 1
+    assert flight.stats() == {"leaders": 1, "followers": 4, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_execution_survives_until_last_caller_cancels():
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.create_task(flight.do("doc", work))
+    second = asyncio.create_task(flight.do("doc", work))
+    await asyncio.sleep(0.01)
+
+    first.cancel()
+    await asyncio.sleep(0.01)
+    assert not cancelled.is_set()
+
+    second.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_shared_stream_replays_to_late_subscribers():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def generate():
+        yield "The capital "
+        await release.wait()
+        yield "is Paris."
+
+    async def collect(subscription):
+        return "".join([chunk async for chunk in subscription])
+
+    early = asyncio.create_task(collect(flight.stream("doc", generate)))
+    await asyncio.sleep(0.01)
+    late = asyncio.create_task(collect(flight.stream("doc", generate)))
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await early == await late == "The capital is Paris."
+    assert flight.stats()["followers"] == 1
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from app.schemas.llama_inference_schema import LlamaCLIResponse
+from app.services import summarizer
+from app.services.summarizer import split_into_chunks
+from app.utils.text_utils import estimate_tokens
+
+
+def _document(paragraphs=40):
+    return "\n\n".join(f"Day {i}: vitals stable, medication {i} continued as planned." * 3 for i in range(paragraphs))
+
+
+def test_chunks_respect_budget_and_overlap():
+    chunks = split_into_chunks(_document(), budget=200, overlap=20)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 200 + 2 for chunk in chunks)
+    # Each chunk after the first starts with the tail of its predecessor
+    assert chunks[0].split("\n\n")[-1][-30:] in chunks[1]
+
+
+def test_edit_only_changes_nearby_chunks():
+    original = _document()
+    edited = original.replace("Day 20:", "Day 20 (amended):")
+    before = split_into_chunks(original, budget=200, overlap=20)
+    after = split_into_chunks(edited, budget=200, overlap=20)
+    unchanged = set(before) & set(after)
+    assert len(unchanged) >= len(before) - 3
+
+
+@pytest.mark.asyncio
+async def test_long_document_is_mapped_then_reduced(monkeypatch):
+    prompts = []
+
+    async def fake_generate(prompt, verbose=False, params=None):
+        prompts.append(prompt)
+        return LlamaCLIResponse(output=f"partial {len(prompts)}")
+
+    monkeypatch.setattr(summarizer, "generate", fake_generate)
+    monkeypatch.setattr(summarizer.settings, "summary_chunk_tokens", 200)
+    monkeypatch.setattr(summarizer.settings, "summary_reduce_fan_in", 3)
+
+    summary = await summarizer.summarize(_document())
+
+    chunk_count = len(split_into_chunks(_document(), budget=200))
+    map_prompts = [p for p in prompts if p.startswith("Summarize the following excerpt")]
+    reduce_prompts = [p for p in prompts if p.startswith("Combine the following")]
+    assert len(map_prompts) == chunk_count
+    assert len(reduce_prompts) >= 2
+    assert summary == f"partial {len(prompts)}"
+
+
+@pytest.mark.asyncio
+async def test_single_chunk_document_gets_the_summary_budget(monkeypatch):
+    calls = []
+
+    async def fake_generate(prompt, verbose=False, params=None):
+        calls.append((prompt, params))
+        return LlamaCLIResponse(output="summary")
+
+    monkeypatch.setattr(summarizer, "generate", fake_generate)
+    monkeypatch.setattr(summarizer.settings, "summary_predict_tokens", 96)
+
+    assert await summarizer.summarize("Short note.") == "summary"
+    [(prompt, params)] = calls
+    assert prompt == "Short note."
+    assert params.predict_tokens == 96
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_cancels_the_other_map_calls(monkeypatch):
+    cancelled = []
+
+    async def fake_generate(prompt, verbose=False, params=None):
+        if "Day 0:" in prompt:
+            raise RuntimeError("worker crashed")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(prompt)
+            raise
+        return LlamaCLIResponse(output="partial")
+
+    monkeypatch.setattr(summarizer, "generate", fake_generate)
+    monkeypatch.setattr(summarizer.settings, "summary_chunk_tokens", 200)
+
+    with pytest.raises(RuntimeError, match="worker crashed"):
+        await summarizer.summarize(_document())
+    assert len(cancelled) == len(split_into_chunks(_document(), budget=200)) - 1
@@ -0,0 +1,69 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app.services.supervisor import (
+    BREAKER_CLOSED,
+    BREAKER_HALF_OPEN,
+    BREAKER_OPEN,
+    BackendUnavailableError,
+    CircuitBreaker,
+    WorkerSupervisor,
+)
+from app.services.worker_pool import WORKER_QUARANTINED, WORKER_READY, WorkerPool
+
+FAKE_SERVER = Path(__file__).resolve().parents[1] / "mocks" / "llama_cpp" / "fake_llama_server.py"
+
+
+def test_circuit_breaker_opens_fails_fast_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0)
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == BREAKER_OPEN
+
+    # Reset period over: exactly one trial goes through
+    breaker.check()
+    assert breaker.state == BREAKER_HALF_OPEN
+    breaker._reset_seconds = 60
+    with pytest.raises(BackendUnavailableError) as rejected:
+        breaker.check()
+    assert rejected.value.retry_after >= 1
+
+    breaker.record_success()
+    assert breaker.state == BREAKER_CLOSED
+    breaker.check()
+
+
+@pytest.mark.asyncio
+async def test_supervisor_restarts_crashed_worker_and_quarantines(tmp_path, monkeypatch):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    pool = WorkerPool(size=1, binary_path=FAKE_SERVER, model_path=model, base_port=0)
+    supervisor = WorkerSupervisor(pool)
+    await pool.start()
+    try:
+        worker = pool.workers[0]
+        old_pid = worker.process.pid
+        worker.process.kill()
+        await worker.process.wait()
+
+        await supervisor.check()
+        assert worker.state != WORKER_READY
+        await asyncio.gather(*supervisor._restarts.values())
+        assert worker.state == WORKER_READY
+        assert worker.process.pid != old_pid
+        assert (await pool.run_prompt("back?")).endswith("back?")
+
+        monkeypatch.setattr("app.services.supervisor.settings.supervisor_max_restarts", 1)
+        worker.process.kill()
+        await worker.process.wait()
+        await supervisor.check()
+        assert worker.state == WORKER_QUARANTINED
+        with pytest.raises(RuntimeError):
+            await pool.run_prompt("anyone?")
+        assert supervisor.stats()["quarantines"] == 1
+    finally:
+        await supervisor.stop()
+        await pool.stop()
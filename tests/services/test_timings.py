@@ -0,0 +1,35 @@
+from app.services.timings import TimingStats, parse_cli_timings, server_timings
+
+LEGACY_STDERR = """
+llama_print_timings:        load time =    1234.56 ms
+llama_print_timings:      sample time =      12.34 ms /   128 runs   (    0.10 ms per token, 10370.00 tokens per second)
+llama_print_timings: prompt eval time =     456.78 ms /    32 tokens (   14.27 ms per token,    70.06 tokens per second)
+llama_print_timings:        eval time =    2345.67 ms /   127 runs   (   18.47 ms per token,    54.14 tokens per second)
+llama_print_timings:       total time =    3456.78 ms /   159 tokens
+"""
+
+
+def test_parse_legacy_timing_block():
+    timings = parse_cli_timings(LEGACY_STDERR)
+    assert timings.load_ms == 1234.56
+    assert timings.sample_ms == 12.34
+    assert timings.prompt_tokens == 32
+    assert timings.prompt_tokens_per_second == 70.06
+    assert timings.eval_tokens == 127
+    assert timings.eval_tokens_per_second == 54.14
+    assert timings.total_ms == 3456.78
+
+
+def test_no_timing_block_and_server_timings():
+    assert parse_cli_timings("main: interrupted by signal\n") is None
+    timings = server_timings({"prompt_n": 20, "prompt_ms": 40.0, "predicted_n": 10, "predicted_ms": 100.0})
+    assert timings.prompt_tokens_per_second == 500.0
+    assert timings.eval_tokens_per_second == 100.0
+
+    stats = TimingStats()
+    stats.record(timings)
+    stats.record(None)
+    summary = stats.stats()
+    assert summary["requests"] == 1
+    assert summary["eval_tokens"] == 10
+    assert summary["eval_tokens_per_second"]["mean"] == 100.0
@@ -0,0 +1,100 @@
+import asyncio
+from pathlib import Path
+import pytest
+from app.services.worker_pool import WorkerPool
+
+FAKE_SERVER = Path(__file__).resolve().parents[1] / "mocks" / "llama_cpp" / "fake_llama_server.py"
+
+
+@pytest.fixture
+def fake_model(tmp_path):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"GGUF")
+    return model
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_reuses_resident_workers(fake_model):
+    pool = WorkerPool(size=2, binary_path=FAKE_SERVER, model_path=fake_model, base_port=0)
+    await pool.start()
+    try:
+        pids = {w.process.pid for w in pool.workers}
+        outputs = await asyncio.gather(*(pool.run_prompt(f"document {i}") for i in range(6)))
+    finally:
+        await pool.stop()
+
+    assert len(outputs) == 6
+    for i, output in enumerate(outputs):
+        assert output.endswith(f"document {i}")
+    served_by = {int(o.split("[")[1].split("]")[0]) for o in outputs}
+    assert served_by <= pids
+    assert not pool.started
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_waits_for_model_load(fake_model, monkeypatch):
+    monkeypatch.setenv("FAKE_LLAMA_LOAD_DELAY", "0.5")
+    pool = WorkerPool(size=1, binary_path=FAKE_SERVER, model_path=fake_model, base_port=0)
+    await pool.start()
+    try:
+        assert (await pool.run_prompt("ready?")).endswith("ready?")
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_missing_binary(fake_model):
+    pool = WorkerPool(size=1, binary_path=Path("/nonexistent/llama-server"), model_path=fake_model, base_port=0)
+    with pytest.raises(FileNotFoundError):
+        await pool.start()
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_streams_completion(fake_model):
+    pool = WorkerPool(size=1, binary_path=FAKE_SERVER, model_path=fake_model, base_port=0)
+    await pool.start()
+    try:
+        chunks = [chunk async for chunk in pool.stream_prompt("stream this")]
+    finally:
+        await pool.stop()
+
+    assert len(chunks) > 1
+    assert "".join(chunks).strip().endswith("stream this")
+
+
+@pytest.mark.asyncio
+async def test_waiters_fail_when_last_worker_leaves_rotation(fake_model):
+    from app.services.llama_runner import LlamaExecutionError
+    from app.services.worker_pool import WORKER_QUARANTINED
+
+    pool = WorkerPool(size=1, binary_path=FAKE_SERVER, model_path=fake_model, base_port=0)
+    await pool.start()
+    try:
+        async with pool.acquire() as worker:
+            waiter = asyncio.ensure_future(pool.run_prompt("anyone?"))
+            await asyncio.sleep(0.05)
+            assert not waiter.done()
+            pool.take_out_of_rotation(worker, WORKER_QUARANTINED)
+            with pytest.raises(LlamaExecutionError, match="No healthy"):
+                await asyncio.wait_for(waiter, timeout=1)
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_acquire_all_waits_for_leased_workers(fake_model):
+    pool = WorkerPool(size=2, binary_path=FAKE_SERVER, model_path=fake_model, base_port=0)
+    await pool.start()
+    try:
+        async def lease_all():
+            async with pool.acquire_all() as workers:
+                return {w.index for w in workers}
+
+        async with pool.acquire():
+            everyone = asyncio.ensure_future(lease_all())
+            await asyncio.sleep(0.05)
+            assert not everyone.done()
+        assert await asyncio.wait_for(everyone, timeout=1) == {0, 1}
+        assert pool.busy_count == 0
+    finally:
+        await pool.stop()
@@ -0,0 +1,60 @@
+import gzip
+import json
+import logging
+import logging.handlers
+import queue
+
+from app.config.logging_config import JsonFormatter, RedactingQueueHandler, _gzip_namer, _gzip_rotator
+
+
+def _enqueue(handler, msg, *args, **extra):
+    record = logging.LogRecord("medparswell", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    handler.emit(record)
+    return record, handler.queue.get_nowait()
+
+
+def test_payload_arguments_are_redacted_and_caller_record_untouched():
+    handler = RedactingQueueHandler(queue.SimpleQueue(), payload_max_chars=16)
+    summary = "Patient presented with chest pain. " * 20
+    original, queued = _enqueue(handler, "Generated summary: %s (%d chars)", summary, len(summary))
+    assert queued.getMessage() == f"Generated summary: <{len(summary)} chars redacted> ({len(summary)} chars)"
+    assert "chest pain" not in queued.getMessage()
+    assert original.args[0] == summary
+
+    _, short = _enqueue(handler, "Content length: %s", "short")
+    assert short.getMessage() == "Content length: short"
+
+
+def test_show_payloads_truncates_instead_of_redacting():
+    handler = RedactingQueueHandler(queue.SimpleQueue(), payload_max_chars=10, show_payloads=True)
+    _, queued = _enqueue(handler, "Raw stdout:\n%s", "0123456789abcdef")
+    assert queued.getMessage() == "Raw stdout:\n0123456789… <+6 chars>"
+
+
+def test_json_formatter_includes_extra_fields():
+    handler = RedactingQueueHandler(queue.SimpleQueue())
+    _, queued = _enqueue(handler, "started %s", "ok", component="main")
+    entry = json.loads(JsonFormatter().format(queued))
+    assert entry["message"] == "started ok"
+    assert entry["level"] == "INFO"
+    assert entry["component"] == "main"
+
+
+def test_rotated_files_are_gzipped(tmp_path):
+    log_file = tmp_path / "app.log"
+    handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=200, backupCount=2)
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    logger = logging.getLogger("test-rotation")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        for i in range(20):
+            logger.warning("line %02d %s", i, "x" * 40)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    backups = sorted(p.name for p in tmp_path.iterdir())
+    assert backups == ["app.log", "app.log.1.gz", "app.log.2.gz"]
+    assert b"line" in gzip.decompress((tmp_path / "app.log.1.gz").read_bytes())
@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+CHECK = """
+import logging, sys
+import app.main
+from app.config.settings import get_settings
+assert get_settings.cache_info().currsize == 0, "settings loaded at import"
+assert not logging.getLogger().handlers, "logging configured at import"
+assert "httpx" not in sys.modules, "httpx imported at import"
+"""
+
+
+def test_importing_the_app_has_no_side_effects(tmp_path):
+    # Without LLAMA_* variables the settings would fail to load, so importing must not load them
+    env = {k: v for k, v in os.environ.items() if not k.startswith("LLAMA_")}
+    env["LLAMA_LOG_FILE"] = str(tmp_path / "logs" / "app.log")
+    result = subprocess.run([sys.executable, "-c", CHECK], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert not (tmp_path / "logs").exists()